@@ -0,0 +1,167 @@
+-- Migration: Keyset (cursor) pagination for GET /api/places
+--
+-- Creates RPC get_places_keyset, which applies every filter (including the
+-- name search) inside the query and pages with a (sort_value, id) cursor
+-- instead of LIMIT/OFFSET.
+--
+-- sort_value is normalized so that ascending order is always "best first":
+--   rating     -> (-COALESCE(rating, 0))::double precision
+--   popularity -> (-COALESCE(rating_count, 0))::double precision
+--   distance   -> distance_km (places without coordinates sort last)
+--
+-- Each sort is a separate query whose ORDER BY and cursor row comparison are
+-- exactly the indexed expressions, so rating / popularity pages are an index
+-- range scan that stops after p_limit rows: page 100 costs the same as page 1.
+-- distance depends on the user's point and cannot use a btree index; it is a
+-- filtered scan plus top-N sort (bounded by p_max_distance when given).
+--
+-- Execute this in Supabase SQL Editor BEFORE deploying backend code changes.
+
+BEGIN;
+
+-- ==============================================================================
+-- STEP 1: Indexes backing the keyset order
+-- ==============================================================================
+
+-- Recreate: expressions must match the ORDER BY in get_places_keyset exactly
+DROP INDEX IF EXISTS idx_places_keyset_rating;
+DROP INDEX IF EXISTS idx_places_keyset_popularity;
+
+CREATE INDEX idx_places_keyset_rating
+    ON places (((-COALESCE(rating, 0))::double precision), id);
+
+CREATE INDEX idx_places_keyset_popularity
+    ON places (((-COALESCE(rating_count, 0))::double precision), id);
+
+-- ==============================================================================
+-- STEP 2: Helpers (inlined by the planner / evaluated per returned row)
+-- ==============================================================================
+
+CREATE OR REPLACE FUNCTION places_keyset_match(
+    p places,
+    p_location text,
+    p_categories text[],
+    p_min_rating double precision,
+    p_search text,
+    p_point geography,
+    p_max_distance integer
+)
+RETURNS boolean
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT (p_location IS NULL OR p.address ILIKE '%' || p_location || '%')
+       AND (p_categories IS NULL OR p.category = ANY(p_categories))
+       AND (p_min_rating IS NULL OR p.rating >= p_min_rating)
+       AND (p_search IS NULL OR p.name ILIKE '%' || p_search || '%')
+       AND (
+           p_max_distance IS NULL OR p_point IS NULL
+           OR ST_DWithin(p.geom::geography, p_point, p_max_distance * 1000.0)
+       )
+$$;
+
+CREATE OR REPLACE FUNCTION places_keyset_row(
+    p places,
+    p_sort_value double precision,
+    p_point geography
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT (to_jsonb(p) - 'embed' - 'geom')
+        || jsonb_build_object(
+            'sort_value', p_sort_value,
+            'distance_km', CASE
+                WHEN p_point IS NOT NULL AND p.geom IS NOT NULL
+                THEN ST_Distance(p.geom::geography, p_point) / 1000.0
+            END,
+            'images', COALESCE((
+                SELECT jsonb_agg(jsonb_build_object('id', i.id, 'url', i.url))
+                FROM (
+                    SELECT id, url FROM images
+                    WHERE images.place_id = p.id
+                    LIMIT 5
+                ) i
+            ), '[]'::jsonb)
+        )
+$$;
+
+-- ==============================================================================
+-- STEP 3: RPC function
+-- ==============================================================================
+
+CREATE OR REPLACE FUNCTION get_places_keyset(
+    p_location text DEFAULT NULL,
+    p_lat double precision DEFAULT NULL,
+    p_lon double precision DEFAULT NULL,
+    p_categories text[] DEFAULT NULL,
+    p_min_rating double precision DEFAULT NULL,
+    p_max_distance integer DEFAULT NULL,
+    p_search text DEFAULT NULL,
+    p_sort text DEFAULT 'rating',
+    p_cursor_value double precision DEFAULT NULL,
+    p_cursor_id uuid DEFAULT NULL,
+    p_limit integer DEFAULT 20,
+    p_offset integer DEFAULT 0
+)
+RETURNS SETOF jsonb
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_point geography := CASE
+        WHEN p_lat IS NOT NULL AND p_lon IS NOT NULL
+        THEN ST_SetSRID(ST_MakePoint(p_lon, p_lat), 4326)::geography
+    END;
+    -- First page: a lower bound below every key, so the cursor predicate is always an index condition
+    v_after_value double precision := COALESCE(p_cursor_value, '-Infinity'::double precision);
+    v_after_id uuid := COALESCE(p_cursor_id, '00000000-0000-0000-0000-000000000000'::uuid);
+    v_offset integer := CASE WHEN p_cursor_id IS NULL THEN GREATEST(p_offset, 0) ELSE 0 END;
+BEGIN
+    IF p_sort = 'popularity' THEN
+        RETURN QUERY
+        SELECT places_keyset_row(p, (-COALESCE(p.rating_count, 0))::double precision, v_point)
+        FROM places p
+        WHERE ((-COALESCE(p.rating_count, 0))::double precision, p.id) > (v_after_value, v_after_id)
+          AND places_keyset_match(p, p_location, p_categories, p_min_rating, p_search, v_point, p_max_distance)
+        ORDER BY (-COALESCE(p.rating_count, 0))::double precision, p.id
+        LIMIT p_limit
+        OFFSET v_offset;
+
+    ELSIF p_sort = 'distance' THEN
+        RETURN QUERY
+        SELECT places_keyset_row(d.p, d.sort_value, v_point)
+        FROM (
+            SELECT
+                p,
+                p.id,
+                COALESCE(
+                    CASE
+                        WHEN v_point IS NOT NULL AND p.geom IS NOT NULL
+                        THEN ST_Distance(p.geom::geography, v_point) / 1000.0
+                    END,
+                    1e9
+                )::double precision AS sort_value
+            FROM places p
+            WHERE places_keyset_match(p, p_location, p_categories, p_min_rating, p_search, v_point, p_max_distance)
+        ) d
+        WHERE (d.sort_value, d.id) > (v_after_value, v_after_id)
+        ORDER BY d.sort_value, d.id
+        LIMIT p_limit
+        OFFSET v_offset;
+
+    ELSE
+        RETURN QUERY
+        SELECT places_keyset_row(p, (-COALESCE(p.rating, 0))::double precision, v_point)
+        FROM places p
+        WHERE ((-COALESCE(p.rating, 0))::double precision, p.id) > (v_after_value, v_after_id)
+          AND places_keyset_match(p, p_location, p_categories, p_min_rating, p_search, v_point, p_max_distance)
+        ORDER BY (-COALESCE(p.rating, 0))::double precision, p.id
+        LIMIT p_limit
+        OFFSET v_offset;
+    END IF;
+END;
+$$;
+
+COMMIT;
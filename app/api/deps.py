@@ -4,17 +4,19 @@ Các dependency functions dùng chung cho các endpoints
 """
 
 from typing import Optional
-from fastapi import Depends, Header, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import Client
 import jwt
-from jwt.algorithms import ECAlgorithm, RSAAlgorithm
 from jwt.exceptions import InvalidTokenError
-import requests
-import json
+import hashlib
+import time
 
 from app.services.supabase_client import get_supabase_client
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.jwks import ALG_TO_KTY, JWKSKeyStore
+from app.services.embedding_writer import PlaceEmbeddingWriter
 
 # Security scheme for JWT Bearer token
 # auto_error=True will automatically return 401 if token is missing
@@ -27,32 +29,38 @@ security = HTTPBearer(
 # JWKS URL for fetching Supabase public keys
 JWKS_URL = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
 
-# Cache for JWKS keys (in production, use Redis or similar)
-_jwks_cache = None
+# Pre-built public keys by kid, refreshed in background
+jwks_store = JWKSKeyStore(
+    JWKS_URL,
+    refresh_interval=settings.JWKS_REFRESH_INTERVAL_SECONDS,
+    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL_SECONDS,
+)
+
+# Verified claims keyed by token hash, each entry expires at the token's exp
+_verified_tokens = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
 
 
 def get_jwks_keys():
     """
-    Fetch JWKS keys from Supabase.
-    Uses simple in-memory caching.
+    Get JWKS keys from Supabase.
+    Served from the background-refreshed key store.
     """
-    global _jwks_cache
-    if _jwks_cache is None:
-        try:
-            response = requests.get(JWKS_URL, timeout=5)
-            response.raise_for_status()
-            _jwks_cache = response.json()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"Failed to fetch JWKS keys from {JWKS_URL}: {str(e)}"
-            )
-    return _jwks_cache
+    if not jwks_store.is_loaded:
+        done = jwks_store.refresh_async()
+        if done is not None:
+            done.wait(jwks_store.fetch_timeout + 1)
+    if not jwks_store.is_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Failed to fetch JWKS keys from {JWKS_URL}: {str(jwks_store.last_error)}"
+        )
+    return jwks_store.jwks
 
 
 def verify_jwt_token(token: str) -> dict:
     """
     Verify Supabase JWT token using ES256/RS256 and JWKS public keys.
+    Verified claims are cached until the token expires.
     
     Args:
         token: JWT token string
@@ -63,6 +71,11 @@ def verify_jwt_token(token: str) -> dict:
     Raises:
         HTTPException 401 if token is invalid
     """
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = _verified_tokens.get(token_hash)
+    if cached is not None:
+        return dict(cached)
+    
     try:
         # Get the token header to find the Key ID (kid)
         header = jwt.get_unverified_header(token)
@@ -76,27 +89,23 @@ def verify_jwt_token(token: str) -> dict:
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Fetch JWKS keys
-        jwks = get_jwks_keys()
-        
-        # Find the matching public key
-        public_key = None
-        for key in jwks.get('keys', []):
-            if key.get('kid') == kid:
-                # Convert JWK to public key based on algorithm
-                if alg == 'ES256':
-                    public_key = ECAlgorithm.from_jwk(json.dumps(key))
-                elif alg == 'RS256':
-                    public_key = RSAAlgorithm.from_jwk(json.dumps(key))
-                else:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail=f"Unsupported algorithm: {alg}",
-                        headers={"WWW-Authenticate": "Bearer"},
-                    )
-                break
-        
-        if not public_key:
+        if alg not in ALG_TO_KTY:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Unsupported algorithm: {alg}",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # Find the matching pre-built public key
+        entry = jwks_store.get_key(kid)
+        
+        if entry is None and not jwks_store.is_loaded:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Failed to fetch JWKS keys from {JWKS_URL}: {str(jwks_store.last_error)}"
+            )
+        
+        if entry is None or entry[0] != ALG_TO_KTY[alg]:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Public key with kid '{kid}' not found in JWKS endpoint. "
@@ -107,10 +116,18 @@ def verify_jwt_token(token: str) -> dict:
         # Decode and verify JWT token
         payload = jwt.decode(
             token,
-            public_key,
+            entry[1],
             algorithms=[alg],  # Use the algorithm from token header
             audience="authenticated"
         )
+        
+        # Cache verified claims until the token expires
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            ttl = exp - time.time()
+            if ttl > 0:
+                _verified_tokens.set(token_hash, dict(payload), ttl=ttl)
+        
         return payload
         
     except jwt.ExpiredSignatureError:
@@ -220,3 +237,11 @@ def get_db() -> Client:
     Get Supabase client dependency.
     """
     return get_supabase_client()
+
+
+def get_embedding_writer(request: Request) -> Optional[PlaceEmbeddingWriter]:
+    """
+    Hàng đợi write-through embedding (gắn vào app.state trong lifespan).
+    None nếu app chưa khởi tạo writer (ví dụ chạy router riêng lẻ).
+    """
+    return getattr(request.app.state, "embedding_writer", None)
@@ -10,8 +10,10 @@ from app.schemas.chat import (
     ItineraryListResponse
 )
 from app.core.config import settings
+from app.core.logger import get_logger
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
+logger = get_logger(__name__)
 
 # Initialize orchestrator
 orchestrator = ChatbotOrchestrator()
@@ -48,7 +50,7 @@ async def chat(
         response = await orchestrator.process_query(request)
         return response
     except Exception as e:
-        print(f"Error processing chat request: {e}")
+        logger.exception("Error processing chat request: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
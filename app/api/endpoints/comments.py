@@ -7,10 +7,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from supabase import Client
 from datetime import datetime
-import uuid
 
 from app.api.deps import get_current_user_id, get_db
-from app.core.datetime_utils import get_utc_now
 from app.schemas.comment import (
     CommentResponse,
     CreateCommentRequest,
@@ -18,6 +16,8 @@ from app.schemas.comment import (
     AddImagesToCommentRequest
 )
 from app.schemas.common import APIResponse
+from app.services.image_service import build_image_rows, bulk_insert_images
+from app.services.place_detail_service import invalidate_place_detail
 
 router = APIRouter()
 
@@ -72,6 +72,7 @@ async def create_comment(
             result = response.data[0] if isinstance(response.data, list) else response.data
             
             if result.get("success"):
+                invalidate_place_detail(request.place_id)
                 return APIResponse(
                     success=True,
                     message=result.get("message", "Đã tạo comment thành công"),
@@ -107,7 +108,7 @@ async def update_comment(
     """
     try:
         # Kiểm tra comment tồn tại và quyền sở hữu
-        check_response = db.table('comments').select('user_id').eq('id', comment_id).execute()
+        check_response = db.table('comments').select('user_id, place_id').eq('id', comment_id).execute()
         
         if not (hasattr(check_response, 'data') and check_response.data):
             raise HTTPException(status_code=404, detail="Comment không tồn tại")
@@ -131,6 +132,7 @@ async def update_comment(
         
         # Update comment
         response = db.table('comments').update(update_data).eq('id', comment_id).execute()
+        invalidate_place_detail(check_response.data[0].get('place_id'))
         
         if hasattr(response, 'data') and response.data:
             return APIResponse(
@@ -162,7 +164,7 @@ async def delete_comment(
     """
     try:
         # Kiểm tra comment tồn tại và quyền sở hữu
-        check_response = db.table('comments').select('user_id').eq('id', comment_id).execute()
+        check_response = db.table('comments').select('user_id, place_id').eq('id', comment_id).execute()
         
         if not (hasattr(check_response, 'data') and check_response.data):
             raise HTTPException(status_code=404, detail="Comment không tồn tại")
@@ -175,6 +177,7 @@ async def delete_comment(
         # Xóa comment - cascade sẽ xóa images liên quan (FK constraint)
         # Trigger sẽ tự động update rating của place
         response = db.table('comments').delete().eq('id', comment_id).execute()
+        invalidate_place_detail(check_response.data[0].get('place_id'))
         
         if hasattr(response, 'data'):
             return APIResponse(
@@ -218,20 +221,10 @@ async def add_images_to_comment(
         if comment_owner != user_id:
             raise HTTPException(status_code=403, detail="Bạn không có quyền thêm ảnh vào comment này")
         
-        # Insert images
-        added_count = 0
-        for url in request.image_urls:
-            img_data = {
-                "id": str(uuid.uuid4()),
-                "comment_id": comment_id,
-                "place_id": place_id,
-                "url": url,
-                "is_scraped": False,
-                "uploaded_at": get_utc_now().isoformat()
-            }
-            result = db.table('images').insert(img_data).execute()
-            if hasattr(result, 'data') and result.data:
-                added_count += 1
+        # Insert images - một request cho tất cả ảnh
+        rows = build_image_rows(request.image_urls, place_id=place_id, comment_id=comment_id)
+        added_count = bulk_insert_images(db, rows)
+        invalidate_place_detail(place_id)
         
         return APIResponse(
             success=True,
@@ -260,7 +253,7 @@ async def delete_comment_image(
     """
     try:
         # Kiểm tra comment tồn tại và quyền sở hữu
-        check_response = db.table('comments').select('user_id').eq('id', comment_id).execute()
+        check_response = db.table('comments').select('user_id, place_id').eq('id', comment_id).execute()
         
         if not (hasattr(check_response, 'data') and check_response.data):
             raise HTTPException(status_code=404, detail="Comment không tồn tại")
@@ -278,6 +271,7 @@ async def delete_comment_image(
         
         # Xóa ảnh
         db.table('images').delete().eq('id', image_id).execute()
+        invalidate_place_detail(check_response.data[0].get('place_id'))
         
         return APIResponse(success=True, message="Đã xóa ảnh thành công")
         
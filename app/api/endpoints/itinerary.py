@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas.itinerary import ItineraryRequest, ItineraryResponse
 from app.services.itinerary_service import ItineraryService
+from app.core.logger import get_logger
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 @router.post("/generate", response_model=ItineraryResponse)
@@ -27,5 +29,5 @@ async def generate_itinerary(request: ItineraryRequest):
         itinerary = service.generate_itinerary(request)
         return itinerary
     except Exception as e:
-        print(f"Error generating itinerary: {e}")
+        logger.exception("Error generating itinerary: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate itinerary: {str(e)}")
@@ -1,23 +1,38 @@
 """
 Places Endpoints
 Xử lý các API liên quan đến địa điểm du lịch
-Sử dụng RPC function get_places_advanced_v2 (PostGIS)
+Sử dụng RPC functions get_places_keyset, get_places_advanced_v2 (PostGIS)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from typing import List, Optional
 from supabase import Client
 
-from app.api.deps import get_db, get_current_user_id
+from app.api.deps import get_db, get_current_user_id, get_embedding_writer
+from app.core.config import settings
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor
 from app.schemas.place import Place, PlaceCreate, PlaceUpdate
+from app.services.embedding_writer import EMBEDDED_FIELDS, PlaceEmbeddingWriter
+from app.services.place_detail_service import get_place_detail, invalidate_place_detail
 
 router = APIRouter()
 
+# Các kiểu sort hỗ trợ keyset pagination (xem get_places_keyset)
+KEYSET_SORTS = ("rating", "distance", "popularity")
+
+
+def enqueue_place_embedding(writer: Optional[PlaceEmbeddingWriter], place: dict) -> None:
+    """Embed place vừa ghi ở background (cột embed + index của semantic search)."""
+    if settings.EMBEDDING_WRITE_THROUGH and writer is not None:
+        writer.enqueue(place)
+
 
 @router.get("", response_model=List[dict])
 async def get_places(
-    skip: int = Query(0, ge=0, description="Số records bỏ qua"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Số records bỏ qua (chỉ dùng khi không có cursor)"),
     limit: int = Query(20, ge=1, le=100, description="Số records tối đa"),
+    cursor: Optional[str] = Query(None, description="Cursor trang tiếp theo (header X-Next-Cursor của trang trước)"),
     lat: Optional[float] = Query(None, description="Latitude của user"),
     lon: Optional[float] = Query(None, description="Longitude của user"),
     max_distance: Optional[int] = Query(None, description="Khoảng cách tối đa (km)"),
@@ -28,42 +43,57 @@ async def get_places(
     sort_by: Optional[str] = Query("rating", description="Sắp xếp: rating, distance, popularity"),
     db: Client = Depends(get_db)
 ):
-    """Lấy danh sách địa điểm với filters. Sử dụng RPC get_places_advanced_v2."""
+    """
+    Lấy danh sách địa điểm với filters. Sử dụng RPC get_places_keyset (keyset pagination).
+    
+    Cursor của trang tiếp theo trả về trong header `X-Next-Cursor` (không có nếu đã hết).
+    """
     try:
         # Parse categories string thành array
         category_array = None
         if categories:
             category_array = [c.strip() for c in categories.split(",") if c.strip()]
         
-        # sort_options phải là array
-        sort_options_array = [s.strip() for s in sort_by.split(",")] if sort_by else ["rating"]
+        # Keyset pagination chỉ dùng sort option đầu tiên
+        sort_options = [s.strip() for s in sort_by.split(",") if s.strip()] if sort_by else []
+        sort = sort_options[0] if sort_options and sort_options[0] in KEYSET_SORTS else "rating"
+        if sort == "distance" and (lat is None or lon is None):
+            sort = "rating"
         
-        # Gọi RPC function
-        response = db.rpc("get_places_advanced_v2", {
+        try:
+            after = decode_cursor(cursor, sort)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        # Gọi RPC function - lấy thêm 1 record để biết còn trang sau không
+        rpc_response = db.rpc("get_places_keyset", {
             "p_location": location,
             "p_lat": lat,
             "p_lon": lon,
             "p_categories": category_array,
             "p_min_rating": min_rating,
             "p_max_distance": max_distance,
-            "p_price_levels": None,
-            "p_amenities_jsonb": None,
-            "p_sort_options": sort_options_array,
-            "p_limit": skip + limit + 50
+            "p_search": search.strip() if search and search.strip() else None,
+            "p_sort": sort,
+            "p_cursor_value": after["v"] if after else None,
+            "p_cursor_id": after["id"] if after else None,
+            "p_limit": limit + 1,
+            "p_offset": 0 if after else skip
         }).execute()
         
-        places = response.data if response.data else []
+        places = rpc_response.data if rpc_response.data else []
         
-        # Filter theo search (nếu RPC chưa support)
-        if search:
-            search_lower = search.lower()
-            places = [p for p in places if search_lower in (p.get("name") or "").lower()]
+        has_more = len(places) > limit
+        places = places[:limit]
         
-        # Pagination
-        places = places[skip:skip + limit]
+        if has_more:
+            last = places[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(sort, last.get("sort_value"), last.get("id"))
         
         # Format output
         for place in places:
+            place.pop("sort_value", None)
+            
             if place.get("distance_km") is not None:
                 place["distance_m"] = int(float(place["distance_km"]) * 1000)
             else:
@@ -74,6 +104,8 @@ async def get_places(
         
         return places
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy danh sách địa điểm: {str(e)}")
 
@@ -190,24 +222,14 @@ async def get_place(
 ):
     """
     Lấy thông tin chi tiết một địa điểm.
+    Trả về các ảnh và trang comments đầu tiên, comments_count là tổng số comments.
     
     - **place_id**: UUID của địa điểm
     """
     try:
-        response = db.table('places').select('*').eq('id', place_id).execute()
+        place = await get_place_detail(db, place_id)
         
-        if response.data:
-            place = response.data[0]
-            
-            # Lấy images của place
-            img_resp = db.table('images').select('id, url').eq('place_id', place_id).execute()
-            place['images'] = img_resp.data if img_resp.data else []
-            
-            # Lấy comments
-            comments_resp = db.table('comments').select('*').eq('place_id', place_id).order('date', desc=True).execute()
-            place['comments'] = comments_resp.data if comments_resp.data else []
-            place['comments_count'] = len(place['comments'])
-            
+        if place:
             return place
         
         raise HTTPException(
@@ -228,7 +250,8 @@ async def get_place(
 async def create_place(
     place_in: PlaceCreate,
     db: Client = Depends(get_db),
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    embedding_writer: Optional[PlaceEmbeddingWriter] = Depends(get_embedding_writer)
 ):
     """
     Tạo địa điểm mới.
@@ -249,6 +272,7 @@ async def create_place(
         
         if response.data:
             created = response.data[0]
+            enqueue_place_embedding(embedding_writer, created)
             created['images'] = []
             return created
         
@@ -271,7 +295,8 @@ async def update_place(
     place_id: str,
     place_in: PlaceUpdate,
     db: Client = Depends(get_db),
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    embedding_writer: Optional[PlaceEmbeddingWriter] = Depends(get_embedding_writer)
 ):
     """
     Cập nhật thông tin địa điểm.
@@ -297,8 +322,11 @@ async def update_place(
             )
         
         response = db.table('places').update(update_data).eq('id', place_id).execute()
+        invalidate_place_detail(place_id)
         
         if response.data:
+            if any(field in update_data for field in EMBEDDED_FIELDS):
+                enqueue_place_embedding(embedding_writer, response.data[0])
             return response.data[0]
         
         raise HTTPException(
@@ -338,6 +366,7 @@ async def delete_place(
         
         # Delete place - trigger sẽ cascade delete images và comments
         db.table('places').delete().eq('id', place_id).execute()
+        invalidate_place_detail(place_id)
         
         return {"message": "Đã xóa địa điểm thành công", "id": place_id}
         
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
 from app.schemas.stt import STTResponse
 from app.services.stt_service import get_stt_service
+from app.core.logger import get_logger
 
 router = APIRouter(prefix="/stt", tags=["Speech-to-Text"])
+logger = get_logger(__name__)
 
 
 @router.post("/transcribe", response_model=STTResponse)
@@ -101,7 +103,7 @@ async def transcribe_audio(
             detail=str(e)
         )
     except Exception as e:
-        print(f"STT Error: {str(e)}")
+        logger.exception("STT Error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Lỗi khi nhận dạng giọng nói: {str(e)}"
@@ -4,8 +4,10 @@ from io import BytesIO
 
 from app.schemas.tts import TTSRequest
 from app.services.tts_service import get_tts_service
+from app.core.logger import get_logger
 
 router = APIRouter(prefix="/tts", tags=["Text-to-Speech"])
+logger = get_logger(__name__)
 
 
 @router.post("", response_class=StreamingResponse)
@@ -65,7 +67,7 @@ async def text_to_speech(request: TTSRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"TTS Error: {str(e)}")
+        logger.exception("TTS Error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Lỗi khi chuyển đổi văn bản thành giọng nói: {str(e)}"
@@ -30,7 +30,10 @@ async def get_user_comments(
     - **offset**: Vị trí bắt đầu
     """
     try:
-        query = db.table('comments').select('*, places(id, name, address, category)').eq('user_id', user_id)
+        # Embed images vào cùng query để tránh N+1 round trips
+        query = db.table('comments').select(
+            '*, places(id, name, address, category), images(*)'
+        ).eq('user_id', user_id)
         query = query.order('date', desc=True)
         query = query.range(offset, offset + limit - 1)
         
@@ -39,14 +42,8 @@ async def get_user_comments(
         if hasattr(response, 'data'):
             comments = response.data
             
-            # Lấy ảnh cho từng comment
             for comment in comments:
-                comment_id = comment.get('id')
-                img_response = db.table('images').select('*').eq('comment_id', comment_id).execute()
-                
-                if hasattr(img_response, 'data') and img_response.data:
-                    comment['images'] = img_response.data
-                else:
+                if not comment.get('images'):
                     comment['images'] = []
             
             return comments
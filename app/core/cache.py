@@ -0,0 +1,65 @@
+"""
+In-memory Cache Utilities
+=========================
+
+Bounded, thread-safe caches dùng chung cho các service.
+Mỗi process (worker) có cache riêng - không chia sẻ giữa các worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU cache có giới hạn số phần tử và thời gian sống (TTL) cho mỗi entry.
+
+    Example:
+        >>> cache = TTLCache(maxsize=100, ttl=30)
+        >>> cache.set("key", {"value": 1})
+        >>> cache.get("key")
+        {'value': 1}
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Lấy giá trị còn hạn, trả về default nếu không có hoặc đã hết hạn."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Lưu giá trị với TTL (mặc định self.ttl), loại bỏ entry cũ nhất khi đầy."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Xóa một entry (không lỗi nếu không tồn tại)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Xóa toàn bộ cache."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
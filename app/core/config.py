@@ -18,7 +18,23 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_BUCKET: str = "images"
-    
+
+    # Image Upload
+    UPLOAD_MAX_CONCURRENCY: int = 3
+    UPLOAD_MAX_FILE_SIZE_MB: float = 10.0
+    UPLOAD_CHUNK_SIZE_KB: int = 256
+
+    # Authentication (JWKS / verified token cache)
+    JWKS_REFRESH_INTERVAL_SECONDS: float = 3600.0
+    JWKS_MIN_REFRESH_INTERVAL_SECONDS: float = 30.0
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+
+    # Place Detail
+    PLACE_DETAIL_IMAGES_LIMIT: int = 20
+    PLACE_DETAIL_COMMENTS_LIMIT: int = 20
+    PLACE_DETAIL_CACHE_TTL_SECONDS: float = 30.0
+    PLACE_DETAIL_CACHE_MAX_ENTRIES: int = 1000
+
     # Google Gemini (Legacy API Key - kept for fallback)
     GEMINI_API_KEY: Optional[str] = None
     
@@ -29,6 +45,24 @@ class Settings(BaseSettings):
     VERTEX_PROJECT_ID: str = "scrape-food1"
     VERTEX_LOCATION: str = "global"
     VERTEX_MODEL_ID: str = "gemini-2.0-flash-exp"
+    VERTEX_RPM_LIMIT: int = 300  # Request / phút phía client (0 = không giới hạn)
+    VERTEX_TPM_LIMIT: int = 1_000_000  # Token / phút phía client (0 = không giới hạn)
+    LLM_ADMISSION_TIMEOUT_SECONDS: float = 10.0  # Chờ budget tối đa trước khi bỏ call (dùng fallback)
+    LLM_MAX_RETRIES: int = 2  # Số lần retry khi Vertex trả 429 (theo Retry-After / backoff)
+    LLM_HEDGE_PERCENTILE: float = 0  # Gửi request thứ hai khi classify / select chậm hơn percentile này (0 = tắt)
+    LLM_HEDGE_MAX_WORKERS: int = 8  # Số request hedge chạy đồng thời tối đa
+    
+    # Latency budget của /api/chat: quá hạn thì trả kết quả xếp hạng local (0 = không giới hạn)
+    CHAT_LATENCY_BUDGET_SECONDS: float = 12.0
+    CHAT_CLASSIFY_TIMEOUT_SECONDS: float = 4.0  # Phần budget tối đa cho bước classify
+    CHAT_RESPONSE_RESERVE_SECONDS: float = 1.0  # Budget giữ lại cho bước sau LLM (ảnh, format)
+    # Single-call: retrieve trước rồi một call Gemini vừa hiểu câu hỏi vừa chọn places ("off" / "on" / "ab")
+    CHAT_SINGLE_CALL_MODE: str = "off"
+    CHAT_SINGLE_CALL_AB_PERCENT: float = 50.0  # % request đi single-call khi mode "ab"
+    
+    # Lịch trình: sinh từng ngày song song (0 = một prompt cho cả chuyến)
+    ITINERARY_DAY_CONCURRENCY: int = 7
+    ITINERARY_CANDIDATES_PER_DAY: int = 8  # Số places ứng viên chia cho mỗi ngày
     
     # OpenWeather
     OPENWEATHER_API_KEY: Optional[str] = None
@@ -56,8 +90,35 @@ class Settings(BaseSettings):
     WEIGHT_RATING: float = 0.2
     WEIGHT_POPULARITY: float = 0.1
     
+    # Hybrid search: fusion BM25 (name / category / about) + semantic
+    HYBRID_FUSION: str = "linear"  # linear | rrf | none (chỉ semantic)
+    HYBRID_LEXICAL_WEIGHT: float = 0.3  # Trọng số của BM25 trong fusion (0..1)
+    HYBRID_RRF_K: int = 60  # Hằng số k của reciprocal rank fusion
+    
     # Model Configuration
     EMBEDDING_MODEL: str = "dangvantuan/vietnamese-embedding"
+    EMBEDDING_BACKEND: str = "torch"  # torch | int8 (quantize động) | onnx
+    EMBEDDING_ONNX_FILE: str = ""  # File ONNX trong repo model, vd "onnx/model_qint8_avx512_vnni.onnx"
+    CATALOG_PRELOAD_LIMIT: int = 5000  # Số places load embeddings khi khởi động (0 = tắt)
+    EMBEDDING_STORE_DTYPE: str = "int8"  # int8 (kèm scale mỗi dòng) | float32 | float16 (chậm khi chấm điểm)
+    EMBEDDING_CACHE_MAX_MB: int = 256  # Giới hạn bộ nhớ cache embeddings của places, evict LRU (0 = không giới hạn)
+    ANN_INDEX_PATH: str = ""  # File IVF index build bởi `python -m app.services.ann_index` (trống = tắt)
+    ANN_NLIST: int = 0  # Số cụm khi build (0 = 4·sqrt(số places))
+    ANN_NPROBE: int = 16  # Số cụm được chấm mỗi query (lớn hơn = recall cao hơn, chậm hơn)
+    EMBEDDING_WRITE_THROUGH: bool = True  # Embed place khi tạo / sửa qua API (background), ghi cột embed
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # Số query tối đa mỗi micro-batch (1 = encode từng query)
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 2.0  # Thời gian tối đa gom query vào một batch
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048  # Số query embedding giữ trong LRU cache (0 = tắt)
+    QUERY_EMBEDDING_CACHE_PATH: str = ""  # File .npz lưu cache giữa các lần khởi động (trống = không lưu)
+    
+    # Observability
+    METRICS_ENABLED: bool = True
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: str = ""  # Mức log theo module: "app.services.place_supabase_service=DEBUG,..."
+    LOG_FORMAT: str = "json"  # "json" hoặc "text"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_BURST: int = 20  # Số record DEBUG tối đa mỗi call site trong một window (0 = không sample)
+    LOG_SAMPLE_WINDOW_SECONDS: float = 60.0
     
     # CORS
     CORS_ORIGINS: list[str] = ["*"]
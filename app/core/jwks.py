@@ -0,0 +1,151 @@
+"""
+JWKS Key Store
+==============
+
+Cache public keys (đã parse sẵn) của Supabase Auth theo `kid`.
+
+- Lookup key là một phép tra dict, không parse JWK mỗi request.
+- JWKS được refresh trong background thread:
+  + khi gặp `kid` chưa biết (key rotation) - caller chờ kết quả refresh
+  + khi keyset cũ hơn refresh_interval - caller dùng key hiện tại, không chờ
+- Singleflight: tại một thời điểm chỉ có tối đa 1 request tới JWKS endpoint,
+  và refresh do `kid` lạ bị giới hạn bởi min_refresh_interval để tránh dồn dập.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from jwt.algorithms import ECAlgorithm, RSAAlgorithm
+
+from app.core.logger import get_logger
+from app.core.metrics import track_outbound
+
+logger = get_logger(__name__)
+
+# Loại key (kty) tương ứng với thuật toán ký trong token header
+ALG_TO_KTY = {
+    "ES256": "EC",
+    "RS256": "RSA",
+}
+
+
+class JWKSKeyStore:
+    """Thread-safe cache of pre-built JWKS public keys keyed by kid."""
+
+    def __init__(
+        self,
+        url: str,
+        refresh_interval: float = 3600.0,
+        min_refresh_interval: float = 30.0,
+        fetch_timeout: float = 5.0,
+    ):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.fetch_timeout = fetch_timeout
+
+        self._keys: Dict[str, Tuple[str, Any]] = {}  # kid -> (kty, public_key)
+        self._jwks: Optional[dict] = None
+        self._fetched_at: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+        self._last_error: Optional[Exception] = None
+        self._inflight: Optional[threading.Event] = None
+        self._lock = threading.Lock()
+
+    @property
+    def jwks(self) -> Optional[dict]:
+        """Raw JWKS document của lần fetch thành công gần nhất."""
+        return self._jwks
+
+    @property
+    def last_error(self) -> Optional[Exception]:
+        """Lỗi của lần refresh gần nhất (None nếu thành công)."""
+        return self._last_error
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._fetched_at is not None
+
+    def refresh_async(self, force: bool = False) -> Optional[threading.Event]:
+        """
+        Bắt đầu refresh JWKS trong background (singleflight).
+
+        Args:
+            force: Bỏ qua min_refresh_interval
+
+        Returns:
+            Event được set khi refresh xong, hoặc None nếu bị giới hạn tần suất
+        """
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight
+
+            now = time.monotonic()
+            if (
+                not force
+                and self._last_attempt is not None
+                and now - self._last_attempt < self.min_refresh_interval
+            ):
+                return None
+
+            done = threading.Event()
+            self._inflight = done
+            self._last_attempt = now
+
+        threading.Thread(target=self._refresh, args=(done,), name="jwks-refresh", daemon=True).start()
+        return done
+
+    def get_key(self, kid: str, wait_timeout: Optional[float] = None) -> Optional[Tuple[str, Any]]:
+        """
+        Lấy (kty, public_key) theo kid.
+
+        Nếu kid chưa có trong cache, kích hoạt refresh và chờ tối đa wait_timeout giây.
+        """
+        entry = self._keys.get(kid)
+
+        if entry is not None:
+            # Stale-while-revalidate: dùng key hiện tại, refresh ngầm
+            if self._fetched_at is not None and time.monotonic() - self._fetched_at > self.refresh_interval:
+                self.refresh_async()
+            return entry
+
+        # Kid lạ (key rotation hoặc lần đầu): chờ refresh chung
+        done = self.refresh_async()
+        if done is not None:
+            done.wait(self.fetch_timeout + 1 if wait_timeout is None else wait_timeout)
+        return self._keys.get(kid)
+
+    def _refresh(self, done: threading.Event) -> None:
+        try:
+            with track_outbound("supabase_auth", "jwks"):
+                response = requests.get(self.url, timeout=self.fetch_timeout)
+            response.raise_for_status()
+            jwks = response.json()
+
+            keys: Dict[str, Tuple[str, Any]] = {}
+            for jwk in jwks.get("keys", []):
+                kid = jwk.get("kid")
+                kty = jwk.get("kty")
+                try:
+                    if kty == "EC":
+                        keys[kid] = (kty, ECAlgorithm.from_jwk(json.dumps(jwk)))
+                    elif kty == "RSA":
+                        keys[kid] = (kty, RSAAlgorithm.from_jwk(json.dumps(jwk)))
+                except Exception as e:
+                    logger.warning("Bỏ qua JWK không hợp lệ (kid=%s): %s", kid, e)
+
+            with self._lock:
+                self._keys = keys
+                self._jwks = jwks
+                self._fetched_at = time.monotonic()
+                self._last_error = None
+        except Exception as e:
+            self._last_error = e
+            logger.warning("Không thể refresh JWKS từ %s: %s", self.url, e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            done.set()
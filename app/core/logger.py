@@ -0,0 +1,230 @@
+"""
+Logging
+=======
+
+Structured logging không chặn request:
+
+- Caller chỉ tạo LogRecord và đẩy vào queue (QueueHandler); format + ghi
+  stdout chạy trong thread riêng (QueueListener). Queue đầy -> bỏ record
+  và đếm, không bao giờ block request.
+- Mức log theo module qua LOG_LEVELS, ví dụ
+  "app.services.place_supabase_service=DEBUG,app.services.gemini_service=WARNING".
+- Mỗi record mang request_id của request hiện tại (contextvar, được set bởi
+  middleware trong main.py), nên log của cùng một request có thể gom lại.
+- Record DEBUG bị sample theo call site: tối đa LOG_SAMPLE_BURST record mỗi
+  LOG_SAMPLE_WINDOW_SECONDS cho mỗi dòng code; số record bị bỏ được ghi vào
+  field `sampled_dropped` của record tiếp theo.
+
+Usage:
+    >>> from app.core.logger import get_logger
+    >>> logger = get_logger(__name__)
+    >>> logger.debug("keyword_search filters: %s", filters)
+
+Luôn truyền tham số kiểu %-format thay vì f-string để message chỉ được
+format khi level đó thực sự được bật.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+# request_id của request đang xử lý ("-" khi ngoài request)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Thuộc tính chuẩn của LogRecord - mọi thuộc tính khác là field từ `extra=`
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "sampled_dropped",
+}
+
+_EXC_FORMATTER = logging.Formatter()
+
+LOG_RECORDS_DROPPED = Counter(
+    "vietspot_log_records_dropped_total",
+    "Log records not emitted (sampled out or queue full)",
+    ("reason",),
+)
+
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger theo tên module (dùng `get_logger(__name__)`)."""
+    return logging.getLogger(name)
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Gắn request_id hiện tại vào record (chạy trong thread của caller)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Giới hạn số record DEBUG trên mỗi call site (logger + dòng code).
+
+    Record từ INFO trở lên luôn được giữ.
+    """
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._sites: Dict[Tuple[str, int], list] = {}  # site -> [window_start, emitted, dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.burst <= 0:
+            return True
+
+        site = (record.name, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None or now - state[0] >= self.window:
+                dropped = state[2] if state is not None else 0
+                self._sites[site] = [now, 1, 0]
+                if dropped:
+                    record.sampled_dropped = dropped
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        LOG_RECORDS_DROPPED.inc(reason="sampled")
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler không bao giờ block: queue đầy thì bỏ record."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Chỉ merge args vào message; JSON/text format để listener thread làm
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="queue_full")
+
+
+class JsonFormatter(logging.Formatter):
+    """Một dòng JSON cho mỗi record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        dropped = getattr(record, "sampled_dropped", None)
+        if dropped:
+            payload["sampled_dropped"] = dropped
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format dễ đọc cho môi trường dev."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        text = super().format(record)
+        dropped = getattr(record, "sampled_dropped", None)
+        if dropped:
+            text += f" (+{dropped} sampled out)"
+        return text
+
+
+def _parse_module_levels(spec: str) -> Dict[str, int]:
+    """Parse "module=LEVEL,module2=LEVEL" -> {module: levelno}."""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        name, level = name.strip(), level.strip().upper()
+        if name and isinstance(logging.getLevelName(level), int):
+            levels[name] = logging.getLevelName(level)
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    Cấu hình root logger với queue handler (idempotent).
+
+    Gọi một lần khi khởi động app, trước khi import các service.
+    """
+    global _listener
+
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if settings.LOG_FORMAT.lower() == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(TextFormatter())
+
+        queue_handler = DroppingQueueHandler(queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE)))
+        queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_BURST, settings.LOG_SAMPLE_WINDOW_SECONDS))
+        queue_handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(settings.LOG_LEVEL.upper())
+
+        for name, level in _parse_module_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush các record còn trong queue và dừng listener thread."""
+    global _listener
+
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
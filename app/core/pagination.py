@@ -0,0 +1,45 @@
+"""
+Pagination Utilities
+====================
+
+Opaque cursor cho keyset pagination.
+Cursor là base64url của JSON {"s": sort, "v": sort_value, "id": last_id},
+client chỉ cần gửi lại nguyên chuỗi nhận được ở trang trước.
+"""
+
+import base64
+import json
+from typing import Any, Dict, Optional
+
+
+class InvalidCursorError(ValueError):
+    """Cursor không hợp lệ hoặc không khớp với kiểu sort hiện tại."""
+
+
+def encode_cursor(sort: str, sort_value: Any, last_id: str) -> str:
+    """Tạo cursor từ sort key và id của phần tử cuối trang."""
+    payload = json.dumps({"s": sort, "v": sort_value, "id": str(last_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], sort: str) -> Optional[Dict[str, Any]]:
+    """
+    Giải mã cursor.
+
+    Returns:
+        {"v": sort_value, "id": last_id} hoặc None nếu không có cursor
+
+    Raises:
+        InvalidCursorError nếu cursor sai định dạng hoặc tạo từ kiểu sort khác
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, last_id = payload["v"], payload["id"]
+    except Exception:
+        raise InvalidCursorError("Cursor không hợp lệ")
+    if payload.get("s") != sort:
+        raise InvalidCursorError("Cursor không khớp với kiểu sắp xếp")
+    return {"v": value, "id": last_id}
@@ -0,0 +1,62 @@
+"""
+Readiness
+=========
+
+Theo dõi các thành phần cần khởi tạo trong background (embedding model,
+catalog, ...). GET /ready trả về 200 chỉ khi mọi thành phần đã đăng ký
+đều sẵn sàng; /health luôn trả về 200 khi process còn sống.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from app.core.metrics import Gauge
+
+COMPONENT_READY = Gauge(
+    "vietspot_component_ready",
+    "1 when a background-initialized component is ready, 0 otherwise",
+    ("component",),
+)
+
+
+class Readiness:
+    """Trạng thái ready của từng component (thread-safe)."""
+
+    def __init__(self):
+        self._components: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, component: str) -> None:
+        """Đăng ký component cần chờ (trạng thái ban đầu: loading)."""
+        with self._lock:
+            self._components.setdefault(component, {"status": "loading", "error": None})
+        COMPONENT_READY.set(0, component=component)
+
+    def mark_ready(self, component: str) -> None:
+        with self._lock:
+            self._components[component] = {"status": "ready", "error": None}
+        COMPONENT_READY.set(1, component=component)
+
+    def mark_failed(self, component: str, error: Exception) -> None:
+        with self._lock:
+            self._components[component] = {"status": "failed", "error": str(error)}
+        COMPONENT_READY.set(0, component=component)
+
+    def is_ready(self, component: Optional[str] = None) -> bool:
+        with self._lock:
+            if component is not None:
+                state = self._components.get(component)
+                return state is not None and state["status"] == "ready"
+            return all(state["status"] == "ready" for state in self._components.values())
+
+    def is_failed(self, component: str) -> bool:
+        with self._lock:
+            state = self._components.get(component)
+            return state is not None and state["status"] == "failed"
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[str]]]:
+        with self._lock:
+            return {name: dict(state) for name, state in self._components.items()}
+
+
+readiness = Readiness()
@@ -40,6 +40,18 @@ class ChatResponse(BaseModel):
     itinerary: Optional[Dict[str, Any]] = Field(None, description="Generated itinerary if query_type is itinerary")
 
 
+class PlaceSelection(BaseModel):
+    """Structured output of Gemini when selecting places and writing the answer"""
+    selected_indices: List[int] = Field(default_factory=list, description="Indices of the selected places in the candidate list")
+    answer: str = Field(default="", description="Answer introducing the selected places (markdown)")
+
+
+class PlaceInterpretation(PlaceSelection):
+    """Structured output of the single-call pipeline (interpret query + select places)"""
+    is_place_search: bool = Field(default=True, description="False for general questions or itinerary requests")
+    original_language: str = Field(default="vi", description="Original language of user query: vi, en, etc.")
+
+
 class QueryClassification(BaseModel):
     """Classification result from Gemini"""
     query_type: str = Field(..., description="general_query, nearby_search, specific_search, itinerary_request")
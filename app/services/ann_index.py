@@ -0,0 +1,238 @@
+"""
+ANN Index
+IVF (inverted file) index cho semantic search trên toàn bộ catalog.
+
+- Build (offline): spherical k-means chia embeddings thành ANN_NLIST cụm
+  (mặc định ~4·sqrt(n)), mỗi place thuộc cụm có centroid gần nhất.
+- Search: chấm điểm các centroid, chỉ chấm các place trong ANN_NPROBE cụm gần
+  nhất (nprobe lớn hơn -> recall cao hơn, chậm hơn; nprobe = nlist là exact).
+- Filtered search: `allowed` là mask bool theo dòng của EmbeddingStore; nếu số
+  dòng hợp lệ nhỏ thì chấm trực tiếp (exact), ngược lại tăng dần nprobe tới khi
+  đủ k kết quả.
+
+Vector nằm trong EmbeddingStore (int8 / float16), index chỉ giữ centroid và số
+thứ tự dòng của từng cụm. File .npz chứa cả store lẫn index.
+
+Build từ Supabase:
+    python -m app.services.ann_index --output data/ann_index.npz
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_store import EmbeddingStore
+
+
+class IVFIndex:
+    """
+    Inverted-file index trên các dòng của một EmbeddingStore.
+
+    Example:
+        >>> index = IVFIndex.build(store, nlist=256)
+        >>> rows, scores = index.search(query_vector, k=20, nprobe=16)
+    """
+
+    def __init__(self, store: EmbeddingStore, centroids: np.ndarray, lists: List[np.ndarray], nprobe: int = 16):
+        self.store = store
+        self.centroids = centroids.astype(np.float32)
+        self.lists = lists
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.lists)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self.lists)
+
+    @classmethod
+    def build(
+        cls,
+        store: EmbeddingStore,
+        nlist: int = 0,
+        nprobe: int = 16,
+        iterations: int = 10,
+        train_size: int = 0,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Train centroid bằng spherical k-means trên mẫu (mặc định 32 dòng mỗi cụm)
+        rồi gán toàn bộ store vào cụm gần nhất.
+        """
+        size = len(store)
+        if size == 0:
+            raise ValueError("EmbeddingStore rỗng, không thể build ANN index")
+        if store.row_count != size:
+            raise ValueError("EmbeddingStore có dòng đã evict (max_bytes), ANN index cần store không giới hạn")
+        nlist = min(size, nlist or max(1, int(4 * math.sqrt(size))))
+        rng = np.random.default_rng(seed)
+
+        train_size = min(size, train_size or nlist * 32)
+        sample_rows = np.sort(rng.choice(size, train_size, replace=False))
+        sample = np.concatenate([block for _, block in store.iter_dense(sample_rows)])
+
+        centroids = sample[rng.choice(train_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=nlist)
+            non_empty = counts > 0
+            sums = np.empty_like(centroids)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[non_empty]
+            sums[non_empty] = np.add.reduceat(sample[order], starts, axis=0)
+            # Cụm rỗng: khởi tạo lại từ một điểm ngẫu nhiên
+            sums[~non_empty] = sample[rng.choice(train_size, int((~non_empty).sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        index = cls(store, centroids, [np.zeros(0, dtype=np.int64) for _ in range(nlist)], nprobe)
+        index.add_rows(np.arange(size))
+        return index
+
+    def add_rows(self, rows: np.ndarray) -> None:
+        """Gán các dòng (mới thêm vào store) vào cụm gần nhất."""
+        rows = np.asarray(rows, dtype=np.int64)
+        assignment = np.empty(len(rows), dtype=np.int64)
+        for start, block in self.store.iter_dense(rows):
+            assignment[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(self.nlist + 1))
+        with self._lock:
+            lists = list(self.lists)
+            for cluster in np.flatnonzero(np.diff(bounds)):
+                lists[cluster] = np.concatenate([lists[cluster], rows[order[bounds[cluster]:bounds[cluster + 1]]]])
+            self.lists = lists
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 20,
+        nprobe: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k dòng gần query nhất.
+
+        Args:
+            query: Query embedding
+            k: Số kết quả
+            nprobe: Số cụm được chấm (mặc định self.nprobe)
+            allowed: Mask bool theo dòng của store (None = không lọc)
+
+        Returns:
+            (rows, scores) sắp xếp theo score giảm dần
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if len(query) == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        nprobe = max(1, min(self.nlist, nprobe or self.nprobe))
+        lists = self.lists
+
+        if allowed is not None:
+            allowed_count = int(allowed.sum())
+            # Filter chọn lọc: chấm thẳng các dòng hợp lệ rẻ hơn (và exact)
+            if allowed_count <= nprobe * len(self) / max(1, self.nlist):
+                return self._top_k(query, np.flatnonzero(allowed), k)
+
+        centroid_order = np.argsort(-(self.centroids @ query))
+        while True:
+            candidates = np.concatenate([lists[c] for c in centroid_order[:nprobe]])
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if len(candidates) >= k or nprobe >= self.nlist:
+                return self._top_k(query, candidates, k)
+            nprobe = min(self.nlist, nprobe * 2)
+
+    def _top_k(self, query: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.store.score_rows(query, rows)
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def save(self, path: str, model_key: str = "", **extra: np.ndarray) -> None:
+        """Lưu store + index (+ mảng phụ, ví dụ thuộc tính) ra file .npz (ghi file tạm rồi rename)."""
+        sizes = np.array([len(rows) for rows in self.lists], dtype=np.int64)
+        rows = np.concatenate(self.lists) if self.lists else np.zeros(0, dtype=np.int64)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            model_key=np.array(model_key),
+            centroids=self.centroids,
+            list_sizes=sizes,
+            list_rows=rows,
+            **self.store.to_arrays(),
+            **extra,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, model_key: str = "", nprobe: int = 16) -> "IVFIndex":
+        """
+        Load index (kèm EmbeddingStore) từ file .npz.
+
+        Raises:
+            ValueError: File được build với model khác model_key
+        """
+        with np.load(path, allow_pickle=False) as data:
+            built_for = str(data["model_key"])
+            if model_key and built_for and built_for != model_key:
+                raise ValueError(f"ANN index {path} được build cho {built_for}, không phải {model_key}")
+            store = EmbeddingStore.from_arrays(data)
+            bounds = np.concatenate([[0], np.cumsum(data["list_sizes"])])
+            rows = data["list_rows"]
+            lists = [rows[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+            return cls(store, data["centroids"], lists, nprobe)
+
+
+def _build_from_supabase(args: argparse.Namespace) -> int:
+    """Load catalog từ Supabase, embed (cột embed hoặc model), build và lưu index."""
+    from app.core.config import settings
+    from app.services.place_supabase_service import PlaceSupabaseService
+    from app.services.semantic_service import SemanticSearchService
+
+    semantic = SemanticSearchService()
+    # Store không giới hạn bộ nhớ: index cần toàn bộ catalog, không evict
+    semantic.places_embeddings = EmbeddingStore(dtype=settings.EMBEDDING_STORE_DTYPE)
+    started = time.perf_counter()
+    fetched = 0
+    for page in PlaceSupabaseService().iter_all_places(columns="id,name,about,category,address,rating,embed"):
+        if not semantic.is_ready and not all(place.get("embed") is not None for place in page):
+            semantic.load_model()
+        semantic.embed_places(page)
+        fetched += len(page)
+        print(f"  embedded {fetched:,} places", end="\r")
+    store = semantic.places_embeddings
+    print(f"Embedded {len(store):,} / {fetched:,} places in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    index = IVFIndex.build(store, nlist=args.nlist, nprobe=settings.ANN_NPROBE)
+    print(f"Built IVF index: {len(index):,} places, nlist={index.nlist} in {time.perf_counter() - started:.1f}s")
+
+    index.save(args.output, model_key=semantic.model_key, **semantic.attributes.to_arrays())
+    print(f"Saved to {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MiB, {store.dtype})")
+    return 0
+
+
+def main(argv=None) -> int:
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Build ANN index cho toàn bộ catalog places")
+    parser.add_argument("--output", default=settings.ANN_INDEX_PATH or "data/ann_index.npz")
+    parser.add_argument("--nlist", type=int, default=settings.ANN_NLIST, help="Số cụm (0 = 4·sqrt(n))")
+    return _build_from_supabase(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
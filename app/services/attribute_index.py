@@ -0,0 +1,282 @@
+"""
+Attribute Index
+Bitmap thuộc tính của các dòng trong EmbeddingStore để lọc TRƯỚC khi chấm
+điểm vector (thay vì rerank rồi mới bỏ place sai quận / sai loại hình).
+
+- city / district: tách từ address ("..., Quận 1, Hồ Chí Minh"), chuẩn hóa
+  không dấu, lowercase ("quan 1", "ho chi minh")
+- category: giá trị cột category đã chuẩn hóa
+- rating: bitmap tích lũy "rating >= b/10" cho b = 0..50 (chính xác với
+  rating một chữ số thập phân như dữ liệu Google Maps)
+
+Mỗi bitmap là mảng uint8 packed (1 bit / dòng). Các giá trị khớp trong cùng
+một field được OR, các field được AND; kết quả unpack thành mask bool theo dòng.
+"""
+
+import math
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ATTRIBUTE_FIELDS = ("city", "district", "category")
+_RATING_BUCKETS = 51  # rating 0.0 .. 5.0, bước 0.1
+
+_CITY_PREFIXES = ("thanh pho ", "tp. ", "tp.", "tp ", "tinh ")
+_ADDRESS_SUFFIXES = {"viet nam", "vietnam"}
+
+# Tên gọi khác của thành phố -> tên trong address
+CITY_ALIASES = {
+    "sai gon": "ho chi minh",
+    "saigon": "ho chi minh",
+    "hcm": "ho chi minh",
+    "tphcm": "ho chi minh",
+    "hanoi": "ha noi",
+    "danang": "da nang",
+}
+
+# Category của classification (tiếng Anh) -> từ khóa trong cột category
+CATEGORY_ALIASES = {
+    "cafe": "ca phe",
+    "coffee": "ca phe",
+    "coffee_shop": "ca phe",
+    "restaurant": "nha hang",
+    "beach": "bien",
+    "museum": "bao tang",
+    "park": "cong vien",
+    "hotel": "khach san",
+    "historical_site": "di tich",
+    "tourist_attraction": "du lich",
+}
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, bỏ dấu tiếng Việt (kể cả đ), gộp khoảng trắng."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFD", str(text).lower().replace("đ", "d"))
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return " ".join(text.split())
+
+
+def parse_address(address: Optional[str]) -> Tuple[str, str]:
+    """(city, district) đã chuẩn hóa từ address dạng "số đường, quận, thành phố"."""
+    parts = [normalize_text(part) for part in (address or "").split(",")]
+    parts = [part for part in parts if part and not part.isdigit() and part not in _ADDRESS_SUFFIXES]
+    if not parts:
+        return "", ""
+    city = parts[-1]
+    for prefix in _CITY_PREFIXES:
+        if city.startswith(prefix):
+            city = city[len(prefix):].strip()
+            break
+    district = parts[-2] if len(parts) >= 3 else ""
+    return city, district
+
+
+class AttributeIndex:
+    """
+    Bitmap city / district / category / rating theo số thứ tự dòng của store.
+
+    Example:
+        >>> attributes = AttributeIndex()
+        >>> attributes.update(rows, places)
+        >>> mask, applied = attributes.mask(len(store), district="Quận 1", min_rating=4.0)
+    """
+
+    def __init__(self):
+        self._capacity = 0  # số dòng mà các bitmap đang chứa được
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {field: {} for field in ATTRIBUTE_FIELDS}
+        self._rating_ge = np.zeros((_RATING_BUCKETS, 0), dtype=np.uint8)
+        self._row_values: Dict[str, List[str]] = {field: [] for field in ATTRIBUTE_FIELDS}
+        self._row_bucket: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._row_bucket)
+
+    def values(self, field: str) -> List[str]:
+        return list(self._bitmaps[field])
+
+    def update(self, rows: Sequence[int], places: Sequence[Dict[str, Any]]) -> None:
+        """Ghi thuộc tính của các place vào dòng tương ứng (ghi đè giá trị cũ)."""
+        if len(rows) == 0:
+            return
+        with self._lock:
+            self._reserve(int(max(rows)) + 1)
+            for row, place in zip(rows, places):
+                row = int(row)
+                city, district = parse_address(place.get("address"))
+                values = {"city": city, "district": district, "category": normalize_text(place.get("category"))}
+                for field, value in values.items():
+                    old = self._row_values[field][row]
+                    if old == value:
+                        continue
+                    if old:
+                        self._clear_bit(self._bitmaps[field][old], row)
+                    if value:
+                        bitmap = self._bitmaps[field].get(value)
+                        if bitmap is None:
+                            bitmap = self._bitmaps[field][value] = np.zeros(self._capacity // 8, dtype=np.uint8)
+                        self._set_bit(bitmap, row)
+                    self._row_values[field][row] = value
+
+                bucket = self._rating_bucket(place.get("rating"))
+                old_bucket = self._row_bucket[row]
+                for b in range(min(bucket, old_bucket) + 1, max(bucket, old_bucket) + 1):
+                    if bucket > old_bucket:
+                        self._set_bit(self._rating_ge[b], row)
+                    else:
+                        self._clear_bit(self._rating_ge[b], row)
+                self._row_bucket[row] = bucket
+
+    def match(self, field: str, text: Optional[str]) -> List[str]:
+        """
+        Các giá trị của field khớp text: sau chuẩn hóa, một bên chứa bên kia
+        theo nguyên từ ("quan 1" khớp "quan 1" nhưng không khớp "quan 10").
+        """
+        query = normalize_text(text)
+        if field == "city":
+            for prefix in _CITY_PREFIXES:
+                if query.startswith(prefix):
+                    query = query[len(prefix):].strip()
+                    break
+            query = CITY_ALIASES.get(query, query)
+        elif field == "category":
+            query = CATEGORY_ALIASES.get(query, query.replace("_", " "))
+        if not query:
+            return []
+        padded = f" {query} "
+        return [value for value in self._bitmaps[field] if padded in f" {value} " or f" {value} " in padded]
+
+    def mask(
+        self,
+        size: int,
+        location: Optional[str] = None,
+        city: Optional[str] = None,
+        district: Optional[str] = None,
+        category: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        max_rating: Optional[float] = None,
+    ) -> Tuple[Optional[np.ndarray], List[str]]:
+        """
+        Mask bool (độ dài size) của các dòng thỏa mọi điều kiện resolve được.
+
+        Điều kiện không khớp giá trị nào trong catalog (ví dụ tên đường) bị bỏ
+        qua thay vì loại hết. location chỉ dùng khi không có city / district.
+
+        Returns:
+            (mask hoặc None nếu không có điều kiện nào áp dụng, danh sách field đã áp dụng)
+        """
+        with self._lock:
+            combined = None
+            applied = []
+
+            def intersect(bitmap: np.ndarray, name: str) -> None:
+                nonlocal combined
+                combined = bitmap.copy() if combined is None else np.bitwise_and(combined, bitmap)
+                applied.append(name)
+
+            for field, text in (("city", city), ("district", district), ("category", category)):
+                bitmap = self._union(field, self.match(field, text)) if text else None
+                if bitmap is not None:
+                    intersect(bitmap, field)
+
+            if location and "city" not in applied and "district" not in applied:
+                matches = [
+                    bitmap for bitmap in (
+                        self._union("city", self.match("city", location)),
+                        self._union("district", self.match("district", location)),
+                    ) if bitmap is not None
+                ]
+                if matches:
+                    intersect(np.bitwise_or.reduce(matches), "location")
+
+            if min_rating is not None:
+                bucket = max(0, math.ceil(min_rating * 10 - 1e-6))
+                intersect(self._rating_ge[bucket] if bucket < _RATING_BUCKETS else np.zeros_like(self._rating_ge[0]), "min_rating")
+            if max_rating is not None:
+                bucket = math.floor(max_rating * 10 + 1e-6) + 1
+                above = self._rating_ge[bucket] if bucket < _RATING_BUCKETS else np.zeros_like(self._rating_ge[0])
+                intersect(np.bitwise_and(self._rating_ge[0], np.bitwise_not(above)), "max_rating")
+
+        if combined is None:
+            return None, applied
+        mask = np.unpackbits(combined, count=min(size, self._capacity)).astype(bool)
+        if len(mask) < size:
+            mask = np.concatenate([mask, np.zeros(size - len(mask), dtype=bool)])
+        return mask, applied
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Thuộc tính từng dòng để lưu kèm ANN index (bitmap được dựng lại khi load)."""
+        return {
+            "attr_city": np.array(self._row_values["city"], dtype=str),
+            "attr_district": np.array(self._row_values["district"], dtype=str),
+            "attr_category": np.array(self._row_values["category"], dtype=str),
+            "attr_rating_bucket": np.array(self._row_bucket, dtype=np.int16),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "AttributeIndex":
+        index = cls()
+        size = len(arrays["attr_rating_bucket"])
+        index._reserve(size)
+        for field in ATTRIBUTE_FIELDS:
+            column = arrays[f"attr_{field}"]
+            uniques, inverse = np.unique(column, return_inverse=True)
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.searchsorted(inverse[order], np.arange(len(uniques) + 1))
+            for code, value in enumerate(uniques.tolist()):
+                if value:
+                    bits = np.zeros(index._capacity, dtype=bool)
+                    bits[order[bounds[code]:bounds[code + 1]]] = True
+                    index._bitmaps[field][value] = np.packbits(bits)
+            index._row_values[field][:size] = column.tolist()
+        buckets = arrays["attr_rating_bucket"].astype(np.int64)
+        for b in range(_RATING_BUCKETS):
+            index._rating_ge[b] = np.packbits(np.concatenate([buckets >= b, np.zeros(index._capacity - size, dtype=bool)]))
+        index._row_bucket[:size] = buckets.tolist()
+        return index
+
+    @staticmethod
+    def _rating_bucket(rating: Any) -> int:
+        """Bucket 0..50 của rating, -1 nếu không có rating."""
+        try:
+            value = float(rating)
+        except (TypeError, ValueError):
+            return -1
+        if math.isnan(value):
+            return -1
+        return int(min(_RATING_BUCKETS - 1, max(0, round(value * 10))))
+
+    def _union(self, field: str, values: List[str]) -> Optional[np.ndarray]:
+        bitmaps = [self._bitmaps[field][value] for value in values]
+        if not bitmaps:
+            return None
+        return bitmaps[0] if len(bitmaps) == 1 else np.bitwise_or.reduce(bitmaps)
+
+    @staticmethod
+    def _set_bit(bitmap: np.ndarray, row: int) -> None:
+        bitmap[row >> 3] |= np.uint8(0x80 >> (row & 7))
+
+    @staticmethod
+    def _clear_bit(bitmap: np.ndarray, row: int) -> None:
+        bitmap[row >> 3] &= np.uint8(~(0x80 >> (row & 7)) & 0xFF)
+
+    def _reserve(self, size: int) -> None:
+        """Mở rộng mọi bitmap (gấp đôi, bội số của 8 dòng) để chứa `size` dòng."""
+        if len(self._row_bucket) < size:
+            missing = size - len(self._row_bucket)
+            for field in ATTRIBUTE_FIELDS:
+                self._row_values[field].extend([""] * missing)
+            self._row_bucket.extend([-1] * missing)
+        if size <= self._capacity:
+            return
+        capacity = max(1024, self._capacity * 2, (size + 7) // 8 * 8)
+        grow = (capacity - self._capacity) // 8
+        for field in ATTRIBUTE_FIELDS:
+            for value, bitmap in self._bitmaps[field].items():
+                self._bitmaps[field][value] = np.concatenate([bitmap, np.zeros(grow, dtype=np.uint8)])
+        self._rating_ge = np.concatenate([self._rating_ge, np.zeros((_RATING_BUCKETS, grow), dtype=np.uint8)], axis=1)
+        self._capacity = capacity
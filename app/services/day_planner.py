@@ -0,0 +1,124 @@
+"""
+Day Planner
+Chia places ứng viên của lịch trình nhiều ngày thành từng ngày TRƯỚC khi gọi
+Gemini, để mỗi ngày được sinh bằng một prompt riêng (song song).
+
+- Pool: lấy luân phiên theo category (giữ thứ tự điểm trong mỗi category) để
+  mỗi ngày có đủ loại hình thay vì dồn hết bãi biển vào ngày đầu.
+- Phân cụm địa lý: k-means trên (lat, lon) với k = số ngày, khởi tạo
+  farthest-point (tất định), gán có giới hạn sức chứa để các ngày đều nhau;
+  place không có tọa độ chia vào ngày còn chỗ.
+- Các ngày xếp theo place hạng cao nhất trong cụm (cụm tốt nhất là ngày 1).
+- Chủ đề gợi ý của ngày: các category chiếm nhiều nhất trong cụm.
+"""
+
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_KMEANS_ITERATIONS = 10
+
+
+def _has_coordinates(place: Dict[str, Any]) -> bool:
+    return place.get('latitude') is not None and place.get('longitude') is not None
+
+
+def select_pool(places: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+    """Tối đa `size` places, luân phiên giữa các category theo thứ tự xuất hiện."""
+    by_category: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for place in places:
+        by_category[place.get('category') or ''].append(place)
+    queues = list(by_category.values())
+    pool = []
+    depth = 0
+    while len(pool) < size and any(depth < len(queue) for queue in queues):
+        for queue in queues:
+            if depth < len(queue) and len(pool) < size:
+                pool.append(queue[depth])
+        depth += 1
+    return pool
+
+
+def _farthest_point_centers(points: np.ndarray, k: int) -> np.ndarray:
+    centers = [0]  # place xếp hạng cao nhất
+    distances = np.linalg.norm(points - points[0], axis=1)
+    while len(centers) < k:
+        nxt = int(np.argmax(distances))
+        centers.append(nxt)
+        distances = np.minimum(distances, np.linalg.norm(points - points[nxt], axis=1))
+    return points[centers].copy()
+
+
+def _balanced_assign(points: np.ndarray, centers: np.ndarray, capacity: int) -> np.ndarray:
+    """Gán mỗi điểm vào center gần nhất còn chỗ (xét các cặp gần nhất trước)."""
+    distances = np.linalg.norm(points[:, None, :] - centers[None, :, :], axis=2)
+    labels = np.full(len(points), -1, dtype=np.int64)
+    load = np.zeros(len(centers), dtype=np.int64)
+    for flat in np.argsort(distances, axis=None, kind="stable"):
+        point, center = divmod(int(flat), len(centers))
+        if labels[point] == -1 and load[center] < capacity:
+            labels[point] = center
+            load[center] += 1
+    return labels
+
+
+def partition_places(
+    places: List[Dict[str, Any]],
+    num_days: int,
+    per_day: int = 8,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Chia places (đã xếp hạng) thành num_days nhóm rời nhau, mỗi nhóm tối đa
+    per_day places gần nhau về địa lý.
+
+    Returns:
+        Danh sách num_days nhóm (nhóm có thể rỗng nếu thiếu places)
+    """
+    if num_days <= 0:
+        return []
+    pool = select_pool(places, num_days * per_day)
+    located = [p for p in pool if _has_coordinates(p)]
+    unlocated = [p for p in pool if not _has_coordinates(p)]
+    days: List[List[Dict[str, Any]]] = [[] for _ in range(num_days)]
+
+    if len(located) >= num_days > 1:
+        points = np.array([[float(p['latitude']), float(p['longitude'])] for p in located])
+        # Kinh độ co lại theo vĩ độ: khoảng cách gần đúng theo km
+        points[:, 1] *= np.cos(np.radians(points[:, 0].mean()))
+        centers = _farthest_point_centers(points, num_days)
+        capacity = -(-len(located) // num_days)  # chia đều, place không tọa độ lấp phần còn lại
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = _balanced_assign(points, centers, capacity)
+            updated = np.array([
+                points[labels == c].mean(axis=0) if np.any(labels == c) else centers[c]
+                for c in range(num_days)
+            ])
+            if np.allclose(updated, centers):
+                break
+            centers = updated
+        for place, label in zip(located, labels):
+            days[int(label)].append(place)
+    else:
+        unlocated = located + unlocated
+
+    for place in unlocated:
+        open_days = [day for day in days if len(day) < per_day]
+        if not open_days:
+            break
+        min(open_days, key=len).append(place)
+
+    # Giữ thứ tự xếp hạng trong ngày; ngày có place hạng cao hơn đi trước
+    rank = {id(place): i for i, place in enumerate(pool)}
+    for day in days:
+        day.sort(key=lambda place: rank[id(place)])
+    days.sort(key=lambda day: rank[id(day[0])] if day else len(pool))
+    return days
+
+
+def theme_hint(places: List[Dict[str, Any]], top: int = 2) -> Optional[str]:
+    """Các category chiếm nhiều nhất của một ngày ("Bãi biển, Bảo tàng")."""
+    counts = Counter(p.get('category') for p in places if p.get('category'))
+    if not counts:
+        return None
+    return ", ".join(category for category, _ in counts.most_common(top))
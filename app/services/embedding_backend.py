@@ -0,0 +1,90 @@
+"""
+Embedding Backend
+Load SentenceTransformer với backend inference chọn qua settings.EMBEDDING_BACKEND:
+
+- "torch": PyTorch float32 (mặc định)
+- "int8":  PyTorch với các lớp Linear được quantize động sang int8 (CPU)
+- "onnx":  ONNX Runtime (cần `pip install sentence-transformers[onnx]`,
+           sentence-transformers >= 3.2 - bản đầu tiên có tham số backend).
+           EMBEDDING_ONNX_FILE chọn file trong repo model, ví dụ
+           "onnx/model_qint8_avx512_vnni.onnx" cho bản int8 đã export sẵn;
+           để trống thì dùng onnx/model.onnx (tự export nếu repo chưa có).
+
+Mọi backend trả về object có cùng interface `encode()` của SentenceTransformer.
+Độ lệch so với model float đo bằng benchmarks/bench_embedding_backends.py.
+"""
+
+import importlib.metadata
+import importlib.util
+import re
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+# SentenceTransformer(backend=..., model_kwargs=...) có từ sentence-transformers 3.2
+_ONNX_MIN_ST_VERSION = (3, 2)
+
+
+def _installed_version(package: str) -> Optional[Tuple[int, ...]]:
+    try:
+        version = importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    return tuple(int(part) for part in re.findall(r"\d+", version)[:2])
+
+
+def backend_available(backend: str) -> bool:
+    """Kiểm tra dependency tùy chọn của backend đã được cài chưa."""
+    if backend == "onnx":
+        st_version = _installed_version("sentence-transformers")
+        if st_version is None or st_version < _ONNX_MIN_ST_VERSION:
+            return False
+        return all(importlib.util.find_spec(name) is not None for name in ("onnxruntime", "optimum"))
+    return backend in EMBEDDING_BACKENDS
+
+
+def load_embedding_model(
+    model_name: Optional[str] = None,
+    backend: Optional[str] = None,
+    onnx_file: Optional[str] = None,
+):
+    """
+    Load embedding model với backend được chọn.
+
+    Args:
+        model_name: Tên/đường dẫn model (mặc định settings.EMBEDDING_MODEL)
+        backend: "torch", "int8" hoặc "onnx" (mặc định settings.EMBEDDING_BACKEND)
+        onnx_file: File ONNX trong repo model (mặc định settings.EMBEDDING_ONNX_FILE)
+
+    Returns:
+        SentenceTransformer đã sẵn sàng encode
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model_name = model_name or settings.EMBEDDING_MODEL
+    backend = (backend or settings.EMBEDDING_BACKEND).lower()
+    onnx_file = settings.EMBEDDING_ONNX_FILE if onnx_file is None else onnx_file
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND phải là một trong {EMBEDDING_BACKENDS}, nhận được '{backend}'")
+
+    if backend == "onnx":
+        if not backend_available("onnx"):
+            # Thiếu optimum/onnxruntime hoặc sentence-transformers < 3.2: vẫn chạy được với PyTorch
+            logger.warning("ONNX backend requires sentence-transformers[onnx] >= 3.2, falling back to torch")
+            return SentenceTransformer(model_name)
+        model_kwargs = {"file_name": onnx_file} if onnx_file else None
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    if backend == "int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+
+    return SentenceTransformer(model_name)
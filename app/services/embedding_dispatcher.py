@@ -0,0 +1,132 @@
+"""
+Embedding Dispatcher
+Micro-batching cho query embedding.
+
+Khi nhiều request cần embed_query cùng lúc, thay vì mỗi request chạy một
+forward pass batch-of-one, dispatcher gom các query đang chờ trong tối đa
+EMBEDDING_BATCH_MAX_WAIT_MS hoặc EMBEDDING_BATCH_MAX_SIZE phần tử, chạy một
+lần `model.encode` cho cả batch rồi trả kết quả về future của từng caller.
+
+Worker là một daemon thread nên dùng được từ cả thread pool (asyncio.to_thread)
+lẫn code sync; caller chỉ block trên future của mình.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.core.logger import get_logger
+from app.core.metrics import Histogram
+
+logger = get_logger(__name__)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "vietspot_embedding_batch_size",
+    "Number of queries encoded per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBEDDING_BATCH_DURATION = Histogram(
+    "vietspot_embedding_batch_duration_seconds",
+    "Latency of one batched model.encode call",
+)
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "vietspot_embedding_queue_wait_seconds",
+    "Time a query waits in the dispatcher before its batch starts encoding",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+
+class EmbeddingDispatcher:
+    """
+    Gom query thành batch cho một hàm encode(texts) -> ndarray (n, dim).
+
+    Example:
+        >>> dispatcher = EmbeddingDispatcher(lambda texts: model.encode(texts), max_batch_size=32, max_wait_ms=2)
+        >>> vector = dispatcher.encode("quán cà phê yên tĩnh")
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._last_batch_size = 1
+
+    def submit(self, text: str) -> Future:
+        """Đưa query vào hàng đợi, trả về Future chứa embedding."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str, timeout: float = None) -> np.ndarray:
+        """Encode một query qua batch (blocking)."""
+        return self.submit(text).result(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-dispatcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future, float]]:
+        """
+        Chờ query đầu tiên, rồi gom thêm đến khi đủ batch hoặc hết max_wait.
+
+        Chỉ chờ max_wait khi batch trước có nhiều hơn một query (đang có tải
+        đồng thời); request đơn lẻ được encode ngay, không cộng thêm độ trễ.
+        """
+        batch = [self._queue.get()]
+        wait = self.max_wait if self._last_batch_size > 1 else 0.0
+        deadline = time.perf_counter() + wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        self._last_batch_size = len(batch)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: Sequence[Tuple[str, Future, float]]) -> None:
+        started = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            EMBEDDING_QUEUE_WAIT.observe(started - enqueued_at)
+
+        # Query trùng nhau trong cùng batch chỉ encode một lần
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        try:
+            embeddings = np.asarray(self.encode_batch(texts))
+        except Exception as e:
+            logger.error("Batched encode of %d queries failed: %s", len(texts), e)
+            for _, future, _ in batch:
+                if not future.cancelled():
+                    future.set_exception(e)
+            return
+        finally:
+            EMBEDDING_BATCH_DURATION.observe(time.perf_counter() - started)
+            EMBEDDING_BATCH_SIZE.observe(len(texts))
+
+        by_text = dict(zip(texts, embeddings))
+        for text, future, _ in batch:
+            if not future.cancelled():
+                future.set_result(by_text[text])
@@ -0,0 +1,339 @@
+"""
+Embedding Store
+Lưu embeddings của catalog trong ma trận liên tục với độ chính xác giảm:
+
+- "float32": như model trả về (tham chiếu)
+- "float16": một nửa bộ nhớ, sai số cosine ~1e-4, nhưng chấm điểm chậm hơn
+             float32 ~10x (numpy đổi float16 -> float32 không vector hóa)
+- "int8":    1/4 bộ nhớ + một scale float32 mỗi dòng (quantize đối xứng max-abs),
+             chấm điểm gần bằng float32 - mặc định
+
+Vector được chuẩn hóa L2 khi thêm vào nên cosine similarity = tích vô hướng.
+Khi chấm điểm, các dòng được dequantize theo từng khối sang float32 rồi nhân
+ma trận với query, không giữ bản float32 của cả catalog.
+
+Thay cho dict {place_id: np.ndarray}: vẫn hỗ trợ `in`, `len()`, `store[id]`.
+Recall / bộ nhớ so với float32: benchmarks/bench_embedding_store.py.
+
+Cache dùng chung giữa các request:
+- mỗi dòng kèm digest nội dung (hash của text đã embed), place đổi nội dung
+  thì `lookup` báo miss và được embed lại
+- `max_bytes` > 0: giới hạn bộ nhớ, vượt thì evict các dòng lâu không được
+  chấm điểm nhất (LRU theo tick) và dùng lại dòng trống
+- reader không lock: dòng bị evict được gỡ khỏi `_ids` trước khi ghi đè, nên
+  caller kiểm tra `owns(rows, ids)` sau khi chấm điểm để bỏ kết quả cũ
+"""
+
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.metrics import Counter, Gauge
+
+EMBEDDING_STORE_DTYPES = ("float32", "float16", "int8")
+
+EMBEDDING_STORE_BYTES = Gauge(
+    "vietspot_embedding_store_bytes",
+    "Memory used by cached place embeddings",
+)
+EMBEDDING_STORE_EVICTIONS = Counter(
+    "vietspot_embedding_store_evictions_total",
+    "Place embeddings evicted from the byte-capped store (LRU)",
+)
+
+# Số dòng dequantize mỗi lần khi chấm điểm (buffer float32 vừa L2 cache)
+_SCORE_CHUNK_ROWS = 256
+
+
+class EmbeddingStore:
+    """
+    Ma trận embeddings (float32 / float16 / int8) keyed theo place id.
+
+    Example:
+        >>> store = EmbeddingStore(dtype="int8")
+        >>> store.add(["a", "b"], np.random.rand(2, 768))
+        >>> ids, scores = store.score(query_vector, ["a", "b", "missing"])
+    """
+
+    def __init__(self, dtype: str = "int8", initial_capacity: int = 1024, max_bytes: int = 0):
+        if dtype not in EMBEDDING_STORE_DTYPES:
+            raise ValueError(f"EMBEDDING_STORE_DTYPE phải là một trong {EMBEDDING_STORE_DTYPES}, nhận được '{dtype}'")
+        self.dtype = dtype
+        self.dim = None
+        self.max_bytes = max(0, max_bytes)
+        self._initial_capacity = max(1, initial_capacity)
+        self._matrix = None
+        self._scales = np.ones(0, dtype=np.float32)
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._tick = 0
+        self._rows: Dict[Hashable, int] = {}
+        self._ids: List[Optional[Hashable]] = []  # theo dòng, None = dòng trống (đã evict)
+        self._digests: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, place_id: Hashable) -> bool:
+        return place_id in self._rows
+
+    def __getitem__(self, place_id: Hashable) -> np.ndarray:
+        """Vector float32 (đã chuẩn hóa) của một place."""
+        row = self._rows[place_id]
+        return self._dequantize(slice(row, row + 1))[0]
+
+    def __setitem__(self, place_id: Hashable, vector: np.ndarray) -> None:
+        self.add([place_id], np.asarray(vector)[None, :])
+
+    @property
+    def ids(self) -> List[Hashable]:
+        return [place_id for place_id in self._ids if place_id is not None]
+
+    @property
+    def row_count(self) -> int:
+        """Số dòng đã cấp phát (kể cả dòng trống), độ dài của mask theo dòng."""
+        return len(self._ids)
+
+    @property
+    def row_bytes(self) -> int:
+        if self.dim is None:
+            return 0
+        return self.dim * np.dtype(self.dtype).itemsize + (4 if self.dtype == "int8" else 0)
+
+    @property
+    def nbytes(self) -> int:
+        """Bộ nhớ của phần đang dùng (ma trận + scales)."""
+        return len(self._rows) * self.row_bytes
+
+    def lookup(self, ids: Sequence[Hashable], digests: Sequence[Optional[str]] = None) -> np.ndarray:
+        """
+        Mask bool: id có trong store và digest khớp (dòng không có digest, ví dụ
+        load từ ANN index, hoặc digest=None được coi là khớp).
+        """
+        found = np.zeros(len(ids), dtype=bool)
+        for i, place_id in enumerate(ids):
+            row = self._rows.get(place_id)
+            if row is None:
+                continue
+            stored = self._digests[row]
+            found[i] = digests is None or digests[i] is None or stored is None or stored == digests[i]
+        return found
+
+    def add(self, ids: Sequence[Hashable], vectors: np.ndarray, digests: Sequence[Optional[str]] = None) -> None:
+        """Thêm / ghi đè embeddings (vectors shape (n, dim)), kèm digest nội dung nếu có."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(ids) == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError(f"Cần {len(ids)} vector, nhận được shape {vectors.shape}")
+        digests = list(digests) if digests is not None else [None] * len(ids)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        quantized, scales = self._quantize(vectors)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} khác dim của store ({self.dim})")
+
+            new_ids = list(dict.fromkeys(place_id for place_id in ids if place_id not in self._rows))
+            if self.max_bytes:
+                overflow = len(self._rows) + len(new_ids) - max(1, self.max_bytes // self.row_bytes)
+                if overflow > 0:
+                    self._evict(overflow, keep=[self._rows[place_id] for place_id in ids if place_id in self._rows])
+
+            new_rows: Dict[Hashable, int] = {}
+            appended = 0
+            for place_id in new_ids:
+                if self._free:
+                    new_rows[place_id] = self._free.pop()
+                else:
+                    new_rows[place_id] = len(self._ids) + appended
+                    appended += 1
+            rows = np.fromiter(
+                (self._rows.get(place_id, new_rows.get(place_id)) for place_id in ids), dtype=np.int64, count=len(ids)
+            )
+            self._reserve(len(self._ids) + appended)
+            self._matrix[rows] = quantized
+            self._scales[rows] = scales
+            self._tick += 1
+            self._last_used[rows] = self._tick
+            for row, digest in zip(rows.tolist(), digests):
+                self._digests[row] = digest
+            # Ghi dữ liệu trước rồi mới công bố row mới cho score() (không lock)
+            self._ids.extend([None] * appended)
+            for place_id, row in new_rows.items():
+                self._ids[row] = place_id
+            self._rows.update(new_rows)
+        EMBEDDING_STORE_BYTES.set(self.nbytes)
+
+    def score(self, query: np.ndarray, ids: Iterable[Hashable] = None) -> Tuple[List[Hashable], np.ndarray]:
+        """
+        Cosine similarity giữa query và các place (mặc định toàn bộ store).
+
+        Returns:
+            (ids có embedding, scores float32 cùng thứ tự); id không có trong store bị bỏ qua
+        """
+        if ids is None:
+            if len(self._rows) == len(self._ids):
+                found = list(self._ids)
+                return found, self.score_rows(query, count=len(found))
+            ids = self.ids
+        ids = list(ids)
+        rows = self.find_rows(ids)
+        present = rows >= 0
+        ids = [place_id for place_id, ok in zip(ids, present) if ok]
+        rows = rows[present]
+        scores = self.score_rows(query, rows)
+        valid = self.owns(rows, ids)
+        return [place_id for place_id, ok in zip(ids, valid) if ok], scores[valid]
+
+    def score_rows(self, query: np.ndarray, rows: np.ndarray = None, count: int = None) -> np.ndarray:
+        """
+        Cosine similarity theo số thứ tự dòng (dùng bởi ANN index / bitmap filter).
+        rows=None: `count` dòng đầu tiên (mặc định toàn bộ store).
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        size = len(rows) if rows is not None else (len(self._ids) if count is None else count)
+        if norm == 0 or self.dim is None or query.shape[0] != self.dim:
+            return np.zeros(size, dtype=np.float32)
+        query = query / norm
+
+        if rows is None:
+            # Toàn bộ store: dùng slice liên tục, không copy qua fancy indexing
+            chunks = [slice(start, min(start + _SCORE_CHUNK_ROWS, size)) for start in range(0, size, _SCORE_CHUNK_ROWS)]
+        else:
+            chunks = [rows[start:start + _SCORE_CHUNK_ROWS] for start in range(0, size, _SCORE_CHUNK_ROWS)]
+
+        self._tick += 1
+        self._last_used[rows if rows is not None else slice(0, size)] = self._tick
+
+        scores = np.empty(size, dtype=np.float32)
+        buffer = None if self.dtype == "float32" else np.empty((_SCORE_CHUNK_ROWS, self.dim), dtype=np.float32)
+        offset = 0
+        for chunk in chunks:
+            block = self._matrix[chunk]
+            if buffer is not None:
+                # Dequantize vào buffer float32 dùng lại giữa các khối (vừa cache CPU)
+                dense = buffer[:len(block)]
+                np.copyto(dense, block)
+                block = dense
+            block_scores = block @ query
+            if self.dtype == "int8":
+                # Nhân scale vào điểm thay vì vào từng phần tử của vector
+                block_scores *= self._scales[chunk]
+            scores[offset:offset + len(block_scores)] = block_scores
+            offset += len(block_scores)
+        return scores
+
+    def rows_of(self, ids: Sequence[Hashable]) -> np.ndarray:
+        """Số thứ tự dòng của các id (id phải có trong store)."""
+        return np.fromiter((self._rows[place_id] for place_id in ids), dtype=np.int64, count=len(ids))
+
+    def find_rows(self, ids: Sequence[Hashable]) -> np.ndarray:
+        """Như rows_of nhưng id không có trong store (hoặc vừa bị evict) cho -1."""
+        return np.fromiter((self._rows.get(place_id, -1) for place_id in ids), dtype=np.int64, count=len(ids))
+
+    def owns(self, rows: np.ndarray, ids: Sequence[Hashable]) -> np.ndarray:
+        """Mask bool: dòng vẫn thuộc id tương ứng (không bị evict trong lúc chấm điểm)."""
+        current = self._ids
+        return np.fromiter((current[row] == place_id for row, place_id in zip(rows.tolist(), ids)), dtype=bool, count=len(ids))
+
+    def ids_at(self, rows: Iterable[int]) -> List[Hashable]:
+        return [self._ids[row] for row in rows]
+
+    def iter_dense(self, rows: np.ndarray = None, chunk_rows: int = 4096):
+        """Duyệt (offset, block float32) theo khối, dùng khi train / gán cụm cho ANN index."""
+        if rows is None:
+            rows = np.arange(len(self._ids)) if len(self._rows) == len(self._ids) else np.sort(self.find_rows(self.ids))
+        for start in range(0, len(rows), chunk_rows):
+            yield start, self._dequantize(rows[start:start + chunk_rows])
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Dữ liệu của store để lưu bằng np.savez (xem from_arrays)."""
+        size = len(self._ids)
+        if len(self._rows) != size:
+            raise ValueError("EmbeddingStore có dòng đã evict, chỉ lưu được store không giới hạn max_bytes")
+        return {
+            "store_dtype": np.array(self.dtype),
+            "store_ids": np.array(self._ids),
+            "store_matrix": self._matrix[:size] if self._matrix is not None else np.zeros((0, 0), dtype=np.float32),
+            "store_scales": self._scales[:size],
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "EmbeddingStore":
+        store = cls(dtype=str(arrays["store_dtype"]), initial_capacity=max(1, len(arrays["store_ids"])))
+        ids = arrays["store_ids"].tolist()
+        matrix = arrays["store_matrix"]
+        if ids:
+            store.dim = matrix.shape[1]
+            store._reserve(len(ids))
+            store._matrix[:len(ids)] = matrix
+            store._scales[:len(ids)] = arrays["store_scales"]
+            store._ids = list(ids)
+            store._rows = {place_id: row for row, place_id in enumerate(ids)}
+        return store
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._ids.clear()
+            self._digests = [None] * len(self._digests)
+            self._free.clear()
+        EMBEDDING_STORE_BYTES.set(0)
+
+    def _evict(self, count: int, keep: Sequence[int] = ()) -> None:
+        """Gỡ `count` dòng ít được dùng gần đây nhất (trừ `keep`), đưa vào danh sách dòng trống."""
+        candidates = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        if len(keep):
+            candidates = candidates[~np.isin(candidates, keep)]
+        count = min(count, len(candidates))
+        if count <= 0:
+            return
+        victims = candidates[np.argpartition(self._last_used[candidates], count - 1)[:count]]
+        for row in victims.tolist():
+            del self._rows[self._ids[row]]
+            self._ids[row] = None
+            self._digests[row] = None
+            self._free.append(row)
+        EMBEDDING_STORE_EVICTIONS.inc(count)
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scales = np.ones(len(vectors), dtype=np.float32)
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), scales
+        if self.dtype == "int8":
+            max_abs = np.abs(vectors).max(axis=1)
+            scales = np.where(max_abs == 0, 1, max_abs / 127).astype(np.float32)
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales
+        return vectors, scales
+
+    def _dequantize(self, rows) -> np.ndarray:
+        block = self._matrix[rows].astype(np.float32, copy=False)
+        if self.dtype == "int8":
+            block *= self._scales[rows][:, None]
+        return block
+
+    def _reserve(self, size: int) -> None:
+        """Tăng capacity (gấp đôi) để add nhiều lần không copy lại ma trận mỗi lần."""
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, self._initial_capacity)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.dtype(self.dtype))
+        scales = np.ones(new_capacity, dtype=np.float32)
+        last_used = np.zeros(new_capacity, dtype=np.int64)
+        if self._matrix is not None:
+            matrix[:capacity] = self._matrix
+            scales[:capacity] = self._scales
+            last_used[:capacity] = self._last_used
+        self._matrix = matrix
+        self._scales = scales
+        self._last_used = last_used
+        self._digests.extend([None] * (new_capacity - len(self._digests)))
@@ -0,0 +1,142 @@
+"""
+Embedding Writer
+Write-through embedding cho place được tạo / sửa qua API.
+
+POST /api/places và PUT /api/places/{id} chỉ đưa place vào hàng đợi (không
+chờ model). Một daemon thread gom các place đang chờ thành batch, encode
+name + about + category, ghi cột `embed` vào Supabase rồi cập nhật store,
+bitmap thuộc tính và ANN index trong bộ nhớ - lần search sau dùng được ngay
+fast path (embed có sẵn) thay vì encode lại trong request.
+
+Place sửa nhiều lần khi còn trong hàng đợi chỉ được encode một lần (bản mới
+nhất). Khi model chưa load xong, worker chờ warmup thay vì bỏ place; nếu
+load model thất bại (readiness "embedding_model" failed) thì bỏ batch.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from app.core.logger import get_logger
+from app.core.metrics import Counter, Gauge
+from app.core.readiness import readiness
+
+logger = get_logger(__name__)
+
+PLACE_EMBEDDING_WRITES = Counter(
+    "vietspot_place_embedding_writes_total",
+    "Write-through place embeddings by result (persisted / failed / skipped)",
+    ("result",),
+)
+PLACE_EMBEDDING_QUEUE_DEPTH = Gauge(
+    "vietspot_place_embedding_queue_depth",
+    "Number of places waiting for a write-through embedding",
+)
+
+# Các field ảnh hưởng tới embedding hoặc bitmap thuộc tính của place
+EMBEDDED_FIELDS = ("name", "about", "category", "address", "rating")
+
+
+class PlaceEmbeddingWriter:
+    """
+    Hàng đợi embedding cho place mới / vừa sửa.
+
+    Example:
+        >>> writer = PlaceEmbeddingWriter(semantic, persist=supabase.update_place_embedding)
+        >>> writer.enqueue(created_place)
+    """
+
+    def __init__(
+        self,
+        semantic: Any,
+        persist: Callable[[Any, List[float]], bool],
+        batch_size: int = 32,
+        ready_poll_seconds: float = 1.0,
+    ):
+        self.semantic = semantic
+        self.persist = persist
+        self.batch_size = max(1, batch_size)
+        self.ready_poll_seconds = ready_poll_seconds
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        # place_id -> bản mới nhất của place đang chờ
+        self._pending: Dict[Any, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, place: Dict[str, Any]) -> None:
+        """Đưa place (row đầy đủ vừa ghi) vào hàng đợi embedding, không block."""
+        place_id = place.get("id") if place else None
+        if not place_id:
+            return
+        self._ensure_worker()
+        with self._lock:
+            is_new = place_id not in self._pending
+            self._pending[place_id] = place
+            PLACE_EMBEDDING_QUEUE_DEPTH.set(len(self._pending))
+        if is_new:
+            self._queue.put(place_id)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-writer", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """Chờ place đầu tiên, lấy thêm các place đang chờ (tối đa batch_size)."""
+        place_ids = [self._queue.get()]
+        while len(place_ids) < self.batch_size:
+            try:
+                place_ids.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # Model chưa sẵn sàng (đang warmup): giữ place trong hàng đợi
+        while not self.semantic.is_ready:
+            if readiness.is_failed("embedding_model"):
+                # Model không bao giờ load được: bỏ batch thay vì chờ mãi
+                with self._lock:
+                    for place_id in place_ids:
+                        self._pending.pop(place_id, None)
+                    PLACE_EMBEDDING_QUEUE_DEPTH.set(len(self._pending))
+                PLACE_EMBEDDING_WRITES.inc(len(place_ids), result="skipped")
+                logger.warning("Embedding model failed to load, dropping %d queued places", len(place_ids))
+                return []
+            time.sleep(self.ready_poll_seconds)
+        with self._lock:
+            places = [self._pending.pop(place_id) for place_id in place_ids]
+            PLACE_EMBEDDING_QUEUE_DEPTH.set(len(self._pending))
+        return places
+
+    def _run(self) -> None:
+        while True:
+            places = self._collect()
+            if not places:
+                continue
+            try:
+                self._write(places)
+            except Exception as e:
+                PLACE_EMBEDDING_WRITES.inc(len(places), result="failed")
+                logger.exception("Write-through embedding of %d places failed: %s", len(places), e)
+
+    def _write(self, places: List[Dict[str, Any]]) -> None:
+        embedded, vectors = self.semantic.encode_places(places)
+        if len(embedded) < len(places):
+            PLACE_EMBEDDING_WRITES.inc(len(places) - len(embedded), result="skipped")
+        if not embedded:
+            return
+
+        # Cập nhật bộ nhớ trước: search dùng được ngay cả khi ghi DB lỗi
+        self.semantic.upsert_places(embedded, vectors)
+        for place, vector in zip(embedded, vectors):
+            ok = self.persist(place["id"], np.asarray(vector, dtype=np.float32).tolist())
+            PLACE_EMBEDDING_WRITES.inc(result="persisted" if ok else "failed")
+        logger.debug("Write-through embedded %d places", len(embedded))
@@ -8,9 +8,74 @@ from google.genai.types import (
     Tool,
 )
 from app.core.config import settings
-from app.schemas.chat import QueryClassification
+from app.core.logger import get_logger
+from app.core.metrics import Counter, track_outbound
+from app.schemas.chat import PlaceInterpretation, PlaceSelection, QueryClassification
+from app.services.llm_scheduler import LLM_PRIORITIES, PRIORITY_BATCH, llm_scheduler, rate_limit_delay
+from app.services.singleflight import SingleFlight
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from pydantic import BaseModel
+from typing import Deque, Dict, Optional, Type, TypeVar
+import hashlib
 import json
 import re
+import threading
+import time
+
+logger = get_logger(__name__)
+
+StructuredModel = TypeVar("StructuredModel", bound=BaseModel)
+
+GEMINI_COALESCED_CALLS = Counter(
+    "vietspot_gemini_coalesced_calls_total",
+    "Gemini calls saved by joining an identical in-flight call",
+    ("operation",),
+)
+GEMINI_RATE_LIMITED = Counter(
+    "vietspot_gemini_rate_limited_total",
+    "Gemini calls that got HTTP 429 from Vertex AI (retried after backoff)",
+    ("operation",),
+)
+
+GEMINI_HEDGED_CALLS = Counter(
+    "vietspot_gemini_hedged_calls_total",
+    "Gemini calls that sent a hedge request after exceeding the latency percentile",
+    ("operation",),
+)
+GEMINI_HEDGES_SKIPPED = Counter(
+    "vietspot_gemini_hedges_skipped_total",
+    "Hedge requests not sent because the LLM scheduler had no spare RPM/TPM budget",
+    ("operation",),
+)
+GEMINI_STRUCTURED_PARSE = Counter(
+    "vietspot_gemini_structured_parse_total",
+    "Structured Gemini responses by parse path (parsed / repaired / failed)",
+    ("operation", "result"),
+)
+
+# Ước lượng token cho rate limit trước khi có usage_metadata (~4 ký tự / token)
+_CHARS_PER_TOKEN = 4
+_DEFAULT_OUTPUT_TOKENS = 1024
+
+# Hedging: chỉ cho call nằm trên đường interactive của /api/chat
+HEDGED_OPERATIONS = ("classify_query", "select_places", "interpret_and_select")
+_HEDGE_MIN_SAMPLES = 20
+# Latency gần đây của từng operation (giây), để tính ngưỡng percentile
+_recent_latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=256))
+# Pool chỉ cho request hedge; request chính không xếp hàng ở đây
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.LLM_HEDGE_MAX_WORKERS), thread_name_prefix="gemini-hedge"
+)
+
+
+def _run_into(future: Future, fn, *args) -> None:
+    """Chạy fn và ghi kết quả / exception vào future."""
+    try:
+        future.set_result(fn(*args))
+    except BaseException as e:
+        future.set_exception(e)
 
 
 class GeminiService:
@@ -29,6 +94,142 @@ class GeminiService:
         
         # Tools for grounding
         self.grounding_tools = [Tool(google_search=GoogleSearch())]
+        
+        # Gộp các call giống hệt nhau đang chạy đồng thời (cùng model, prompt, config)
+        self._inflight = SingleFlight()
+        # Token bucket RPM / TPM + hàng đợi ưu tiên, dùng chung cả process
+        self.scheduler = llm_scheduler
+    
+    def _generate(self, operation: str, contents: str, config: Optional[GenerateContentConfig] = None):
+        """
+        Gọi generate_content qua singleflight: request đồng thời có cùng prompt
+        (ví dụ prompt gợi ý trên màn hình chính) chờ chung một response.
+        
+        Mỗi call phải được scheduler nhận (ưu tiên theo operation) trước khi gửi;
+        429 từ Vertex thì tạm dừng cả scheduler theo Retry-After rồi retry.
+        
+        Với LLM_HEDGE_PERCENTILE > 0, call interactive chạy quá percentile latency
+        gần đây được gửi thêm một request song song, lấy response về trước.
+        Request chính chạy trên thread riêng của call (không chờ slot trong pool
+        dùng chung), chỉ hedge dùng pool LLM_HEDGE_MAX_WORKERS; scheduler không
+        còn budget dư thì không hedge.
+        
+        Raises:
+            AdmissionTimeout: Hết budget quá LLM_ADMISSION_TIMEOUT_SECONDS
+        """
+        config_key = ""
+        if config is not None:
+            # response_schema là class Pydantic (không serialize được): key theo tên model
+            schema = config.response_schema
+            config_key = config.model_dump_json(exclude_none=True, exclude={"response_schema"})
+            if schema is not None:
+                config_key += f"|{getattr(schema, '__qualname__', schema)}"
+        key = (
+            self.model_id,
+            hashlib.sha256(contents.encode("utf-8")).hexdigest(),
+            hashlib.sha256(config_key.encode("utf-8")).hexdigest(),
+        )
+        
+        priority = LLM_PRIORITIES.get(operation, PRIORITY_BATCH)
+        max_output = getattr(config, "max_output_tokens", None) or _DEFAULT_OUTPUT_TOKENS
+        estimated = len(contents) // _CHARS_PER_TOKEN + max_output
+        
+        def call():
+            hedge_after = self._hedge_delay(operation)
+            if hedge_after is None:
+                return self._send(operation, contents, config, priority, estimated)
+            
+            # Caller (thread của asyncio.to_thread) chỉ chờ kết quả về trước,
+            # nên request chính không phải xếp hàng sau call khác trong pool
+            primary = Future()
+            threading.Thread(
+                target=_run_into,
+                args=(primary, self._send, operation, contents, config, priority, estimated),
+                name=f"gemini-{operation}",
+                daemon=True,
+            ).start()
+            try:
+                return primary.result(timeout=hedge_after)
+            except FutureTimeout:
+                pass
+            if not self.scheduler.try_acquire(estimated):
+                # Hết budget dư: hedge chỉ làm chậm call khác, chờ request chính
+                GEMINI_HEDGES_SKIPPED.inc(operation=operation)
+                return primary.result()
+            GEMINI_HEDGED_CALLS.inc(operation=operation)
+            logger.debug("Gemini %s slower than %.2fs, sending hedge request", operation, hedge_after)
+            hedge = _hedge_executor.submit(self._send, operation, contents, config, priority, estimated, True)
+            done, pending = wait([primary, hedge], return_when=FIRST_COMPLETED)
+            first = done.pop()
+            # Request về trước bị lỗi: chờ request còn lại
+            if first.exception() is not None and pending:
+                return pending.pop().result()
+            return first.result()
+        
+        response, shared = self._inflight.do(key, call)
+        if shared:
+            GEMINI_COALESCED_CALLS.inc(operation=operation)
+        return response
+    
+    def _send(
+        self,
+        operation: str,
+        contents: str,
+        config: Optional[GenerateContentConfig],
+        priority: int,
+        estimated: int,
+        admitted: bool = False
+    ):
+        """
+        Một request tới Vertex: chờ scheduler, retry khi 429, ghi latency.
+        admitted: budget đã được giữ (hedge qua try_acquire) - không chờ, không retry.
+        """
+        max_retries = 0 if admitted else settings.LLM_MAX_RETRIES
+        for attempt in range(max_retries + 1):
+            if not admitted:
+                self.scheduler.acquire(priority, estimated)
+            started = time.perf_counter()
+            try:
+                with track_outbound("gemini", operation):
+                    response = self.client.models.generate_content(
+                        model=self.model_id,
+                        contents=contents,
+                        config=config
+                    )
+            except Exception as e:
+                delay = rate_limit_delay(e, attempt)
+                if delay is None or attempt == max_retries:
+                    raise
+                GEMINI_RATE_LIMITED.inc(operation=operation)
+                logger.warning("Gemini %s rate limited, retrying in %.1fs", operation, delay)
+                self.scheduler.pause(delay)
+                continue
+            _recent_latencies[operation].append(time.perf_counter() - started)
+            usage = getattr(response, "usage_metadata", None)
+            self.scheduler.record_usage(estimated, getattr(usage, "total_token_count", None) or 0)
+            return response
+    
+    @staticmethod
+    def _hedge_delay(operation: str) -> Optional[float]:
+        """Ngưỡng gửi hedge (percentile latency gần đây), None nếu không hedge."""
+        if settings.LLM_HEDGE_PERCENTILE <= 0 or operation not in HEDGED_OPERATIONS:
+            return None
+        samples = sorted(_recent_latencies[operation])
+        if len(samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        rank = min(len(samples) - 1, int(len(samples) * settings.LLM_HEDGE_PERCENTILE / 100))
+        return samples[rank]
+    
+    @staticmethod
+    def fallback_classification(user_prompt: str) -> QueryClassification:
+        """Phân loại mặc định khi Gemini lỗi / quá thời gian: tìm kiếm semantic trên câu gốc."""
+        return QueryClassification(
+            query_type="specific_search",
+            keywords=[],
+            needs_semantic_search=True,  # Default to True for safety
+            vietnamese_query=user_prompt,
+            corrected_query=user_prompt
+        )
     
     def _setup_credentials(self):
         """Setup Google Cloud credentials from environment variable"""
@@ -45,15 +246,15 @@ class GeminiService:
                 
                 # Set the path for Google libraries to find
                 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
-                print(f"✅ Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
+                logger.info("Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
             except Exception as e:
-                print(f"⚠️ Error setting up credentials: {e}")
+                logger.warning("Error setting up credentials: %s", e)
         else:
             # Check if already set via file path
             if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
-                print(f"✅ Using existing GOOGLE_APPLICATION_CREDENTIALS")
+                logger.info("Using existing GOOGLE_APPLICATION_CREDENTIALS")
             else:
-                print(f"⚠️ No Google credentials found. Vertex AI may not work.")
+                logger.warning("No Google credentials found. Vertex AI may not work.")
     
     def _clean_text(self, text: str) -> str:
         """Remove control characters and clean text"""
@@ -227,34 +428,12 @@ Chỉ trả về JSON, không thêm giải thích.
 """
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=classification_prompt
-            )
-            result_text = response.text.strip()
-            
-            # Extract JSON from markdown code blocks if present
-            json_match = re.search(r'```json\s*(.*?)\s*```', result_text, re.DOTALL)
-            if json_match:
-                result_text = json_match.group(1)
-            else:
-                json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-                if json_match:
-                    result_text = json_match.group(0)
-            
-            classification_data = json.loads(result_text)
-            return QueryClassification(**classification_data)
+            return self.generate_structured("classify_query", classification_prompt, QueryClassification)
             
         except Exception as e:
-            print(f"Error in classify_query: {e}")
+            logger.error("Error in classify_query: %s", e)
             # Fallback
-            return QueryClassification(
-                query_type="specific_search",
-                keywords=[],
-                needs_semantic_search=True,  # Default to True for safety
-                vietnamese_query=user_prompt,
-                corrected_query=user_prompt
-            )
+            return self.fallback_classification(user_prompt)
     
     def answer_general_query(self, user_prompt: str) -> str:
         """
@@ -268,35 +447,20 @@ Câu hỏi: {user_prompt}
 Trả lời bằng tiếng Việt, ngắn gọn và dễ hiểu.
 """
         try:
-            print(f"🔍 Using Google Search Grounding for general query...")
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=general_prompt,
+            response = self._generate(
+                "answer_general_query",
+                general_prompt,
                 config=GenerateContentConfig(
                     tools=self.grounding_tools
                 )
             )
             return response.text
         except Exception as e:
-            print(f"Error in answer_general_query: {e}")
+            logger.error("Error in answer_general_query: %s", e)
             return "Xin lỗi, tôi không thể trả lời câu hỏi này lúc này. Vui lòng thử lại."
     
-    def select_places_and_generate_response(
-        self, 
-        user_prompt: str, 
-        places: list, 
-        max_places: int = 5,
-        weather_data: dict = None,
-        original_language: str = "vi"
-    ) -> tuple[list, str]:
-        """
-        Let Gemini select relevant places AND generate final response in ONE request
-        Responds in the user's original language
-        Returns: (selected_places, answer_text)
-        """
-        if not places:
-            return [], "Xin lỗi, tôi không tìm thấy địa điểm nào phù hợp với yêu cầu của bạn."
-        
+    def _selection_context(self, places: list, weather_data: dict = None, original_language: str = "vi") -> tuple[str, str, str]:
+        """(JSON danh sách places, đoạn thời tiết, hướng dẫn ngôn ngữ) cho prompt chọn places."""
         # Prepare places information for Gemini
         places_info = []
         for idx, place in enumerate(places):
@@ -352,6 +516,89 @@ Thông tin thời tiết hiện tại:
         elif original_language != "vi":
             language_instruction = f"Respond in the user's language ({original_language}), naturally and friendly"
         
+        return places_json, weather_text, language_instruction
+    
+    def _extract_json_object(self, result_text: str) -> dict:
+        """Tách và parse object JSON đầu tiên trong response (markdown code block hoặc text thô)."""
+        # Try multiple JSON extraction methods
+        json_text = None
+        
+        # Method 1: Extract from ```json ... ``` blocks
+        json_match = re.search(r'```json\s*(\{[\s\S]*?\})\s*```', result_text, re.MULTILINE)
+        if json_match:
+            json_text = json_match.group(1)
+        
+        # Method 2: Extract from ``` ... ``` blocks
+        if not json_text:
+            json_match = re.search(r'```\s*(\{[\s\S]*?\})\s*```', result_text, re.MULTILINE)
+            if json_match:
+                json_text = json_match.group(1)
+        
+        # Method 3: Use entire response if it looks like JSON
+        if not json_text and result_text.startswith('{'):
+            brace_count = 0
+            for i, char in enumerate(result_text):
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0:
+                        json_text = result_text[:i+1]
+                        break
+        
+        # Method 4: Find first JSON object in text
+        if not json_text:
+            start = result_text.find('{')
+            if start != -1:
+                brace_count = 0
+                for i in range(start, len(result_text)):
+                    if result_text[i] == '{':
+                        brace_count += 1
+                    elif result_text[i] == '}':
+                        brace_count -= 1
+                        if brace_count == 0:
+                            json_text = result_text[start:i+1]
+                            break
+        
+        if not json_text:
+            raise ValueError("Could not extract valid JSON from response")
+        
+        json_text = self._clean_json_string(json_text.strip())
+        
+        try:
+            result_data = json.loads(json_text)
+        except json.JSONDecodeError as je:
+            # Log more details for debugging
+            logger.warning("JSON parse error at position %d: %s", je.pos, je.msg)
+            logger.debug("Problematic JSON (around error): ...%s...", json_text[max(0, je.pos-50):je.pos+50])
+            
+            # Try a more aggressive cleanup - remove any control characters
+            import re as regex
+            cleaned_json = regex.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', json_text)
+            result_data = json.loads(cleaned_json)
+        
+        return result_data
+    
+    def select_places_and_generate_response(
+        self, 
+        user_prompt: str, 
+        places: list, 
+        max_places: int = 5,
+        weather_data: dict = None,
+        original_language: str = "vi"
+    ) -> tuple[list, str]:
+        """
+        Let Gemini select relevant places AND generate final response in ONE request
+        Responds in the user's original language
+        Returns: (selected_places, answer_text)
+        """
+        if not places:
+            return [], "Xin lỗi, tôi không tìm thấy địa điểm nào phù hợp với yêu cầu của bạn."
+        
+        places_json, weather_text, language_instruction = self._selection_context(
+            places, weather_data, original_language
+        )
+        
         combined_prompt = f"""
 Bạn là trợ lý du lịch thông minh VietSpot. Nhiệm vụ của bạn:
 1. CHỌN các địa điểm PHÙ HỢP NHẤT từ danh sách
@@ -359,7 +606,7 @@ Bạn là trợ lý du lịch thông minh VietSpot. Nhiệm vụ của bạn:
 
 Câu hỏi của người dùng: "{user_prompt}"
 
-Danh sách địa điểm ứng viên ({len(places_info)} địa điểm):
+Danh sách địa điểm ứng viên ({len(places)} địa điểm):
 {places_json}
 
 {weather_text}
@@ -384,84 +631,18 @@ Chỉ trả về JSON, không thêm giải thích.
 """
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=combined_prompt
-            )
-            result_text = response.text.strip()
-            print(f"📥 Raw Gemini response (first 300 chars): {result_text[:300]}")
-            
-            # Try multiple JSON extraction methods
-            json_text = None
-            
-            # Method 1: Extract from ```json ... ``` blocks
-            json_match = re.search(r'```json\s*(\{[\s\S]*?\})\s*```', result_text, re.MULTILINE)
-            if json_match:
-                json_text = json_match.group(1)
-            
-            # Method 2: Extract from ``` ... ``` blocks
-            if not json_text:
-                json_match = re.search(r'```\s*(\{[\s\S]*?\})\s*```', result_text, re.MULTILINE)
-                if json_match:
-                    json_text = json_match.group(1)
-            
-            # Method 3: Use entire response if it looks like JSON
-            if not json_text and result_text.startswith('{'):
-                brace_count = 0
-                for i, char in enumerate(result_text):
-                    if char == '{':
-                        brace_count += 1
-                    elif char == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            json_text = result_text[:i+1]
-                            break
-            
-            # Method 4: Find first JSON object in text
-            if not json_text:
-                start = result_text.find('{')
-                if start != -1:
-                    brace_count = 0
-                    for i in range(start, len(result_text)):
-                        if result_text[i] == '{':
-                            brace_count += 1
-                        elif result_text[i] == '}':
-                            brace_count -= 1
-                            if brace_count == 0:
-                                json_text = result_text[start:i+1]
-                                break
-            
-            if not json_text:
-                raise ValueError("Could not extract valid JSON from response")
-            
-            json_text = self._clean_json_string(json_text.strip())
-            
-            try:
-                result_data = json.loads(json_text)
-            except json.JSONDecodeError as je:
-                # Log more details for debugging
-                print(f"⚠️ JSON parse error at position {je.pos}: {je.msg}")
-                print(f"📝 Problematic JSON (around error): ...{json_text[max(0, je.pos-50):je.pos+50]}...")
-                
-                # Try a more aggressive cleanup - remove any control characters
-                import re as regex
-                cleaned_json = regex.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', json_text)
-                result_data = json.loads(cleaned_json)
-            
-            selected_indices = result_data.get('selected_indices', [])
-            answer = result_data.get('answer', '')
-            
-            print(f"🤖 Gemini selected {len(selected_indices)} places and generated response")
+            selection = self.generate_structured("select_places", combined_prompt, PlaceSelection)
+            answer = selection.answer
             
             # Return selected places
             selected_places = []
-            for idx in selected_indices:
+            for idx in selection.selected_indices:
                 if 0 <= idx < len(places):
                     selected_places.append(places[idx])
             
             # If no valid selection, return top places
             if not selected_places:
-                print("⚠️ No valid selection, returning top places")
+                logger.warning("No valid selection, returning top places")
                 selected_places = places[:max_places]
             
             if not answer:
@@ -470,31 +651,131 @@ Chỉ trả về JSON, không thêm giải thích.
             return selected_places, answer
             
         except Exception as e:
-            print(f"❌ Error in select_places_and_generate_response: {e}")
+            logger.error("Error in select_places_and_generate_response: %s", e)
             return places[:max_places], "Dưới đây là các địa điểm gợi ý cho bạn."
     
-    def generate_with_json(self, prompt: str, temperature: float = 0.7) -> str:
+    def interpret_and_select(
+        self,
+        user_prompt: str,
+        places: list,
+        max_places: int = 5,
+        weather_data: dict = None
+    ) -> tuple[bool, list, str]:
         """
-        Generate response with JSON output format (for itinerary, structured data)
-        Returns raw JSON string
+        Một request thay cho classify_query + select_places_and_generate_response:
+        Gemini vừa hiểu câu hỏi (ngôn ngữ, có phải tìm địa điểm không) vừa chọn
+        và giới thiệu places từ danh sách ứng viên đã retrieve local.
+        
+        Returns:
+            (is_place_search, selected_places, answer_text) - is_place_search=False
+            thì caller chạy lại pipeline classify như cũ
         """
+        if not places:
+            return True, [], ""
+        
+        places_json, weather_text, _ = self._selection_context(places, weather_data)
+        
+        combined_prompt = f"""
+Bạn là trợ lý du lịch thông minh VietSpot. Nhiệm vụ của bạn:
+1. HIỂU câu hỏi: ngôn ngữ của người dùng và đây có phải yêu cầu TÌM ĐỊA ĐIỂM không
+2. CHỌN các địa điểm PHÙ HỢP NHẤT từ danh sách
+3. TẠO câu trả lời tự nhiên, thân thiện giới thiệu các địa điểm đã chọn
+
+Câu hỏi của người dùng: "{user_prompt}"
+
+Danh sách địa điểm ứng viên ({len(places)} địa điểm), tìm theo nội dung câu hỏi:
+{places_json}
+
+{weather_text}
+
+BƯỚC 1: HIỂU CÂU HỎI
+- "is_place_search": true nếu người dùng muốn tìm / gợi ý địa điểm (quán, nhà hàng, điểm tham quan...)
+- false nếu là câu hỏi chung (thời tiết, văn hóa, lịch sử...) hoặc yêu cầu lập lịch trình nhiều ngày
+- Nếu false: trả về "selected_indices": [] và "answer": ""
+
+BƯỚC 2: CHỌN ĐỊA ĐIỂM
+- Chọn ĐÚNG {max_places} địa điểm (hoặc tất cả nếu ít hơn {max_places} địa điểm phù hợp)
+- NẾU người dùng yêu cầu số lượng cụ thể (ví dụ: "12 quán"), PHẢI chọn đủ số đó
+- **XEM XÉT KỸ TRƯỜNG "address" CỦA MỖI ĐỊA ĐIỂM**: Nếu người dùng hỏi về khu vực/quận/thành phố cụ thể, CHỈ chọn các địa điểm có address CHỨA tên khu vực đó
+- Ưu tiên: địa chỉ phù hợp với yêu cầu, đánh giá cao, thông tin rõ ràng, gần người dùng, phù hợp ngữ cảnh
+
+BƯỚC 3: TẠO CÂU TRẢ LỜI
+- Trả lời bằng CHÍNH ngôn ngữ người dùng đã dùng, tự nhiên, thân thiện
+- Sử dụng markdown với **bold** cho tên địa điểm
+
+Trả về JSON với cấu trúc:
+{{
+    "is_place_search": true,
+    "original_language": "vi",
+    "selected_indices": [0, 2, 5, ...],
+    "answer": "Câu trả lời chi tiết giới thiệu các địa điểm..."
+}}
+
+Chỉ trả về JSON, không thêm giải thích.
+"""
+        
         try:
-            config = GenerateContentConfig(
-                temperature=temperature,
-                top_p=0.95,
-                max_output_tokens=8192,
-                response_modalities=["TEXT"],
-                response_mime_type="application/json"
-            )
-            
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt,
-                config=config
-            )
+            result = self.generate_structured("interpret_and_select", combined_prompt, PlaceInterpretation)
+            if not result.is_place_search:
+                logger.debug("Single-call: query is not a place search, falling back to classify pipeline")
+                return False, [], ""
             
-            return response.text
+            selected_places = [places[idx] for idx in result.selected_indices if 0 <= idx < len(places)]
+            if not selected_places:
+                logger.warning("No valid selection, returning top places")
+                selected_places = places[:max_places]
+            answer = result.answer or "Dưới đây là các địa điểm gợi ý cho bạn."
+            return True, selected_places, answer
             
         except Exception as e:
-            print(f"❌ Error in generate_with_json: {e}")
-            raise
+            logger.error("Error in interpret_and_select: %s", e)
+            return True, places[:max_places], "Dưới đây là các địa điểm gợi ý cho bạn."
+    
+    def generate_structured(
+        self,
+        operation: str,
+        prompt: str,
+        schema: Type[StructuredModel],
+        **config_options
+    ) -> StructuredModel:
+        """
+        Gọi Gemini với response_schema sinh từ Pydantic model: Vertex chỉ sinh
+        JSON đúng schema, SDK parse sẵn vào response.parsed. Đường sửa JSON cũ
+        (tách theo ngoặc, escape ký tự điều khiển) chỉ chạy khi response vẫn
+        không validate được - tỉ lệ theo dõi qua vietspot_gemini_structured_parse_total.
+        
+        Args:
+            config_options: Thêm vào GenerateContentConfig (temperature, max_output_tokens...)
+        
+        Raises:
+            ValueError: Response không khớp schema kể cả sau khi sửa (caller dùng fallback)
+        """
+        config = GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=schema,
+            **config_options
+        )
+        response = self._generate(operation, prompt, config=config)
+        
+        parsed = getattr(response, "parsed", None)
+        if isinstance(parsed, schema):
+            GEMINI_STRUCTURED_PARSE.inc(operation=operation, result="parsed")
+            return parsed
+        
+        result_text = (response.text or "").strip()
+        try:
+            result = schema.model_validate_json(result_text)
+            GEMINI_STRUCTURED_PARSE.inc(operation=operation, result="parsed")
+            return result
+        except ValueError:
+            pass
+        
+        try:
+            result = schema.model_validate(self._extract_json_object(result_text))
+        except ValueError as e:
+            GEMINI_STRUCTURED_PARSE.inc(operation=operation, result="failed")
+            logger.debug("Unparseable %s response (first 300 chars): %s", operation, result_text[:300])
+            raise ValueError(f"{operation}: response không khớp schema {schema.__name__}") from e
+        GEMINI_STRUCTURED_PARSE.inc(operation=operation, result="repaired")
+        logger.warning("Repaired malformed %s JSON response", operation)
+        return result
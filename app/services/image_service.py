@@ -0,0 +1,70 @@
+"""
+Image Service
+Xử lý các thao tác với bảng images (insert hàng loạt)
+"""
+
+import uuid
+from typing import List, Dict, Any, Optional
+from supabase import Client
+
+from app.core.datetime_utils import get_utc_now
+
+# Số rows tối đa trong một request insert
+IMAGE_INSERT_BATCH_SIZE = 100
+
+
+def build_image_rows(
+    image_urls: List[str],
+    place_id: Optional[str],
+    comment_id: Optional[str] = None,
+    is_scraped: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Tạo danh sách rows cho bảng images từ danh sách URLs.
+
+    Args:
+        image_urls: Danh sách URLs ảnh
+        place_id: UUID của địa điểm
+        comment_id: UUID của comment (nếu có)
+        is_scraped: Ảnh được crawl hay do user upload
+
+    Returns:
+        Danh sách rows sẵn sàng để insert
+    """
+    uploaded_at = get_utc_now().isoformat()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "comment_id": comment_id,
+            "place_id": place_id,
+            "url": url,
+            "is_scraped": is_scraped,
+            "uploaded_at": uploaded_at
+        }
+        for url in image_urls
+    ]
+
+
+def bulk_insert_images(
+    db: Client,
+    rows: List[Dict[str, Any]],
+    batch_size: int = IMAGE_INSERT_BATCH_SIZE
+) -> int:
+    """
+    Insert nhiều rows vào bảng images, mỗi batch là một request.
+
+    Args:
+        db: Supabase client
+        rows: Danh sách rows cần insert
+        batch_size: Số rows tối đa mỗi request
+
+    Returns:
+        Số rows đã insert (theo response của database)
+    """
+    inserted = 0
+    for start in range(0, len(rows), max(1, batch_size)):
+        batch = rows[start:start + batch_size]
+        result = db.table('images').insert(batch).execute()
+        if hasattr(result, 'data') and result.data:
+            inserted += len(result.data)
+    return inserted
@@ -3,10 +3,30 @@ from app.services.place_supabase_service import PlaceSupabaseService
 from app.services.gemini_service import GeminiService
 from app.services.scoring_service import ScoringService
 from app.services.weather_service import WeatherService
+from app.services.day_planner import partition_places, theme_hint
 from app.schemas.itinerary import ItineraryRequest, ItineraryResponse, DayItinerary, ActivityDetail
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import Counter, track_outbound
+from concurrent.futures import ThreadPoolExecutor
 import json
 import math
 
+logger = get_logger(__name__)
+
+ITINERARY_DAYS = Counter(
+    "vietspot_itinerary_days_total",
+    "Itinerary days by how they were produced (generated by Gemini / local fallback)",
+    ("result",),
+)
+
+# Output của một ngày (4-6 hoạt động) nhỏ hơn nhiều so với cả chuyến
+_DAY_MAX_OUTPUT_TOKENS = 2048
+# Các ngày của mọi request dùng chung pool: tối đa ITINERARY_DAY_CONCURRENCY call Gemini cùng lúc
+_day_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.ITINERARY_DAY_CONCURRENCY), thread_name_prefix="itinerary-day"
+)
+
 
 class ItineraryService:
     """Service for generating travel itineraries with smart place selection"""
@@ -27,15 +47,21 @@ class ItineraryService:
         'evening_activity': (17, 20),
     }
     
-    def __init__(self):
-        self.supabase = PlaceSupabaseService()
-        self.gemini = GeminiService()
-        self.scoring = ScoringService()
-        self.weather = WeatherService()
+    def __init__(
+        self,
+        supabase: Optional[PlaceSupabaseService] = None,
+        gemini: Optional[GeminiService] = None,
+        scoring: Optional[ScoringService] = None,
+        weather: Optional[WeatherService] = None,
+    ):
+        self.supabase = supabase or PlaceSupabaseService()
+        self.gemini = gemini or GeminiService()
+        self.scoring = scoring or ScoringService()
+        self.weather = weather or WeatherService()
     
     def generate_itinerary(self, request: ItineraryRequest) -> ItineraryResponse:
         """Generate complete itinerary by querying city places and letting Gemini reason"""
-        print(f"\n🗓️ Generating {request.num_days}-day itinerary for {request.destination}")
+        logger.info("Generating %d-day itinerary for %s", request.num_days, request.destination)
         
         # 1. Get weather data for destination
         weather_data = self._get_weather_for_destination(request.destination)
@@ -43,10 +69,10 @@ class ItineraryService:
         
         # 2. Query ALL places for this city from database
         all_places = self._query_places_by_city(request.destination)
-        print(f"📍 Found {len(all_places)} places in {request.destination}")
+        logger.debug("Found %d places in %s", len(all_places), request.destination)
         
         if not all_places:
-            print(f"⚠️ No places found for {request.destination}")
+            logger.warning("No places found for %s", request.destination)
             return self._create_empty_itinerary(request)
         
         # 3. Score places if we have user location
@@ -54,6 +80,8 @@ class ItineraryService:
             all_places = self.scoring.rank_places(all_places, has_user_location=True)
         
         # 4. Let Gemini create itinerary from all available places
+        if settings.ITINERARY_DAY_CONCURRENCY > 0:
+            return self._gemini_create_itinerary_by_day(request, all_places, weather_data, weather_summary)
         itinerary_data = self._gemini_create_itinerary(
             request, 
             all_places,
@@ -65,13 +93,12 @@ class ItineraryService:
     
     def _query_places_by_city(self, city: str) -> List[Dict[str, Any]]:
         """Query all places for a specific city from database"""
-        print(f"🔍 Querying places for city: {city}")
-        
         try:
             # Search by city name in address - use correct column names from database
-            response = self.supabase.client.table("places").select(
-                "id, name, address, category, rating, rating_count, coordinates, opening_hours, about"
-            ).ilike("address", f"%{city}%").limit(100).execute()
+            with track_outbound("supabase", "places_by_city"):
+                response = self.supabase.client.table("places").select(
+                    "id, name, address, category, rating, rating_count, coordinates, opening_hours, about"
+                ).ilike("address", f"%{city}%").limit(100).execute()
             
             places = response.data or []
             
@@ -85,9 +112,10 @@ class ItineraryService:
             city_variants = self._get_city_variants(city)
             for variant in city_variants:
                 if variant.lower() != city.lower():
-                    response2 = self.supabase.client.table("places").select(
-                        "id, name, address, category, rating, rating_count, coordinates, opening_hours, about"
-                    ).ilike("address", f"%{variant}%").limit(50).execute()
+                    with track_outbound("supabase", "places_by_city"):
+                        response2 = self.supabase.client.table("places").select(
+                            "id, name, address, category, rating, rating_count, coordinates, opening_hours, about"
+                        ).ilike("address", f"%{variant}%").limit(50).execute()
                     
                     # Add unique places with lat/lon extracted
                     existing_ids = {p['id'] for p in places}
@@ -98,11 +126,10 @@ class ItineraryService:
                             place['longitude'] = coords.get('lon')
                             places.append(place)
             
-            print(f"   Found {len(places)} total places")
             return places
             
         except Exception as e:
-            print(f"❌ Error querying places: {e}")
+            logger.error("Error querying places for city %s: %s", city, e)
             return []
     
     def _get_city_variants(self, city: str) -> List[str]:
@@ -141,15 +168,7 @@ class ItineraryService:
         
         # Format places for Gemini - include key info only to save tokens
         places_text = self._format_places_for_gemini(all_places)
-        
-        weather_context = ""
-        if weather_data:
-            weather_context = f"""
-THÔNG TIN THỜI TIẾT:
-{weather_summary}
-- Nếu trời mưa/nóng: ưu tiên địa điểm trong nhà
-- Nếu trời đẹp: có thể tham quan ngoài trời
-"""
+        weather_context = self._weather_context(weather_data, weather_summary)
         
         prompt = f"""Bạn là chuyên gia lập lịch trình du lịch Việt Nam.
 
@@ -204,66 +223,139 @@ TRẢ VỀ JSON:
 CHỈ TRẢ VỀ JSON, KHÔNG THÊM TEXT."""
 
         try:
-            response_text = self.gemini.generate_with_json(prompt)
-            print(f"📝 Gemini response length: {len(response_text)} chars")
-            
-            # Try to parse JSON with multiple methods
-            itinerary_dict = self._parse_json_response(response_text)
-            
-            if itinerary_dict:
-                return ItineraryResponse(**itinerary_dict)
-            else:
-                raise ValueError("Could not parse JSON response")
-                
+            # response_schema = ItineraryResponse: Gemini trả JSON đúng model, không cần sửa
+            return self.gemini.generate_structured(
+                "generate_itinerary", prompt, ItineraryResponse,
+                temperature=0.7, top_p=0.95, max_output_tokens=8192
+            )
         except Exception as e:
-            print(f"❌ Error in Gemini itinerary: {e}")
-            print(f"   Response preview: {response_text[:300] if 'response_text' in dir() else 'N/A'}...")
+            logger.error("Error in Gemini itinerary: %s", e)
             return self._create_fallback_from_places(request, all_places, weather_data)
     
-    def _parse_json_response(self, text: str) -> Optional[Dict[str, Any]]:
-        """Try multiple methods to parse JSON from Gemini response"""
-        import re
-        
-        # Method 1: Direct parse
-        try:
-            return json.loads(text)
-        except:
-            pass
+    def _gemini_create_itinerary_by_day(
+        self,
+        request: ItineraryRequest,
+        all_places: List[Dict[str, Any]],
+        weather_data: Optional[Dict[str, Any]],
+        weather_summary: str
+    ) -> ItineraryResponse:
+        """
+        Chia places cho từng ngày (cụm địa lý + đa dạng loại hình) rồi sinh mỗi
+        ngày bằng một prompt riêng, song song: thời gian gần như không tăng theo
+        num_days và JSON của mỗi call đủ nhỏ để không bị cắt.
+        """
+        partitions = partition_places(all_places, request.num_days, per_day=settings.ITINERARY_CANDIDATES_PER_DAY)
+        weather_context = self._weather_context(weather_data, weather_summary)
+        futures = [
+            _day_executor.submit(self._gemini_create_day, request, day_num, day_places, weather_context)
+            for day_num, day_places in enumerate(partitions, 1)
+        ]
+        days = [future.result() for future in futures]
         
-        # Method 2: Extract from markdown code block
-        try:
-            match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-            if match:
-                return json.loads(match.group(1))
-        except:
-            pass
+        themes = "; ".join(f"Ngày {day.day}: {day.theme}" for day in days)
+        return ItineraryResponse(
+            destination=request.destination,
+            num_days=request.num_days,
+            itinerary=days,
+            summary=f"Lịch trình {request.num_days} ngày tại {request.destination} - {themes}",
+            total_places=sum(len(day.activities) for day in days),
+            tips=self._general_tips(weather_data)
+        )
+    
+    def _gemini_create_day(
+        self,
+        request: ItineraryRequest,
+        day_num: int,
+        day_places: List[Dict[str, Any]],
+        weather_context: str
+    ) -> DayItinerary:
+        """Sinh lịch trình một ngày từ các places đã chia cho ngày đó (fallback local nếu lỗi)"""
+        if not day_places:
+            ITINERARY_DAYS.inc(result="fallback")
+            return self._fallback_day(request, day_num, day_places)
+        
+        hint = theme_hint(day_places)
+        prompt = f"""Bạn là chuyên gia lập lịch trình du lịch Việt Nam.
+
+Đây là NGÀY {day_num}/{request.num_days} của chuyến đi tại {request.destination}.
+Các địa điểm dưới đây đã được chọn riêng cho ngày này (gần nhau về vị trí).
+
+DANH SÁCH ĐỊA ĐIỂM CHO NGÀY {day_num}:
+{self._format_places_for_gemini(day_places)}
+
+{weather_context}
+
+YÊU CẦU:
+- Sở thích: {', '.join(request.preferences) if request.preferences else 'Khám phá tổng quát'}
+- Giờ bắt đầu: {request.start_time}, kết thúc: {request.end_time}
+- Chủ đề ngày {day_num} xoay quanh: {hint or 'khám phá ' + request.destination}
+
+HƯỚNG DẪN:
+1. CHỈ CHỌN địa điểm từ danh sách trên (dùng đúng tên và thông tin)
+2. 4-6 hoạt động, sắp xếp theo thứ tự di chuyển hợp lý
+3. LẤY ĐÚNG TỌA ĐỘ (latitude, longitude) từ danh sách nếu có
+
+TRẢ VỀ JSON:
+{{
+  "day": {day_num},
+  "theme": "Chủ đề ngày {day_num}",
+  "activities": [
+    {{
+      "time": "08:00",
+      "duration_minutes": 90,
+      "activity_type": "visit",
+      "place_name": "Tên địa điểm từ danh sách",
+      "address": "Địa chỉ đầy đủ",
+      "latitude": 10.123456,
+      "longitude": 107.123456,
+      "rating": 4.5,
+      "category": "Category",
+      "description": "Mô tả hoạt động"
+    }}
+  ],
+  "total_activities": 5
+}}
+
+CHỈ TRẢ VỀ JSON, KHÔNG THÊM TEXT."""
         
-        # Method 3: Find JSON object in text
         try:
-            start = text.find('{')
-            if start != -1:
-                brace_count = 0
-                for i in range(start, len(text)):
-                    if text[i] == '{':
-                        brace_count += 1
-                    elif text[i] == '}':
-                        brace_count -= 1
-                        if brace_count == 0:
-                            json_str = text[start:i+1]
-                            return json.loads(json_str)
-        except:
-            pass
-        
-        # Method 4: Try to fix common JSON issues
-        try:
-            # Remove trailing commas
-            fixed = re.sub(r',\s*}', '}', text)
-            fixed = re.sub(r',\s*]', ']', fixed)
-            return json.loads(fixed)
-        except:
-            pass
-        
-        return None
+            day = self.gemini.generate_structured(
+                "generate_itinerary_day", prompt, DayItinerary,
+                temperature=0.7, top_p=0.95, max_output_tokens=_DAY_MAX_OUTPUT_TOKENS
+            )
+        except Exception as e:
+            logger.error("Error in Gemini itinerary day %d: %s", day_num, e)
+            ITINERARY_DAYS.inc(result="fallback")
+            return self._fallback_day(request, day_num, day_places)
+        
+        # Bổ sung id / tọa độ từ dữ liệu gốc (Gemini hay bỏ sót)
+        places_by_name = {place.get('name'): place for place in day_places}
+        for activity in day.activities:
+            place = places_by_name.get(activity.place_name)
+            if place is None:
+                continue
+            activity.place_id = activity.place_id or str(place.get('id', ''))
+            activity.address = activity.address or place.get('address')
+            activity.latitude = activity.latitude or place.get('latitude')
+            activity.longitude = activity.longitude or place.get('longitude')
+            activity.rating = activity.rating or place.get('rating')
+            activity.category = activity.category or place.get('category')
+        day.day = day_num
+        day.total_activities = len(day.activities)
+        day.estimated_distance_km = self._calculate_day_distance(day.activities)
+        ITINERARY_DAYS.inc(result="generated")
+        return day
+    
+    def _weather_context(self, weather_data: Optional[Dict[str, Any]], weather_summary: str) -> str:
+        """Phần thời tiết của prompt lịch trình (rỗng nếu không có dữ liệu)"""
+        if not weather_data:
+            return ""
+        return f"""
+THÔNG TIN THỜI TIẾT:
+{weather_summary}
+- Nếu trời mưa/nóng: ưu tiên địa điểm trong nhà
+- Nếu trời đẹp: có thể tham quan ngoài trời
+"""
     
     def _format_places_for_gemini(self, places: List[Dict[str, Any]]) -> str:
         """Format places list for Gemini prompt - include coordinates"""
@@ -305,40 +397,10 @@ CHỈ TRẢ VỀ JSON, KHÔNG THÊM TEXT."""
         used_places = set()
         
         for day_num in range(1, request.num_days + 1):
-            activities = []
             start_idx = (day_num - 1) * places_per_day
             day_places = [p for p in places[start_idx:start_idx + places_per_day] if p['id'] not in used_places]
-            
-            times = ["08:30", "10:30", "14:00", "16:00", "18:00"]
-            
-            for i, place in enumerate(day_places[:5]):
-                used_places.add(place['id'])
-                activities.append(ActivityDetail(
-                    time=times[i],
-                    duration_minutes=90,
-                    activity_type="visit",
-                    place_id=str(place.get('id', '')),
-                    place_name=place.get('name', 'Unknown'),
-                    address=place.get('address'),
-                    latitude=place.get('latitude'),
-                    longitude=place.get('longitude'),
-                    rating=place.get('rating'),
-                    category=place.get('category'),
-                    description=f"Tham quan {place.get('name')}"
-                ))
-            
-            days.append(DayItinerary(
-                day=day_num,
-                theme=f"Khám phá {request.destination} - Ngày {day_num}",
-                activities=activities,
-                total_activities=len(activities)
-            ))
-        
-        tips = ["Mang theo nước", "Đi giày thoải mái"]
-        if weather_data:
-            advice = self.weather.get_weather_advice(weather_data)
-            if advice:
-                tips.insert(0, advice)
+            used_places.update(p['id'] for p in day_places[:5])
+            days.append(self._fallback_day(request, day_num, day_places))
         
         return ItineraryResponse(
             destination=request.destination,
@@ -346,16 +408,47 @@ CHỈ TRẢ VỀ JSON, KHÔNG THÊM TEXT."""
             itinerary=days,
             summary=f"Lịch trình {request.num_days} ngày tại {request.destination}",
             total_places=sum(len(d.activities) for d in days),
-            tips=tips
+            tips=self._general_tips(weather_data)
         )
     
+    def _fallback_day(self, request: ItineraryRequest, day_num: int, day_places: List[Dict[str, Any]]) -> DayItinerary:
+        """Một ngày tham quan tối đa 5 places theo thứ tự, không cần Gemini"""
+        times = ["08:30", "10:30", "14:00", "16:00", "18:00"]
+        activities = []
+        for i, place in enumerate(day_places[:5]):
+            activities.append(ActivityDetail(
+                time=times[i],
+                duration_minutes=90,
+                activity_type="visit",
+                place_id=str(place.get('id', '')),
+                place_name=place.get('name', 'Unknown'),
+                address=place.get('address'),
+                latitude=place.get('latitude'),
+                longitude=place.get('longitude'),
+                rating=place.get('rating'),
+                category=place.get('category'),
+                description=f"Tham quan {place.get('name')}"
+            ))
+        
+        return DayItinerary(
+            day=day_num,
+            theme=f"Khám phá {request.destination} - Ngày {day_num}",
+            activities=activities,
+            total_activities=len(activities)
+        )
+    
+    def _general_tips(self, weather_data: Optional[Dict[str, Any]]) -> List[str]:
+        """Lời khuyên chung cho chuyến đi, thêm lời khuyên thời tiết nếu có"""
+        tips = ["Mang theo nước", "Đi giày thoải mái"]
+        if weather_data:
+            advice = self.weather.get_weather_advice(weather_data)
+            if advice:
+                tips.insert(0, advice)
+        return tips
+    
     def _get_weather_for_destination(self, destination: str) -> Optional[Dict[str, Any]]:
         """Get weather data for the destination"""
-        print(f"🌤️ Fetching weather for {destination}...")
-        weather = self.weather.get_weather_by_city(destination)
-        if weather:
-            print(f"   Temperature: {weather.get('temp')}°C, {weather.get('description')}")
-        return weather
+        return self.weather.get_weather_by_city(destination)
     
     def _format_weather_summary(self, weather_data: Optional[Dict[str, Any]]) -> str:
         """Format weather data into a summary string"""
@@ -381,14 +474,10 @@ Lời khuyên: {advice}"""
         user_lon: Optional[float] = None
     ) -> Dict[str, List[Dict[str, Any]]]:
         """Fetch places from database, score and rank them"""
-        print(f"📍 Fetching and scoring places in {location}...")
-        
         has_user_location = user_lat is not None and user_lon is not None
         places_by_category = {}
         
         for activity_type, categories in self.CATEGORY_MAPPING.items():
-            print(f"   Searching {activity_type}...")
-            
             # Search by category and location
             places = self._search_by_category_and_location(categories, location)
             
@@ -429,10 +518,10 @@ Lời khuyên: {advice}"""
                     )
                 
                 places_by_category[activity_type] = scored_places[:20]
-                print(f"      Found {len(places_by_category[activity_type])} scored {activity_type} places")
+                logger.debug("Found %d scored %s places", len(places_by_category[activity_type]), activity_type)
             else:
                 places_by_category[activity_type] = []
-                print(f"      No {activity_type} places found")
+                logger.debug("No %s places found", activity_type)
         
         return places_by_category
     
@@ -471,7 +560,7 @@ Lời khuyên: {advice}"""
             return places
             
         except Exception as e:
-            print(f"Error in category search: {e}")
+            logger.error("Error in category search: %s", e)
             return []
     
     def _filter_by_opening_hours(
@@ -631,12 +720,11 @@ LƯU Ý QUAN TRỌNG:
 - Chỉ chọn địa điểm TRONG THÀNH PHỐ được yêu cầu ({request.destination}), không chọn địa điểm ở vùng lân cận
 - Chỉ trả về JSON, không thêm text hay giải thích."""
 
-        # Call Gemini with JSON response
-        response_text = self.gemini.generate_with_json(prompt)
-        
-        # Parse JSON response
         try:
-            itinerary_dict = json.loads(response_text)
+            itinerary_dict = self.gemini.generate_structured(
+                "generate_itinerary", prompt, ItineraryResponse,
+                temperature=0.7, top_p=0.95, max_output_tokens=8192
+            ).model_dump()
             
             # Optimize routes for each day
             if 'itinerary' in itinerary_dict:
@@ -646,8 +734,7 @@ LƯU Ý QUAN TRỌNG:
             
             return ItineraryResponse(**itinerary_dict)
         except Exception as e:
-            print(f"Error parsing Gemini response: {e}")
-            print(f"Response was: {response_text[:500]}...")
+            logger.error("Error parsing Gemini response: %s", e)
             # Fallback: create smart itinerary using scoring
             return self._create_smart_fallback_itinerary(request, places_by_category, weather_data)
     
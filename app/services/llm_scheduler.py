@@ -0,0 +1,207 @@
+"""
+LLM Scheduler
+Giới hạn tốc độ phía client cho các call Vertex AI (Gemini).
+
+- Hai token bucket: số request / phút (VERTEX_RPM_LIMIT) và số token / phút
+  (VERTEX_TPM_LIMIT). Token của một call được ước lượng trước khi gửi, rồi
+  điều chỉnh theo usage_metadata thật khi có response.
+- Hàng đợi ưu tiên: khi hết budget, call ưu tiên cao được nhận trước
+  (classify > trả lời chat > itinerary), cùng ưu tiên thì theo thứ tự đến.
+- Admission timeout: call chờ quá LLM_ADMISSION_TIMEOUT_SECONDS bị từ chối
+  (AdmissionTimeout) để caller dùng fallback thay vì treo request.
+- 429 / RESOURCE_EXHAUSTED: `pause()` dừng mọi admission theo Retry-After
+  (hoặc exponential backoff) để cả process lùi lại, không chỉ call bị lỗi.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_CHAT = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_CHAT: "chat", PRIORITY_BATCH: "batch"}
+
+# Ưu tiên theo operation của GeminiService
+LLM_PRIORITIES = {
+    "classify_query": PRIORITY_INTERACTIVE,
+    "answer_general_query": PRIORITY_CHAT,
+    "select_places": PRIORITY_CHAT,
+    "interpret_and_select": PRIORITY_CHAT,
+    "generate_itinerary": PRIORITY_BATCH,
+    "generate_itinerary_day": PRIORITY_BATCH,
+}
+
+LLM_ADMISSION_WAIT = Histogram(
+    "vietspot_llm_admission_wait_seconds",
+    "Time a Gemini call waits for rate-limit budget before being sent",
+    ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_ADMISSION_REJECTED = Counter(
+    "vietspot_llm_admission_rejected_total",
+    "Gemini calls rejected after waiting longer than the admission timeout",
+    ("priority",),
+)
+
+
+class AdmissionTimeout(TimeoutError):
+    """Call không được nhận trong thời gian admission timeout."""
+
+
+class TokenBucket:
+    """Bucket refill liên tục `rate_per_minute` / 60 mỗi giây, chứa tối đa một phút budget."""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Số giây đến khi đủ `amount` (0 nếu đã đủ)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.available >= amount else (amount - self.available) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Hoàn lại (delta > 0) hoặc trừ thêm (delta < 0, có thể âm - nợ budget)."""
+        self.available = min(self.capacity, self.available + delta)
+
+
+class LLMScheduler:
+    """
+    Example:
+        >>> scheduler = LLMScheduler(requests_per_minute=300, tokens_per_minute=1_000_000)
+        >>> scheduler.acquire(PRIORITY_INTERACTIVE, tokens=1200)
+        >>> ...  # gọi Gemini
+        >>> scheduler.record_usage(estimated=1200, actual=950)
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, admission_timeout: float = 10.0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.admission_timeout = admission_timeout
+        self._waiters = []  # heap (priority, seq)
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self, priority: int, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Chờ tới lượt (theo ưu tiên) và đủ budget, rồi trừ budget của call.
+
+        Raises:
+            AdmissionTimeout: Chờ quá timeout (mặc định admission_timeout)
+        """
+        started = time.monotonic()
+        deadline = started + (self.admission_timeout if timeout is None else timeout)
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._paused_until - now
+                    if wait <= 0 and self._waiters[0] == entry:
+                        wait = self._budget_wait(tokens, now)
+                        if wait <= 0:
+                            if self.requests is not None:
+                                self.requests.take(1)
+                            if self.tokens is not None:
+                                self.tokens.take(tokens)
+                            break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        LLM_ADMISSION_REJECTED.inc(priority=PRIORITY_NAMES.get(priority, str(priority)))
+                        raise AdmissionTimeout(f"LLM call (priority {priority}) chờ quá {deadline - started:.1f}s")
+                    # Không phải lượt mình: chờ notify khi waiter phía trước rời hàng đợi
+                    self._cond.wait(min(remaining, wait) if wait > 0 else remaining)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        LLM_ADMISSION_WAIT.observe(time.monotonic() - started, priority=PRIORITY_NAMES.get(priority, str(priority)))
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """
+        Trừ budget ngay nếu còn dư và không có call nào đang chờ, không block.
+        Dùng cho request hedge: hết budget thì bỏ hedge thay vì chiếm chỗ của
+        call khác.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._paused_until > now or self._waiters or self._budget_wait(tokens, now) > 0:
+                return False
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+        return True
+
+    def record_usage(self, estimated: int, actual: int) -> None:
+        """Điều chỉnh bucket token theo số token thật của response."""
+        if self.tokens is None or not actual:
+            return
+        with self._cond:
+            self.tokens.adjust(estimated - actual)
+
+    def pause(self, seconds: float) -> None:
+        """Dừng mọi admission trong `seconds` (khi bị 429 từ Vertex)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def _budget_wait(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.time_until(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.time_until(tokens, now))
+        return wait
+
+
+def rate_limit_delay(error: Exception, attempt: int, base: float = 1.0, cap: float = 30.0) -> Optional[float]:
+    """
+    Số giây chờ trước khi retry nếu error là rate limit (HTTP 429), None nếu không.
+    Dùng header Retry-After nếu có, ngược lại exponential backoff có jitter.
+    """
+    if getattr(error, "code", None) != 429:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+# Quota Vertex tính theo project: mọi GeminiService trong process dùng chung một scheduler
+llm_scheduler = LLMScheduler(
+    requests_per_minute=settings.VERTEX_RPM_LIMIT,
+    tokens_per_minute=settings.VERTEX_TPM_LIMIT,
+    admission_timeout=settings.LLM_ADMISSION_TIMEOUT_SECONDS,
+)
@@ -1,13 +1,68 @@
 from app.services.gemini_service import GeminiService
 from app.services.place_supabase_service import PlaceSupabaseService
 from app.services.semantic_service import SemanticSearchService
+from app.services.embedding_writer import PlaceEmbeddingWriter
 from app.services.weather_service import WeatherService
 from app.services.scoring_service import ScoringService
 from app.services.itinerary_service import ItineraryService
+from app.services.attribute_index import normalize_text
 from app.schemas.chat import ChatRequest, ChatResponse, PlaceInfo, QueryClassification
 from app.schemas.itinerary import ItineraryRequest
 from app.core.config import settings
-from typing import Optional, List, Dict, Any
+from app.core.logger import get_logger
+from app.core.metrics import STAGE_DURATION, Counter, Histogram, stage_timer
+from app.core.readiness import readiness
+from typing import Optional, List, Dict, Any, Callable
+import asyncio
+import os
+import random
+import re
+import time
+
+logger = get_logger(__name__)
+
+
+CHAT_LLM_FALLBACKS = Counter(
+    "vietspot_chat_llm_fallbacks_total",
+    "Gemini steps skipped because they would exceed the chat latency budget",
+    ("stage",),
+)
+CHAT_PIPELINE_DURATION = Histogram(
+    "vietspot_chat_pipeline_duration_seconds",
+    "End-to-end chat latency by pipeline (classic / single_call / single_call_fallback)",
+    ("pipeline",),
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 12, 20, 30),
+)
+CHAT_SINGLE_CALL_FALLBACKS = Counter(
+    "vietspot_chat_single_call_fallbacks_total",
+    "Requests assigned to the single-call pipeline that ran the classic pipeline instead",
+    ("reason",),
+)
+
+CHAT_PIPELINE_MODES = ("off", "on", "ab")
+
+# Câu hỏi cần pipeline classify đầy đủ (lịch trình, tìm quanh vị trí): so trên text không dấu
+_CLASSIC_ONLY_RE = re.compile(
+    r"\b(lich trinh|itinerary|ke hoach|\d+\s*ngay|\d+\s*days?|trip|gan day|gan toi|gan minh"
+    r"|xung quanh|quanh day|near me|nearby|around me)\b"
+)
+# Ràng buộc rating / so sánh ("trên 4.5 sao", "rated above 4"): single-call không
+# lọc min / max rating như pipeline classic nên chuyển sang classic
+_RATING_CONSTRAINT_RE = re.compile(
+    r"\b(\d(?:[.,]\d)?\s*(?:sao|stars?)\b|rating|rated|danh gia"
+    r"|(?:tren|duoi|hon|it nhat|toi thieu|toi da|above|below|over|under|at least|at most)\s*\d)"
+)
+# Giới từ mở đầu cụm địa điểm ("phở kiểu Hà Nội ở Đà Nẵng" -> "Đà Nẵng")
+_LOCATION_PREPOSITION_RE = re.compile(r"\b(?:ở|tại|in|at)\s+(?!least\b|most\b)", re.IGNORECASE)
+# Số lượng places yêu cầu: chỉ số đứng ngay trước danh từ địa điểm ("12 quán", "5 places"),
+# không phải số quận / phường ("Quận 10 view đẹp", "Quận 1 quán ngon")
+_PLACE_COUNT_RE = re.compile(
+    r"(?<!quận )(?<!phường )(?<!district )(?<!ward )(?<!q\.)(?<!p\.)"
+    r"\b(\d{1,2})\s+(?=(?:quán|địa điểm|điểm|chỗ|nơi|nhà hàng|khách sạn|bãi biển|bảo tàng|công viên"
+    r"|places?|spots?|restaurants?|cafes?|coffee shops?|hotels?|beaches|museums?)\b)",
+    re.IGNORECASE
+)
+_REQUEST_PHRASES = ('tìm cho tôi', 'cho tôi', 'tìm', 'gợi ý', 'đề xuất', 'liệt kê', 'show me', 'find', 'give me')
 
 
 class ChatbotOrchestrator:
@@ -15,38 +70,273 @@ class ChatbotOrchestrator:
     Main orchestrator that coordinates all services to handle user queries
     """
     
-    def __init__(self):
-        self.gemini = GeminiService()
-        self.supabase = PlaceSupabaseService()
-        self.semantic = SemanticSearchService()
-        self.weather = WeatherService()
-        self.scoring = ScoringService()
-        self.itinerary_service = ItineraryService()
+    def __init__(
+        self,
+        gemini: Optional[GeminiService] = None,
+        supabase: Optional[PlaceSupabaseService] = None,
+        semantic: Optional[SemanticSearchService] = None,
+        weather: Optional[WeatherService] = None,
+        scoring: Optional[ScoringService] = None,
+        itinerary_service: Optional[ItineraryService] = None,
+    ):
+        # Service truyền vào (benchmark, transport giả lập) thay cho bản mặc định
+        self.gemini = gemini or GeminiService()
+        self.supabase = supabase or PlaceSupabaseService()
+        self.semantic = semantic or SemanticSearchService()
+        self.weather = weather or WeatherService()
+        self.scoring = scoring or ScoringService()
+        self.itinerary_service = itinerary_service or ItineraryService()
+        # Embed place mới / vừa sửa ở background, ghi cột embed + cập nhật index
+        self.embedding_writer = PlaceEmbeddingWriter(self.semantic, persist=self.supabase.update_place_embedding)
+        if settings.CHAT_SINGLE_CALL_MODE not in CHAT_PIPELINE_MODES:
+            raise ValueError(
+                f"CHAT_SINGLE_CALL_MODE={settings.CHAT_SINGLE_CALL_MODE!r} không hợp lệ, chọn một trong {CHAT_PIPELINE_MODES}"
+            )
+    
+    def warm_up(self) -> None:
+        """
+        Load embedding model và embeddings của catalog (blocking, chạy trong
+        background thread từ lifespan). Trong lúc chờ, chat dùng keyword ranking.
+        """
+        try:
+            with stage_timer("warmup_model"):
+                self.semantic.load_model()
+            readiness.mark_ready("embedding_model")
+            logger.info("Embedding model %s loaded (backend=%s)", settings.EMBEDDING_MODEL, settings.EMBEDDING_BACKEND)
+        except Exception as e:
+            readiness.mark_failed("embedding_model", e)
+            # Không có model thì catalog không bao giờ được embed
+            readiness.mark_failed("catalog", RuntimeError("embedding model failed to load"))
+            logger.exception("Failed to load embedding model: %s", e)
+            return
+        
+        if settings.QUERY_EMBEDDING_CACHE_PATH:
+            loaded = self.semantic.query_cache.load(settings.QUERY_EMBEDDING_CACHE_PATH)
+            logger.info("Loaded %d cached query embeddings", loaded)
+        
+        if settings.ANN_INDEX_PATH and os.path.exists(settings.ANN_INDEX_PATH):
+            try:
+                with stage_timer("warmup_catalog"):
+                    self.semantic.load_index(settings.ANN_INDEX_PATH)
+                readiness.mark_ready("catalog")
+                logger.info(
+                    "Loaded ANN index %s: %d places, nlist=%d, nprobe=%d",
+                    settings.ANN_INDEX_PATH, len(self.semantic.index), self.semantic.index.nlist, self.semantic.index.nprobe
+                )
+                return
+            except Exception as e:
+                logger.exception("Failed to load ANN index, falling back to catalog preload: %s", e)
+        
+        if settings.CATALOG_PRELOAD_LIMIT <= 0:
+            readiness.mark_ready("catalog")
+            return
+        try:
+            with stage_timer("warmup_catalog"):
+                catalog = self.supabase.get_all_places(limit=settings.CATALOG_PRELOAD_LIMIT)
+                self.semantic.embed_places(catalog)
+            readiness.mark_ready("catalog")
+            store = self.semantic.places_embeddings
+            logger.info(
+                "Preloaded embeddings for %d places (%s, %.1f MiB)",
+                len(store), store.dtype, store.nbytes / 2**20
+            )
+        except Exception as e:
+            readiness.mark_failed("catalog", e)
+            logger.exception("Failed to preload catalog: %s", e)
+    
+    def shut_down(self) -> None:
+        """Ghi query embedding cache ra file (nếu cấu hình QUERY_EMBEDDING_CACHE_PATH)."""
+        if not settings.QUERY_EMBEDDING_CACHE_PATH:
+            return
+        try:
+            cache = self.semantic.query_cache
+            saved = cache.save(settings.QUERY_EMBEDDING_CACHE_PATH)
+            logger.info("Saved %d query embeddings (hit rate %.1f%%)", saved, cache.hit_rate * 100)
+        except Exception as e:
+            logger.error("Failed to save query embedding cache: %s", e)
     
     async def process_query(self, request: ChatRequest) -> ChatResponse:
         """
         Main workflow to process user query
+        
+        Pipeline theo CHAT_SINGLE_CALL_MODE: "off" luôn classify rồi chọn places
+        (2 call Gemini), "on" thử single-call trước, "ab" chia ngẫu nhiên
+        CHAT_SINGLE_CALL_AB_PERCENT% request sang single-call để so latency.
+        """
+        started = time.perf_counter()
+        # Latency budget của cả request: các bước Gemini bị cắt theo deadline
+        deadline = (
+            time.monotonic() + settings.CHAT_LATENCY_BUDGET_SECONDS
+            if settings.CHAT_LATENCY_BUDGET_SECONDS > 0 else None
+        )
+        pipeline = self._choose_pipeline()
+        response = None
+        if pipeline == "single_call":
+            response = await self._process_single_call(request, deadline)
+            if response is None:
+                pipeline = "single_call_fallback"
+        if response is None:
+            response = await self._process_classic(request, deadline)
+        CHAT_PIPELINE_DURATION.observe(time.perf_counter() - started, pipeline=pipeline)
+        return response
+    
+    @staticmethod
+    def _choose_pipeline() -> str:
+        mode = settings.CHAT_SINGLE_CALL_MODE
+        if mode == "on" or (mode == "ab" and random.random() * 100 < settings.CHAT_SINGLE_CALL_AB_PERCENT):
+            return "single_call"
+        return "classic"
+    
+    async def _process_single_call(self, request: ChatRequest, deadline: Optional[float]) -> Optional[ChatResponse]:
+        """
+        Tìm địa điểm với MỘT call Gemini: retrieve ứng viên từ ANN index bằng
+        chính câu hỏi (lọc city / district / category, xem _single_call_filters), rồi
+        Gemini vừa hiểu câu hỏi vừa chọn + giới thiệu places.
+        
+        Returns:
+            ChatResponse, hoặc None nếu request không hợp (chưa có index, câu hỏi
+            lịch trình / quanh vị trí / có ràng buộc rating, không phải tìm địa điểm) - caller chạy
+            pipeline classic
         """
         user_prompt = request.message
+        normalized = normalize_text(user_prompt)
+        reason = None
+        if not self.semantic.has_index:
+            reason = "no_index"
+        elif _CLASSIC_ONLY_RE.search(normalized):
+            reason = "intent"
+        elif _RATING_CONSTRAINT_RE.search(normalized):
+            reason = "rating"
+        if reason:
+            CHAT_SINGLE_CALL_FALLBACKS.inc(reason=reason)
+            return None
+        
         user_lat = request.user_lat
         user_lon = request.user_lon
         has_user_location = user_lat is not None and user_lon is not None
         
-        print(f"📝 Original query: {user_prompt}")
-        print(f"User location: {'Yes' if has_user_location else 'No'}")
+        count = _PLACE_COUNT_RE.search(user_prompt)
+        top_k = int(count.group(1)) if count and int(count.group(1)) > 0 else settings.TOP_K_FINAL_RESULTS
+        top_n = max(top_k * 2, settings.TOP_N_SEMANTIC_RESULTS)
+        
+        # Query cho embedding: bỏ số lượng và cụm yêu cầu như pipeline classic
+        semantic_query = _PLACE_COUNT_RE.sub('', user_prompt.lower())
+        for phrase in _REQUEST_PHRASES:
+            semantic_query = semantic_query.replace(phrase, '')
+        semantic_query = ' '.join(semantic_query.split()).strip() or user_prompt
+        
+        attribute_filters = self._single_call_filters(user_prompt)
+        with stage_timer("semantic"):
+            places = await asyncio.to_thread(
+                self._catalog_semantic_search, semantic_query, top_n, attribute_filters
+            )
+        if not places:
+            CHAT_SINGLE_CALL_FALLBACKS.inc(reason="no_candidates")
+            return None
+        
+        weather_data = None
+        with stage_timer("weather"):
+            if has_user_location:
+                weather_data = self.weather.get_weather_by_coords(user_lat, user_lon)
+        
+        if has_user_location:
+            for place in places:
+                if 'distance_km' not in place:
+                    distance = self.supabase.calculate_distance(
+                        user_lat, user_lon,
+                        place['latitude'], place['longitude']
+                    )
+                    place['distance_km'] = round(distance, 2)
+        
+        with stage_timer("rank"):
+            candidate_places = self.scoring.rank_places(
+                places,
+                has_user_location=has_user_location,
+                top_k=top_k * 5
+            )
+        
+        with stage_timer("llm_select"):
+            result = await self._call_llm(
+                "single_call", deadline, self.gemini.interpret_and_select,
+                reserve_seconds=settings.CHAT_RESPONSE_RESERVE_SECONDS,
+                user_prompt=user_prompt,
+                places=candidate_places,
+                max_places=top_k,
+                weather_data=weather_data
+            )
+        if result is None:
+            selected_places = candidate_places[:top_k]
+            answer = self._local_answer(selected_places)
+        else:
+            is_place_search, selected_places, answer = result
+            if not is_place_search:
+                CHAT_SINGLE_CALL_FALLBACKS.inc(reason="not_place_search")
+                return None
+        logger.debug("Single-call pipeline selected %d places", len(selected_places))
+        
+        return self._build_response(
+            selected_places, answer, "specific_search", weather_data, user_lat, user_lon
+        )
+    
+    def _single_call_filters(self, user_prompt: str) -> Dict[str, str]:
+        """
+        Điều kiện thuộc tính cho retrieval của single-call, mỗi điều kiện khớp
+        trên cụm của riêng nó: city / district trên cụm sau giới từ địa điểm
+        cuối cùng, category trên phần còn lại của câu ("phở kiểu Hà Nội ở Đà
+        Nẵng" chỉ lọc Đà Nẵng). Câu không có giới từ chỉ lọc địa điểm khi nhắc
+        tới không quá một thành phố.
+        """
+        text = re.sub(r"[^\w\s]", " ", user_prompt)
+        parts = _LOCATION_PREPOSITION_RE.split(text)
+        if len(parts) > 1:
+            subject, location = " ".join(parts[:-1]), parts[-1]
+        else:
+            subject = location = text
+            if len(self.semantic.attributes.match('city', text)) > 1:
+                location = None
+        filters = {'category': subject}
+        if location:
+            filters['city'] = location
+            filters['district'] = location
+        return filters
+    
+    async def _process_classic(self, request: ChatRequest, deadline: Optional[float]) -> ChatResponse:
+        """
+        Pipeline classify -> search -> Gemini chọn places + trả lời
+        """
+        user_prompt = request.message
+        user_lat = request.user_lat
+        user_lon = request.user_lon
+        has_user_location = user_lat is not None and user_lon is not None
+        
+        logger.debug("Original query: %s (user location: %s)", user_prompt, has_user_location)
         
         # Step 1: Classify query using Gemini (includes spell correction)
-        classification = self.gemini.classify_query(user_prompt)
-        print(f"✅ Corrected query: {classification.corrected_query}")
-        print(f"Query classification: {classification.query_type}")
-        print(f"Keywords: {classification.keywords}")
-        print(f"Location: {classification.location_mentioned}")
-        print(f"Number of places requested: {classification.number_of_places}")
-        print(f"Needs semantic search: {classification.needs_semantic_search}")
+        # Các call Gemini chạy trong thread pool: không block event loop, và
+        # request đồng thời giống hệt nhau được gộp bởi singleflight
+        with stage_timer("classify"):
+            classification = await self._call_llm(
+                "classify", deadline, self.gemini.classify_query, user_prompt,
+                max_seconds=settings.CHAT_CLASSIFY_TIMEOUT_SECONDS
+            )
+        if classification is None:
+            classification = self.gemini.fallback_classification(user_prompt)
+        logger.info(
+            "Query classified as %s (semantic=%s)",
+            classification.query_type, classification.needs_semantic_search
+        )
+        logger.debug(
+            "Classification: corrected=%r keywords=%s location=%s number_of_places=%s",
+            classification.corrected_query, classification.keywords,
+            classification.location_mentioned, classification.number_of_places
+        )
         
         # Step 2: Handle general queries directly
         if classification.query_type == "general_query":
-            answer = self.gemini.answer_general_query(user_prompt)
+            with stage_timer("general_answer"):
+                answer = await self._call_llm("general_answer", deadline, self.gemini.answer_general_query, user_prompt)
+            if answer is None:
+                answer = "Xin lỗi, tôi không thể trả lời câu hỏi này lúc này. Vui lòng thử lại."
             return ChatResponse(
                 answer=answer,
                 places=[],
@@ -57,9 +347,10 @@ class ChatbotOrchestrator:
         
         # Step 2.5: Handle itinerary requests
         if classification.query_type == "itinerary_request":
-            return await self._handle_itinerary_request(
-                classification, user_prompt, user_lat, user_lon, has_user_location
-            )
+            with stage_timer("itinerary"):
+                return await self._handle_itinerary_request(
+                    classification, user_prompt, user_lat, user_lon, has_user_location
+                )
         
         # Step 3: Determine search strategy
         places = await self._search_places(classification, user_lat, user_lon)
@@ -75,10 +366,11 @@ class ChatbotOrchestrator:
         
         # Step 4: Get weather information
         weather_data = None
-        if has_user_location:
-            weather_data = self.weather.get_weather_by_coords(user_lat, user_lon)
-        elif classification.location_mentioned:
-            weather_data = self.weather.get_weather_by_city(classification.location_mentioned)
+        with stage_timer("weather"):
+            if has_user_location:
+                weather_data = self.weather.get_weather_by_coords(user_lat, user_lon)
+            elif classification.location_mentioned:
+                weather_data = self.weather.get_weather_by_city(classification.location_mentioned)
         
         # Step 5: Calculate distances (if user location available)
         if has_user_location:
@@ -92,28 +384,54 @@ class ChatbotOrchestrator:
         
         # Step 6: Rank and score places
         top_k = classification.number_of_places or settings.TOP_K_FINAL_RESULTS
-        candidate_places = self.scoring.rank_places(
-            places, 
-            has_user_location=has_user_location,
-            top_k=top_k * 5  # Get 3x more candidates for Gemini to select from
-        )
+        with stage_timer("rank"):
+            candidate_places = self.scoring.rank_places(
+                places, 
+                has_user_location=has_user_location,
+                top_k=top_k * 5  # Get 3x more candidates for Gemini to select from
+            )
         
         # Step 7: Let Gemini select places AND generate response
-        print(f"🤖 Letting Gemini select from {len(candidate_places)} candidates and generate response...")
-        selected_places, answer = self.gemini.select_places_and_generate_response(
-            user_prompt=user_prompt,
-            places=candidate_places,
-            max_places=top_k,
-            weather_data=weather_data,
-            original_language=classification.original_language
+        logger.debug("Letting Gemini select from %d candidates", len(candidate_places))
+        with stage_timer("llm_select"):
+            selection = await self._call_llm(
+                "llm_select", deadline, self.gemini.select_places_and_generate_response,
+                reserve_seconds=settings.CHAT_RESPONSE_RESERVE_SECONDS,
+                user_prompt=user_prompt,
+                places=candidate_places,
+                max_places=top_k,
+                weather_data=weather_data,
+                original_language=classification.original_language
+            )
+        if selection is None:
+            # Quá budget: dùng thứ hạng của ScoringService + câu trả lời mẫu
+            selected_places = candidate_places[:top_k]
+            answer = self._local_answer(selected_places, classification.original_language)
+        else:
+            selected_places, answer = selection
+        logger.debug("Gemini selected %d places", len(selected_places))
+        
+        return self._build_response(
+            selected_places, answer, classification.query_type, weather_data, user_lat, user_lon
         )
-        print(f"✅ Gemini selected {len(selected_places)} places and generated response")
+    
+    def _build_response(
+        self,
+        selected_places: List[Dict[str, Any]],
+        answer: str,
+        query_type: str,
+        weather_data: Optional[Dict[str, Any]],
+        user_lat: Optional[float],
+        user_lon: Optional[float]
+    ) -> ChatResponse:
+        """Thêm ảnh cho places đã chọn và format ChatResponse"""
+        has_user_location = user_lat is not None and user_lon is not None
         
-        # Step 7.5: Add images to selected places
-        print(f"🖼️ Fetching images for {len(selected_places)} selected places...")
-        selected_places = self.supabase.add_images_to_places(selected_places, max_images=5)
+        # Add images to selected places
+        with stage_timer("images"):
+            selected_places = self.supabase.add_images_to_places(selected_places, max_images=5)
         
-        # Step 8: Format response
+        # Format response
         place_infos = []
         for place in selected_places:
             about_text = place.get('about', '')
@@ -143,11 +461,59 @@ class ChatbotOrchestrator:
         return ChatResponse(
             answer=answer,
             places=place_infos,
-            query_type=classification.query_type,
+            query_type=query_type,
             total_places=len(selected_places),
             user_location={'lat': user_lat, 'lon': user_lon} if has_user_location else None
         )
     
+    async def _call_llm(
+        self,
+        stage: str,
+        deadline: Optional[float],
+        func: Callable,
+        *args,
+        max_seconds: float = 0,
+        reserve_seconds: float = 0,
+        **kwargs
+    ) -> Any:
+        """
+        Chạy một bước Gemini trong thread pool, giới hạn bởi phần budget còn lại
+        (trừ reserve_seconds, tối đa max_seconds). Trả về None nếu không kịp -
+        caller dùng kết quả local. Thread vẫn chạy tới khi Gemini trả về, nhưng
+        response không còn chờ nó.
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = deadline - time.monotonic() - reserve_seconds
+        if max_seconds > 0:
+            timeout = max_seconds if timeout is None else min(timeout, max_seconds)
+        if timeout is not None and timeout <= 0:
+            CHAT_LLM_FALLBACKS.inc(stage=stage)
+            logger.warning("No latency budget left for %s, using local fallback", stage)
+            return None
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            CHAT_LLM_FALLBACKS.inc(stage=stage)
+            logger.warning("%s exceeded its %.1fs latency budget, using local fallback", stage, timeout)
+            return None
+    
+    @staticmethod
+    def _local_answer(places: List[Dict[str, Any]], language: str = "vi") -> str:
+        """Câu trả lời mẫu cho danh sách places xếp hạng local (khi không chờ được Gemini)."""
+        if language == "vi":
+            lines = [f"Dưới đây là {len(places)} địa điểm phù hợp nhất với yêu cầu của bạn:"]
+        else:
+            lines = [f"Here are the {len(places)} places that best match your request:"]
+        for i, place in enumerate(places, 1):
+            line = f"{i}. {place.get('name', '')}"
+            if place.get('address'):
+                line += f" - {place['address']}"
+            if place.get('rating'):
+                line += f" (⭐ {place['rating']})"
+            lines.append(line)
+        return "\n".join(lines)
+    
     async def _search_places(
         self,
         classification: QueryClassification,
@@ -158,12 +524,15 @@ class ChatbotOrchestrator:
         Execute search strategy based on query classification
         """
         places = []
+        search_started = time.perf_counter()
+        # Có ANN index: query contextual không cần tải 5000 places để rerank
+        catalog_semantic = classification.needs_semantic_search and self.semantic.has_index
         
         # Handle nearby search with geometry
         if classification.query_type == "nearby_search" and user_lat and user_lon:
             radius_km = classification.radius_km or settings.DEFAULT_NEARBY_RADIUS_KM
             
-            print(f"📍 Performing nearby search with radius: {radius_km} km")
+            logger.debug("Performing nearby search with radius: %s km", radius_km)
             
             places = self.supabase.geometry_nearby_search(
                 user_lat=user_lat,
@@ -173,7 +542,6 @@ class ChatbotOrchestrator:
             
             # Apply rating filter if specified
             if places and (classification.min_rating is not None or classification.max_rating is not None):
-                print(f"   Applying rating filter: {classification.min_rating} - {classification.max_rating}")
                 filtered_places = []
                 for place in places:
                     rating = place.get('rating')
@@ -184,15 +552,17 @@ class ChatbotOrchestrator:
                             filtered_places.append(place)
                 
                 if filtered_places:
-                    print(f"   Filtered to {len(filtered_places)} places matching rating criteria")
+                    logger.debug(
+                        "Filtered to %d places matching rating %s - %s",
+                        len(filtered_places), classification.min_rating, classification.max_rating
+                    )
                     places = filtered_places
         
         # Keyword search for specific queries
         elif classification.query_type == "specific_search":
             corrected_keywords = classification.keywords
             variants = classification.keyword_variants if hasattr(classification, 'keyword_variants') else []
-            print(f"🔍 Performing keyword search with keywords: {corrected_keywords}, variants: {variants}")
-            print(f"   Rating filter: {classification.min_rating} - {classification.max_rating}")
+            logger.debug("Performing keyword search: keywords=%s variants=%s", corrected_keywords, variants)
             places = self.supabase.keyword_search(
                 keywords=corrected_keywords,
                 location=classification.location_mentioned,
@@ -203,18 +573,22 @@ class ChatbotOrchestrator:
                 keyword_variants=variants
             )
             
-            if not places and classification.keywords:
-                print(f"Keyword search returned 0 results. Trying location-only filter...")
+            if not places and classification.keywords and not catalog_semantic:
+                logger.debug("Keyword search returned 0 results, falling back to all places")
                 places = self.supabase.get_all_places(limit=5000)
         
         # Fallback: get all places
-        if not places:
-            print("No results from any search, fetching places for semantic search")
+        if not places and not catalog_semantic:
+            logger.debug("No results from any search, fetching places for semantic search")
             places = self.supabase.get_all_places(limit=5000)
         
+        STAGE_DURATION.observe(time.perf_counter() - search_started, stage="search")
+        
         # Only run semantic search if query has contextual meaning that needs understanding
-        if places and classification.needs_semantic_search:
-            print(f"🔍 Performing semantic search on {len(places)} places (query has contextual meaning)")
+        if places and classification.needs_semantic_search and not self.semantic.is_ready:
+            logger.info("Embedding model not ready, using keyword ranking for %d places", len(places))
+        elif (places or catalog_semantic) and classification.needs_semantic_search:
+            logger.debug("Performing semantic search on %d places", len(places) if places else len(self.semantic.index))
             top_n = classification.number_of_places or settings.TOP_N_SEMANTIC_RESULTS
             top_n = max(top_n * 2, settings.TOP_N_SEMANTIC_RESULTS)
             
@@ -242,15 +616,40 @@ class ChatbotOrchestrator:
             
             semantic_query = ' '.join(semantic_query.split()).strip()  # Clean up whitespace
             
-            print(f"Semantic search query (context only): {semantic_query}")
-            places = self.semantic.hybrid_search(
-                query=semantic_query,
-                keyword_places=places,
-                all_places=[],
-                top_k=top_n
-            )
+            logger.debug("Semantic search query (context only): %s", semantic_query)
             
-            # Post-filter by location
+            # Lọc theo location / category / rating bằng bitmap TRƯỚC khi chấm điểm
+            attribute_filters = {
+                'location': classification.location_mentioned,
+                'city': classification.city,
+                'district': classification.district,
+                'category': classification.category,
+                'min_rating': classification.min_rating,
+                'max_rating': classification.max_rating,
+            }
+            # Chạy trong thread pool: event loop không bị block và các request
+            # đồng thời được gom chung batch embedding
+            with stage_timer("semantic"):
+                # Có ANN index: luôn lấy top N trên toàn catalog (đã lọc bitmap),
+                # gộp với pool keyword - không chỉ rerank vài kết quả keyword
+                catalog_places = []
+                if catalog_semantic:
+                    catalog_places = await asyncio.to_thread(
+                        self._catalog_semantic_search, semantic_query, top_n, attribute_filters
+                    )
+                if places:
+                    places = await asyncio.to_thread(
+                        self.semantic.hybrid_search,
+                        query=semantic_query,
+                        keyword_places=places,
+                        all_places=catalog_places,
+                        top_k=top_n,
+                        filters=attribute_filters
+                    )
+                else:
+                    places = catalog_places
+            
+            # Post-filter by location (cho location không có trong bitmap, ví dụ tên đường)
             if classification.location_mentioned and len(places) > 0:
                 filtered_places = []
                 for place in places:
@@ -260,13 +659,37 @@ class ChatbotOrchestrator:
                         filtered_places.append(place)
                 
                 if len(filtered_places) > 0:
-                    print(f"Filtered to {len(filtered_places)} places matching location in address")
+                    logger.debug("Filtered to %d places matching location in address", len(filtered_places))
                     places = filtered_places
         elif places:
-            print(f"⏭️ Skipping semantic search (query has no contextual meaning, using {len(places)} keyword results directly)")
+            logger.debug("Skipping semantic search, using %d keyword results directly", len(places))
         
         return places
     
+    def _catalog_semantic_search(
+        self,
+        semantic_query: str,
+        top_n: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Semantic search trên toàn bộ catalog qua ANN index, rồi lấy chi tiết
+        của top places từ Supabase (giữ thứ tự theo semantic_score).
+        """
+        hits = self.semantic.catalog_search(semantic_query, top_k=top_n, filters=filters)
+        if not hits:
+            return []
+        places_by_id = {
+            place.get('id'): place
+            for place in self.supabase.get_places_by_ids([place_id for place_id, _ in hits])
+        }
+        places = []
+        for place_id, score in hits:
+            place = places_by_id.get(place_id)
+            if place is not None:
+                places.append({**place, 'semantic_score': round(score, 4)})
+        return places
+    
     async def _handle_itinerary_request(
         self,
         classification: QueryClassification,
@@ -278,9 +701,10 @@ class ChatbotOrchestrator:
         """
         Handle itinerary generation request from chatbot
         """
-        print(f"🗓️ Handling itinerary request...")
-        print(f"   Location: {classification.location_mentioned}")
-        print(f"   Num days: {classification.num_days}")
+        logger.info(
+            "Handling itinerary request: location=%s num_days=%s",
+            classification.location_mentioned, classification.num_days
+        )
         
         try:
             # Extract parameters for itinerary
@@ -302,7 +726,7 @@ class ChatbotOrchestrator:
             )
             
             # Generate itinerary
-            itinerary_response = self.itinerary_service.generate_itinerary(itinerary_request)
+            itinerary_response = await asyncio.to_thread(self.itinerary_service.generate_itinerary, itinerary_request)
             
             # Convert itinerary to dict for response
             itinerary_dict = itinerary_response.model_dump()
@@ -335,9 +759,7 @@ class ChatbotOrchestrator:
             )
             
         except Exception as e:
-            print(f"❌ Error generating itinerary: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error generating itinerary: %s", e)
             return ChatResponse(
                 answer=f"Xin lỗi, tôi không thể tạo lịch trình lúc này. Lỗi: {str(e)}",
                 places=[],
@@ -0,0 +1,79 @@
+"""
+Place Detail Service
+Lấy chi tiết một địa điểm (place + images + comments) với cache ngắn hạn
+"""
+
+import asyncio
+import copy
+from typing import Any, Dict, Optional
+from supabase import Client
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import track_outbound
+
+# Cache chi tiết place theo place_id - bị xóa khi có comment/ảnh mới
+place_detail_cache = TTLCache(
+    maxsize=settings.PLACE_DETAIL_CACHE_MAX_ENTRIES,
+    ttl=settings.PLACE_DETAIL_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_place_detail(place_id: Optional[str]) -> None:
+    """Xóa cache chi tiết của một place (gọi sau mỗi lần ghi comment/ảnh/place)."""
+    if place_id:
+        place_detail_cache.delete(str(place_id))
+
+
+async def get_place_detail(db: Client, place_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Lấy chi tiết place cùng N ảnh đầu và trang comments đầu tiên.
+
+    Ba query chạy song song; comments_count lấy từ count của database
+    thay vì đếm toàn bộ comments.
+
+    Args:
+        db: Supabase client
+        place_id: UUID của địa điểm
+
+    Returns:
+        Dict chi tiết place, hoặc None nếu không tồn tại
+    """
+    cached = place_detail_cache.get(place_id)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    images_limit = settings.PLACE_DETAIL_IMAGES_LIMIT
+    comments_limit = settings.PLACE_DETAIL_COMMENTS_LIMIT
+
+    def _fetch_place():
+        return db.table('places').select('*').eq('id', place_id).execute()
+
+    def _fetch_images():
+        return db.table('images').select('id, url').eq('place_id', place_id).limit(images_limit).execute()
+
+    def _fetch_comments():
+        return db.table('comments').select('*', count='exact') \
+            .eq('place_id', place_id) \
+            .order('date', desc=True) \
+            .range(0, comments_limit - 1) \
+            .execute()
+
+    # Supabase client là sync -> chạy song song trong thread pool
+    with track_outbound("supabase", "place_detail"):
+        place_resp, img_resp, comments_resp = await asyncio.gather(
+            asyncio.to_thread(_fetch_place),
+            asyncio.to_thread(_fetch_images),
+            asyncio.to_thread(_fetch_comments),
+        )
+
+    if not place_resp.data:
+        return None
+
+    place = place_resp.data[0]
+    place['images'] = img_resp.data if img_resp.data else []
+    place['comments'] = comments_resp.data if comments_resp.data else []
+    place['comments_count'] = comments_resp.count if comments_resp.count is not None else len(place['comments'])
+
+    place_detail_cache.set(place_id, place)
+    return copy.deepcopy(place)
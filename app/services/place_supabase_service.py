@@ -1,8 +1,12 @@
 from supabase import create_client, Client
 from app.core.config import settings
-from typing import List, Dict, Optional, Any
+from app.core.logger import get_logger
+from app.core.metrics import track_outbound
+from typing import List, Dict, Optional, Any, Iterator
 import math
 
+logger = get_logger(__name__)
+
 
 class PlaceSupabaseService:
     """Service for place-related Supabase operations (chatbot functionality)"""
@@ -94,33 +98,35 @@ class PlaceSupabaseService:
                     name_filters.append(f"name.ilike.%{term}%")
                     name_filters.append(f"address.ilike.%{term}%")
             
-            print(f"DEBUG: location_filters: {location_filters}")
-            print(f"DEBUG: category_filters: {category_filters}")
-            print(f"DEBUG: name_filters: {name_filters[:4]}...")
+            logger.debug(
+                "keyword_search filters: location=%s category=%s name=%s...",
+                location_filters, category_filters, name_filters[:4]
+            )
             
             # Strategy: Query by location in DB, then filter by category in Python
             # This avoids issues with special characters in category names
             if location_filters:
                 location_or = ",".join(location_filters)
-                print(f"DEBUG: Filtering by location: {location_or}")
+                logger.debug("Filtering by location: %s", location_or)
                 query = query.or_(location_or)
             
             if name_filters and not location_filters:
                 # Only use name filters if no location specified
                 filter_string = ",".join(name_filters)
-                print(f"DEBUG: Using name filters: {len(name_filters)} filters")
+                logger.debug("Using name filters: %d filters", len(name_filters))
                 query = query.or_(filter_string)
             
             if min_rating is not None:
-                print(f"DEBUG: Adding min_rating filter: {min_rating}")
                 query = query.gte("rating", min_rating)
             if max_rating is not None:
-                print(f"DEBUG: Adding max_rating filter: {max_rating}")
                 query = query.lte("rating", max_rating)
             
-            print(f"DEBUG: Executing query...")
-            response = query.execute()
-            print(f"DEBUG: Raw response data length: {len(response.data)}")
+            with track_outbound("supabase", "keyword_search"):
+                response = query.execute()
+            logger.debug(
+                "keyword_search returned %d rows (rating %s - %s)",
+                len(response.data), min_rating, max_rating
+            )
             
             # Parse coordinates and calculate match score
             places = []
@@ -161,10 +167,10 @@ class PlaceSupabaseService:
                 # Filter to only include places that match category
                 category_matched_places = [p for p in places if p.get('category_matched')]
                 if category_matched_places:
-                    print(f"DEBUG: Found {len(category_matched_places)} places matching category")
+                    logger.debug("Found %d places matching category", len(category_matched_places))
                     places = category_matched_places
                 else:
-                    print(f"DEBUG: No places matched category, returning all {len(places)} places")
+                    logger.debug("No places matched category, returning all %d places", len(places))
             
             # Sort by match score
             places.sort(key=lambda x: x.get('keyword_match_score', 0), reverse=True)
@@ -172,9 +178,7 @@ class PlaceSupabaseService:
             return places
             
         except Exception as e:
-            print(f"Error in keyword_search: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in keyword_search: %s", e)
             return []
     
     def geometry_nearby_search(
@@ -190,24 +194,25 @@ class PlaceSupabaseService:
         try:
             import json
             
-            print(f"🔍 Calling nearby_places function:")
-            print(f"   - user_lat: {user_lat}, user_lon: {user_lon}")
-            print(f"   - radius_km: {radius_km}")
-            print(f"   - limit: {limit}")
+            logger.debug(
+                "Calling nearby_places: user_lat=%s user_lon=%s radius_km=%s limit=%s",
+                user_lat, user_lon, radius_km, limit
+            )
             
-            response = self.client.rpc(
-                'nearby_places',
-                {
-                    'user_lat': user_lat,
-                    'user_lon': user_lon,
-                    'radius_km': radius_km,
-                    'place_category': None,
-                    'result_limit': limit
-                }
-            ).execute()
+            with track_outbound("supabase", "nearby_places"):
+                response = self.client.rpc(
+                    'nearby_places',
+                    {
+                        'user_lat': user_lat,
+                        'user_lon': user_lon,
+                        'radius_km': radius_km,
+                        'place_category': None,
+                        'result_limit': limit
+                    }
+                ).execute()
             
             places = response.data
-            print(f"✅ nearby_places returned {len(places)} places")
+            logger.debug("nearby_places returned %d places", len(places))
             
             filtered_places = []
             for place in places:
@@ -229,7 +234,7 @@ class PlaceSupabaseService:
             return filtered_places
             
         except Exception as e:
-            print(f"Error in geometry_nearby_search: {e}")
+            logger.error("Error in geometry_nearby_search: %s", e)
             return []
     
     def get_all_places(self, limit: int = 5000) -> List[Dict[str, Any]]:
@@ -238,7 +243,8 @@ class PlaceSupabaseService:
         """
         try:
             import json
-            response = self.client.table(self.places_table).select("*").limit(limit).execute()
+            with track_outbound("supabase", "get_all_places"):
+                response = self.client.table(self.places_table).select("*").limit(limit).execute()
             places = []
             for place in response.data:
                 if place.get('coordinates'):
@@ -248,16 +254,36 @@ class PlaceSupabaseService:
                 places.append(place)
             return places
         except Exception as e:
-            print(f"Error in get_all_places: {e}")
+            logger.error("Error in get_all_places: %s", e)
             return []
     
+    def iter_all_places(self, page_size: int = 1000, columns: str = "*") -> Iterator[List[Dict[str, Any]]]:
+        """
+        Duyệt toàn bộ bảng places theo trang (keyset theo id), dùng cho job
+        offline như build ANN index - không bị giới hạn max-rows của PostgREST.
+        """
+        last_id = None
+        while True:
+            query = self.client.table(self.places_table).select(columns).order("id").limit(page_size)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            with track_outbound("supabase", "iter_all_places"):
+                response = query.execute()
+            if not response.data:
+                return
+            yield response.data
+            if len(response.data) < page_size:
+                return
+            last_id = response.data[-1]["id"]
+    
     def get_places_by_ids(self, place_ids: List[str]) -> List[Dict[str, Any]]:
         """
         Get places by their IDs
         """
         try:
             import json
-            response = self.client.table(self.places_table).select("*").in_("id", place_ids).execute()
+            with track_outbound("supabase", "get_places_by_ids"):
+                response = self.client.table(self.places_table).select("*").in_("id", place_ids).execute()
             places = []
             for place in response.data:
                 if place.get('coordinates'):
@@ -267,9 +293,21 @@ class PlaceSupabaseService:
                 places.append(place)
             return places
         except Exception as e:
-            print(f"Error in get_places_by_ids: {e}")
+            logger.error("Error in get_places_by_ids: %s", e)
             return []
     
+    def update_place_embedding(self, place_id: str, embedding: List[float]) -> bool:
+        """
+        Ghi cột embed của một place (write-through sau khi tạo / sửa place)
+        """
+        try:
+            with track_outbound("supabase", "update_place_embedding"):
+                self.client.table(self.places_table).update({"embed": embedding}).eq("id", place_id).execute()
+            return True
+        except Exception as e:
+            logger.error("Error in update_place_embedding: %s", e)
+            return False
+    
     @staticmethod
     def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """
@@ -315,10 +353,11 @@ class PlaceSupabaseService:
         Get image URLs for a place from images table
         """
         try:
-            response = self.client.table(self.images_table).select("url").eq("place_id", place_id).limit(limit).execute()
+            with track_outbound("supabase", "get_place_images"):
+                response = self.client.table(self.images_table).select("url").eq("place_id", place_id).limit(limit).execute()
             return [img['url'] for img in response.data if img.get('url')]
         except Exception as e:
-            print(f"Error getting images for place {place_id}: {e}")
+            logger.error("Error getting images for place %s: %s", place_id, e)
             return []
     
     def add_images_to_places(self, places: List[Dict[str, Any]], max_images: int = 5) -> List[Dict[str, Any]]:
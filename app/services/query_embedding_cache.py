@@ -0,0 +1,154 @@
+"""
+Query Embedding Cache
+LRU cache cho embedding của câu truy vấn semantic.
+
+Sau khi orchestrator bỏ địa điểm, số lượng và các cụm từ thừa, semantic query
+chỉ còn một tập từ vựng nhỏ ("quán cà phê yên tĩnh", "view đẹp", ...), nên
+các query phổ biến không cần chạy lại transformer.
+
+- Key: query đã chuẩn hóa (Unicode NFC, lowercase, gộp khoảng trắng)
+- Giới hạn số phần tử (QUERY_EMBEDDING_CACHE_SIZE), loại entry ít dùng nhất
+- Tùy chọn lưu ra file .npz (QUERY_EMBEDDING_CACHE_PATH): load khi khởi động,
+  ghi lại khi shutdown. File gắn với model + backend; khác thì bỏ qua.
+"""
+
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.core.logger import get_logger
+from app.core.metrics import Counter, Gauge
+
+logger = get_logger(__name__)
+
+QUERY_EMBEDDING_CACHE_REQUESTS = Counter(
+    "vietspot_query_embedding_cache_requests_total",
+    "Query embedding cache lookups by result (hit / miss)",
+    ("result",),
+)
+QUERY_EMBEDDING_CACHE_SIZE = Gauge(
+    "vietspot_query_embedding_cache_entries",
+    "Number of query embeddings currently cached",
+)
+
+
+def normalize_query(query: str) -> str:
+    """Chuẩn hóa query làm key: NFC, lowercase, gộp khoảng trắng."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache query -> embedding (thread-safe).
+
+    Example:
+        >>> cache = QueryEmbeddingCache(maxsize=2)
+        >>> cache.set("Quán  cà phê", np.ones(3))
+        >>> cache.get("quán cà phê")
+        array([1., 1., 1.], dtype=float32)
+    """
+
+    def __init__(self, maxsize: int = 2048, model_key: str = ""):
+        self.maxsize = maxsize
+        self.model_key = model_key
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Lấy embedding đã cache (None nếu chưa có), cập nhật hit/miss."""
+        if not self.enabled:
+            return None
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+        QUERY_EMBEDDING_CACHE_REQUESTS.inc(result="miss" if vector is None else "hit")
+        return vector
+
+    def set(self, query: str, vector: np.ndarray) -> None:
+        """Lưu embedding (float32, read-only vì được trả về dùng chung)."""
+        if not self.enabled or len(vector) == 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        key = normalize_query(query)
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            size = len(self._data)
+        QUERY_EMBEDDING_CACHE_SIZE.set(size)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+        QUERY_EMBEDDING_CACHE_SIZE.set(0)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def load(self, path: str) -> int:
+        """
+        Load cache từ file .npz (entry cũ nhất trước). Trả về số entry đã load;
+        0 nếu file không tồn tại, hỏng hoặc thuộc model/backend khác.
+        """
+        if not self.enabled or not path or not os.path.exists(path):
+            return 0
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                model_key = str(data["model_key"])
+                queries = [str(q) for q in data["queries"]]
+                vectors = data["vectors"]
+        except Exception as e:
+            logger.warning("Cannot read query embedding cache %s: %s", path, e)
+            return 0
+
+        if model_key != self.model_key:
+            logger.info("Ignoring query embedding cache %s built for %s", path, model_key)
+            return 0
+
+        for query, vector in zip(queries[-self.maxsize:], vectors[-self.maxsize:]):
+            self.set(query, vector)
+        return min(len(queries), self.maxsize)
+
+    def save(self, path: str) -> int:
+        """Ghi cache ra file .npz (ghi file tạm rồi rename). Trả về số entry đã ghi."""
+        if not self.enabled or not path:
+            return 0
+        with self._lock:
+            queries = list(self._data.keys())
+            vectors = list(self._data.values())
+        if not queries:
+            return 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            model_key=np.array(self.model_key),
+            queries=np.array(queries),
+            vectors=np.stack(vectors),
+        )
+        os.replace(tmp_path, path)
+        return len(queries)
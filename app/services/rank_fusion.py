@@ -0,0 +1,113 @@
+"""
+Rank Fusion
+Kết hợp điểm lexical (BM25) và semantic (cosine) cho pool ứng viên.
+
+- BM25 chấm trên name (trọng số x2), category và about của các place trong
+  pool; IDF / độ dài trung bình tính trên chính pool nên không cần thêm
+  round trip tới database.
+- Fusion:
+    "linear": min-max mỗi tín hiệu rồi blend  w * lexical + (1 - w) * semantic
+              (mặc định - tốt nhất trên benchmarks/bench_rank_fusion.py)
+    "rrf":    reciprocal rank fusion  w / (k + rank)
+    "none":   giữ nguyên semantic score
+  Điểm fusion được min-max về đủ khoảng 0..1 trên pool: RRF thô chỉ nằm
+  trong dải hẹp (~0.6..1) nên khi thay cosine trong ScoringService sẽ làm
+  yếu thành phần relevance so với rating / khoảng cách.
+
+Token hóa chỉ lowercase + tách theo \\w+ (giữ dấu tiếng Việt); term frequency
+của mỗi document được cache theo nội dung nên pool lặp lại giữa các request
+không phải token hóa lại. Phần chấm điểm là phép toán numpy trên cả pool.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+FUSION_METHODS = ("rrf", "linear", "none")
+
+_TOKEN_RE = re.compile(r"\w+")
+_NAME_WEIGHT = 2
+
+
+def tokenize(text: Any) -> List[str]:
+    if not text:
+        return []
+    return _TOKEN_RE.findall(unicodedata.normalize("NFC", str(text)).lower())
+
+
+@lru_cache(maxsize=16384)
+def _document_terms(name: str, category: str, about: str) -> Tuple[Counter, int]:
+    """(term frequency có trọng số theo field, độ dài document có trọng số)."""
+    terms = Counter()
+    for token in tokenize(name):
+        terms[token] += _NAME_WEIGHT
+    terms.update(tokenize(category))
+    terms.update(tokenize(about))
+    return terms, sum(terms.values())
+
+
+def document_terms(place: Dict[str, Any]) -> Tuple[Counter, int]:
+    about = place.get('about') or ''
+    if isinstance(about, dict):
+        about = about.get('description') or ''
+    return _document_terms(place.get('name') or '', place.get('category') or '', str(about)[:500])
+
+
+def bm25_scores(query: str, places: Sequence[Dict[str, Any]], k1: float = 1.2, b: float = 0.75) -> np.ndarray:
+    """Điểm BM25 của query cho từng place (0 nếu query không có term nào)."""
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not query_terms or not places:
+        return np.zeros(len(places), dtype=np.float32)
+
+    documents = [document_terms(place) for place in places]
+    tf = np.array([[terms.get(term, 0) for term in query_terms] for terms, _ in documents], dtype=np.float32)
+    lengths = np.fromiter((length for _, length in documents), dtype=np.float32, count=len(documents))
+
+    n = len(documents)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1).astype(np.float32)
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """Hạng (1 = cao nhất) theo score giảm dần, giữ thứ tự gốc khi bằng điểm."""
+    ranks = np.empty(len(scores), dtype=np.float32)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    low, high = float(scores.min()), float(scores.max())
+    if high == low:
+        return np.zeros_like(scores) if high == 0 else np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def fuse(
+    lexical: np.ndarray,
+    semantic: np.ndarray,
+    method: str = "linear",
+    lexical_weight: float = 0.3,
+    rrf_k: int = 60,
+) -> np.ndarray:
+    """
+    Điểm relevance kết hợp hai tín hiệu (cùng độ dài, cùng thứ tự place),
+    trải đủ 0..1: place tốt nhất pool = 1, kém nhất = 0.
+
+    Query không khớp lexical place nào (lexical toàn 0) thì chỉ dùng semantic.
+    """
+    semantic = np.asarray(semantic, dtype=np.float32)
+    lexical = np.asarray(lexical, dtype=np.float32)
+    if method == "none" or len(semantic) == 0 or not lexical.any():
+        return semantic
+    weight = min(max(lexical_weight, 0.0), 1.0)
+    if method == "linear":
+        fused = weight * _min_max(lexical) + (1 - weight) * _min_max(semantic)
+    else:
+        fused = weight / (rrf_k + _ranks(lexical)) + (1 - weight) / (rrf_k + _ranks(semantic))
+    return _min_max(fused)
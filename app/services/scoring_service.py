@@ -62,8 +62,8 @@ class ScoringService:
         """
         scores = {}
         
-        # Semantic score (from semantic search)
-        semantic_score = place.get('semantic_score', 0.5)
+        # Semantic score (from semantic search); fusion BM25 + semantic nếu có
+        semantic_score = place.get('relevance_score', place.get('semantic_score', 0.5))
         scores['semantic'] = semantic_score * self.weight_semantic
         
         # Distance score (only if user location is provided)
@@ -1,187 +1,395 @@
-from sentence_transformers import SentenceTransformer, util
 from app.core.config import settings
-from typing import List, Dict, Any
+from app.core.logger import get_logger
+from app.core.metrics import Counter
+from app.services.ann_index import IVFIndex
+from app.services.attribute_index import AttributeIndex
+from app.services.embedding_backend import load_embedding_model
+from app.services.embedding_dispatcher import EmbeddingDispatcher
+from app.services.embedding_store import EmbeddingStore
+from app.services.query_embedding_cache import QueryEmbeddingCache
+from app.services.rank_fusion import FUSION_METHODS, bm25_scores, fuse
+from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+import threading
 import numpy as np
 
+logger = get_logger(__name__)
+
+PLACE_EMBEDDING_CACHE_REQUESTS = Counter(
+    "vietspot_place_embedding_cache_requests_total",
+    "Place embedding cache lookups during semantic search by result (hit / miss)",
+    ("result",),
+)
+
 
 class SemanticSearchService:
     def __init__(self):
-        # Load multilingual model that supports Vietnamese
-        self.model = SentenceTransformer(settings.EMBEDDING_MODEL)
-        self.places_embeddings = {}
-        self.places_data = []
+        if settings.HYBRID_FUSION not in FUSION_METHODS:
+            raise ValueError(f"HYBRID_FUSION phải là một trong {FUSION_METHODS}, nhận được '{settings.HYBRID_FUSION}'")
+        # Model được load bởi load_model() (background warmup khi app khởi động)
+        self.model = None
+        # Cache embeddings dùng chung giữa các request: ma trận int8 / float16
+        # keyed theo place id + digest nội dung, giới hạn bộ nhớ (evict LRU)
+        self.places_embeddings = EmbeddingStore(
+            dtype=settings.EMBEDDING_STORE_DTYPE,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 2**20,
+        )
+        # Bitmap city / district / category / rating theo dòng của store (prefilter)
+        self.attributes = AttributeIndex()
+        # ANN index trên toàn bộ catalog (load_index), None nếu chưa cấu hình
+        self.index: Optional[IVFIndex] = None
+        self._model_lock = threading.Lock()
+        # Request đồng thời cùng thiếu một place chỉ encode một lần
+        self._embed_lock = threading.Lock()
+        self.model_key = f"{settings.EMBEDDING_MODEL}|{settings.EMBEDDING_BACKEND}"
+        self.query_cache = QueryEmbeddingCache(
+            maxsize=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            model_key=self.model_key,
+        )
+        # Gom embed_query của các request đồng thời thành một lần encode
+        self.dispatcher = EmbeddingDispatcher(
+            self._encode_queries,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+        )
+    
+    @property
+    def is_ready(self) -> bool:
+        """True khi model đã load xong và sẵn sàng encode."""
+        return self.model is not None
+    
+    def load_model(self) -> None:
+        """
+        Load SentenceTransformer và chạy một lần encode để warmup (blocking).
+        
+        Import sentence_transformers (torch) cũng nằm ở đây để app khởi động
+        không phải chờ. Backend (torch / int8 / onnx) chọn qua EMBEDDING_BACKEND.
+        """
+        with self._model_lock:
+            if self.model is not None:
+                return
+            
+            # Load multilingual model that supports Vietnamese
+            model = load_embedding_model()
+            model.encode("quán cà phê yên tĩnh", convert_to_tensor=False)
+            self.model = model
+    
+    @property
+    def has_index(self) -> bool:
+        """True khi có thể tìm trên toàn bộ catalog bằng ANN index."""
+        return self.is_ready and self.index is not None
+    
+    def load_index(self, path: str) -> None:
+        """
+        Load ANN index (build offline bằng `python -m app.services.ann_index`).
+        Embeddings của toàn bộ catalog trong file thay thế store hiện tại
+        (không giới hạn EMBEDDING_CACHE_MAX_MB: index cần mọi dòng).
+        """
+        index = IVFIndex.load(path, model_key=self.model_key, nprobe=settings.ANN_NPROBE)
+        with np.load(path, allow_pickle=False) as data:
+            attributes = AttributeIndex.from_arrays(data) if "attr_rating_bucket" in data else AttributeIndex()
+        self.places_embeddings = index.store
+        self.attributes = attributes
+        self.index = index
     
     def embed_query(self, query: str) -> np.ndarray:
         """
-        Create embedding for user query
+        Create embedding for user query (qua LRU cache, query phổ biến không encode lại)
         """
+        if not self.is_ready:
+            return np.array([])
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
         try:
-            embedding = self.model.encode(query, convert_to_tensor=False)
+            if self.dispatcher.max_batch_size > 1:
+                embedding = self.dispatcher.encode(query)
+            else:
+                embedding = self.model.encode(query, convert_to_tensor=False)
+            self.query_cache.set(query, embedding)
             return embedding
         except Exception as e:
-            print(f"Error in embed_query: {e}")
+            logger.error("Error in embed_query: %s", e)
             return np.array([])
     
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode một micro-batch query (gọi từ thread của dispatcher)."""
+        return self.model.encode(
+            queries,
+            convert_to_tensor=False,
+            show_progress_bar=False,
+            batch_size=len(queries)
+        )
+    
     def embed_places(self, places: List[Dict[str, Any]]) -> None:
         """
-        Create embeddings for all places and cache them
-        OPTIMIZATION: Use pre-computed embeddings from database 'embed' column if available
+        Create embeddings for places and cache them
+        OPTIMIZATION: Use pre-computed embeddings from database 'embed' column if available,
+        chỉ encode những place chưa có cột embed (không encode lại cả pool)
         """
         try:
             if not places or len(places) == 0:
                 return
-                
-            self.places_data = places
-            
-            # Check if places have pre-computed embeddings
-            has_precomputed = all(place.get('embed') is not None for place in places)
-            
-            if has_precomputed:
-                # FAST PATH: Use pre-computed embeddings from database
-                print(f"Using pre-computed embeddings for {len(places)} places")
-                for place in places:
-                    place_id = place.get('id')
-                    embed = place.get('embed')
-                    if place_id and embed:
-                        try:
-                            if isinstance(embed, str):
-                                import json
-                                embed = np.array(json.loads(embed), dtype=np.float32)
-                            elif isinstance(embed, list):
-                                embed = np.array(embed, dtype=np.float32)
-                            elif isinstance(embed, np.ndarray):
-                                embed = embed.astype(np.float32)
-                            else:
-                                continue
-                            
-                            self.places_embeddings[place_id] = embed
-                        except (json.JSONDecodeError, ValueError) as e:
-                            print(f"Error parsing embedding for place {place_id}: {e}")
-                            continue
-                return
-            
-            # SLOW PATH: Generate embeddings on-the-fly
-            print(f"Generating embeddings for {len(places)} places...")
-            texts = []
-            valid_places = []
             
+            # FAST PATH: Use pre-computed embeddings from database
+            embedded, vectors, missing = [], [], []
             for place in places:
-                about_text = place.get('about', '')
-                if isinstance(about_text, dict):
-                    description = about_text.get('description', '')
-                    about_text = description[:200] if description else str(about_text)[:200]
-                elif isinstance(about_text, str):
-                    about_text = about_text[:200]
-                else:
-                    about_text = ''
-                
-                name = place.get('name', '')
-                category = place.get('category', '')
-                
-                if name or about_text or category:
-                    text = f"{name} {about_text} {category}".strip()[:500]
-                    texts.append(text)
-                    valid_places.append(place)
-            
-            if len(texts) > 0:
-                embeddings = self.model.encode(
-                    texts, 
-                    convert_to_tensor=False, 
-                    show_progress_bar=False,
-                    batch_size=32,
-                    normalize_embeddings=True
-                )
-                
-                if not isinstance(embeddings, np.ndarray):
-                    embeddings = np.array(embeddings)
-                
-                min_len = min(len(embeddings), len(valid_places))
-                
-                for idx in range(min_len):
-                    try:
-                        place = valid_places[idx]
-                        place_id = place.get('id')
-                        if place_id:
-                            self.places_embeddings[place_id] = embeddings[idx]
-                    except (IndexError, KeyError) as e:
-                        print(f"Error storing embedding at index {idx}: {e}")
-                        continue
+                vector = self.parse_embedding(place)
+                if vector is None:
+                    missing.append(place)
+                elif place.get('id'):
+                    embedded.append(place)
+                    vectors.append(vector)
+            if embedded:
+                logger.debug("Using pre-computed embeddings for %d places", len(embedded))
+                self._store_embeddings(embedded, np.stack(vectors))
+            
+            # SLOW PATH: Generate embeddings on-the-fly (chỉ các place thiếu embed)
+            if missing and self.is_ready:
+                logger.info("Generating embeddings for %d places", len(missing))
+                valid_places, embeddings = self.encode_places([p for p in missing if p.get('id')])
+                if valid_places:
+                    self._store_embeddings(valid_places, embeddings)
                 
         except Exception as e:
-            import traceback
-            print(f"Error in embed_places: {e}")
-            print(traceback.format_exc())
+            logger.exception("Error in embed_places: %s", e)
+    
+    @staticmethod
+    def parse_embedding(place: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Vector float32 từ cột embed (pgvector trả về chuỗi "[...]"), None nếu thiếu / lỗi."""
+        embed = place.get('embed')
+        if embed is None:
+            return None
+        try:
+            if isinstance(embed, str):
+                import json
+                return np.array(json.loads(embed), dtype=np.float32)
+            if isinstance(embed, (list, np.ndarray)):
+                return np.asarray(embed, dtype=np.float32)
+        except ValueError as e:
+            logger.warning("Error parsing embedding for place %s: %s", place.get('id'), e)
+        return None
+    
+    @classmethod
+    def place_digest(cls, place: Dict[str, Any]) -> str:
+        """Hash nội dung được embed: place sửa name / about / category thì digest đổi."""
+        return hashlib.blake2b(cls.place_text(place).encode("utf-8"), digest_size=8).hexdigest()
+    
+    @staticmethod
+    def place_text(place: Dict[str, Any]) -> str:
+        """Text được embed của một place: name + about (200 ký tự đầu) + category."""
+        about_text = place.get('about', '')
+        if isinstance(about_text, dict):
+            description = about_text.get('description', '')
+            about_text = description[:200] if description else str(about_text)[:200]
+        elif isinstance(about_text, str):
+            about_text = about_text[:200]
+        else:
+            about_text = ''
+        
+        name = place.get('name') or ''
+        category = place.get('category') or ''
+        return f"{name} {about_text} {category}".strip()[:500]
+    
+    def encode_places(self, places: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Encode các place bằng model (blocking).
+        
+        Returns:
+            (places có text để embed, embeddings cùng thứ tự)
+        """
+        texts, valid_places = [], []
+        for place in places:
+            text = self.place_text(place)
+            if text:
+                texts.append(text)
+                valid_places.append(place)
+        if not texts:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        
+        embeddings = self.model.encode(
+            texts, 
+            convert_to_tensor=False, 
+            show_progress_bar=False,
+            batch_size=32,
+            normalize_embeddings=True
+        )
+        return valid_places, np.asarray(embeddings, dtype=np.float32)
+    
+    def upsert_places(self, places: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """
+        Ghi embeddings mới / đã đổi vào store và gán place mới vào cụm của ANN
+        index (place đã có giữ cụm cũ, vector được cập nhật nên điểm vẫn đúng).
+        """
+        store = self.places_embeddings
+        # Cùng lock với semantic_search để không xen giữa add() và tra dòng
+        with self._embed_lock:
+            new_ids = {place['id'] for place in places if place['id'] not in store}
+            self._store_embeddings(places, vectors)
+            if self.index is not None and new_ids:
+                rows = store.find_rows(list(new_ids))
+                self.index.add_rows(rows[rows >= 0])
+    
+    def _store_embeddings(self, places: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """Ghi embeddings vào store và thuộc tính (address, category, rating) vào bitmap."""
+        ids = [place['id'] for place in places]
+        self.places_embeddings.add(ids, vectors, [self.place_digest(place) for place in places])
+        # Place có thể đã bị evict ngay sau add (batch lớn hơn capacity, hoặc
+        # embed_places từ warmup chạy song song): chỉ ghi thuộc tính dòng còn lại
+        rows = self.places_embeddings.find_rows(ids)
+        kept = rows >= 0
+        self.attributes.update(rows[kept], [place for place, ok in zip(places, kept) if ok])
+    
+    def filter_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Mask bool theo dòng của store từ các điều kiện (location, city, district,
+        category, min_rating, max_rating). None nếu không có điều kiện nào áp dụng
+        được hoặc không dòng nào thỏa (khi đó không lọc, như post-filter trước đây).
+        """
+        if not filters:
+            return None
+        mask, applied = self.attributes.mask(self.places_embeddings.row_count, **filters)
+        if mask is None or not mask.any():
+            logger.debug("Attribute prefilter %s matched no rows, searching unfiltered", applied)
+            return None
+        logger.debug("Attribute prefilter %s: %d / %d rows", applied, int(mask.sum()), len(mask))
+        return mask
     
     def semantic_search(
         self, 
         query_embedding: np.ndarray, 
         places: List[Dict[str, Any]], 
-        top_k: int = 20
+        top_k: int = 20,
+        filters: Optional[Dict[str, Any]] = None,
+        lexical_query: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search and return top K places with similarity scores
+        
+        filters: điều kiện thuộc tính (xem filter_mask), lọc pool TRƯỚC khi chấm điểm
+        lexical_query: nếu có, xếp hạng theo fusion BM25 + semantic (HYBRID_FUSION)
         """
         try:
             if len(query_embedding) == 0 or len(places) == 0:
                 return []
             
-            # Ensure places are embedded
-            if not self.places_embeddings or len(self.places_embeddings) != len(places):
-                self.embed_places(places)
+            store = self.places_embeddings
+            places = [p for p in places if p.get('id')]
+            digests = [self.place_digest(p) for p in places]
             
-            # Calculate cosine similarity
-            similarities = []
-            for place in places:
-                place_id = place.get('id')
-                if place_id in self.places_embeddings:
-                    place_embedding = self.places_embeddings[place_id]
-                    similarity = util.cos_sim(query_embedding, place_embedding).item()
-                    similarities.append({
-                        'place': place,
-                        'semantic_score': similarity
-                    })
+            # Ensure places are embedded (chỉ place chưa có trong cache hoặc đã đổi nội dung)
+            fresh = store.lookup([p['id'] for p in places], digests)
+            hits = int(fresh.sum())
+            PLACE_EMBEDDING_CACHE_REQUESTS.inc(hits, result="hit")
+            PLACE_EMBEDDING_CACHE_REQUESTS.inc(len(places) - hits, result="miss")
+            if hits < len(places):
+                with self._embed_lock:
+                    # Request khác có thể vừa embed xong các place này
+                    missing = [
+                        p for p, ok in zip(places, store.lookup([p['id'] for p in places], digests)) if not ok
+                    ]
+                    if missing:
+                        self.embed_places(missing)
             
-            # Sort by similarity (highest first)
-            similarities.sort(key=lambda x: x['semantic_score'], reverse=True)
+            # Calculate cosine similarity (một phép nhân ma trận cho cả pool)
+            rows = store.find_rows([p['id'] for p in places])
+            embedded = [p for p, row in zip(places, rows) if row >= 0]
+            rows = rows[rows >= 0]
             
-            # Get top K results
-            top_results = similarities[:top_k]
+            # Prefilter bằng bitmap thuộc tính: top K luôn gồm place hợp lệ
+            mask = self.filter_mask(filters)
+            if mask is not None and mask[rows].any():
+                keep = mask[rows]
+                embedded = [p for p, ok in zip(embedded, keep) if ok]
+                rows = rows[keep]
+            scores = store.score_rows(query_embedding, rows)
+            # Dòng bị evict / dùng lại cho place khác trong lúc chấm điểm: bỏ qua
+            valid = store.owns(rows, [p['id'] for p in embedded])
+            if not valid.all():
+                embedded = [p for p, ok in zip(embedded, valid) if ok]
+                scores = scores[valid]
+            
+            # Hybrid: BM25 trên name / category / about của cùng pool, fusion với cosine
+            relevance, lexical = scores, None
+            if lexical_query and settings.HYBRID_FUSION != "none":
+                lexical = bm25_scores(lexical_query, embedded)
+                relevance = fuse(
+                    lexical, scores,
+                    method=settings.HYBRID_FUSION,
+                    lexical_weight=settings.HYBRID_LEXICAL_WEIGHT,
+                    rrf_k=settings.HYBRID_RRF_K,
+                )
+            
+            # Sort by relevance (highest first), giữ thứ tự gốc khi bằng điểm
+            order = np.argsort(-relevance, kind="stable")[:top_k]
             
             # Add semantic score to place data
             result_places = []
-            for item in top_results:
-                place = item['place'].copy()
-                place['semantic_score'] = round(item['semantic_score'], 4)
+            for i in order:
+                place = embedded[i].copy()
+                place['semantic_score'] = round(float(scores[i]), 4)
+                if lexical is not None:
+                    place['lexical_score'] = round(float(lexical[i]), 4)
+                    place['relevance_score'] = round(float(relevance[i]), 4)
                 result_places.append(place)
             
             return result_places
             
         except Exception as e:
-            print(f"Error in semantic_search: {e}")
+            logger.error("Error in semantic_search: %s", e)
             return places[:top_k]
     
+    def catalog_search(
+        self,
+        query: str,
+        top_k: int = 20,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        Tìm top K places trên toàn bộ catalog qua ANN index, chỉ trong các dòng
+        thỏa filters (bitmap thuộc tính được AND trước khi chấm điểm).
+        
+        Returns:
+            [(place_id, semantic_score), ...] theo score giảm dần
+        """
+        try:
+            query_embedding = self.embed_query(query)
+            if not self.has_index or len(query_embedding) == 0:
+                return []
+            rows, scores = self.index.search(query_embedding, k=top_k, allowed=self.filter_mask(filters))
+            return list(zip(self.places_embeddings.ids_at(rows), scores.tolist()))
+        except Exception as e:
+            logger.error("Error in catalog_search: %s", e)
+            return []
+    
     def hybrid_search(
         self,
         query: str,
         keyword_places: List[Dict[str, Any]],
         all_places: List[Dict[str, Any]],
-        top_k: int = 20
+        top_k: int = 20,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Combine keyword search results with semantic search
+        (BM25 trên text của pool + cosine, fusion theo HYBRID_FUSION)
+        
+        Pool = keyword_places + các place của all_places chưa có trong đó
+        (ví dụ top N từ ANN index trên toàn catalog), rerank chung.
         """
         try:
             # Embed the query
             query_embedding = self.embed_query(query)
             
-            # Determine which places to search
-            search_pool = keyword_places if keyword_places else all_places
+            # Gộp hai nguồn, bỏ trùng theo id (giữ bản keyword)
+            keyword_ids = {place.get('id') for place in keyword_places}
+            search_pool = keyword_places + [place for place in all_places if place.get('id') not in keyword_ids]
             
             # Perform semantic search
-            results = self.semantic_search(query_embedding, search_pool, top_k)
+            results = self.semantic_search(query_embedding, search_pool, top_k, filters=filters, lexical_query=query)
             
             return results
             
         except Exception as e:
-            print(f"Error in hybrid_search: {e}")
+            logger.error("Error in hybrid_search: %s", e)
             return keyword_places[:top_k] if keyword_places else all_places[:top_k]
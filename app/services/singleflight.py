@@ -0,0 +1,57 @@
+"""
+Singleflight
+Gộp các lời gọi giống hệt nhau đang chạy đồng thời thành một.
+
+Caller đầu tiên với một key thực hiện lời gọi; các caller khác đến trong lúc
+lời gọi đó chưa xong chờ và nhận cùng kết quả (hoặc cùng exception). Khi lời
+gọi kết thúc, key được gỡ - đây không phải cache, request đến sau sẽ gọi lại.
+
+Dùng thread (Future) nên gọi được từ code sync chạy trong thread pool.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Example:
+        >>> flight = SingleFlight()
+        >>> result, shared = flight.do(("classify", prompt_hash), lambda: call_gemini(prompt))
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float = None) -> Tuple[Any, bool]:
+        """
+        Chạy fn() một lần cho mọi caller đồng thời cùng key.
+
+        Returns:
+            (kết quả, shared) - shared=True nếu kết quả lấy từ lời gọi của caller khác
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(timeout=timeout), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -3,6 +3,7 @@ Storage Service
 Xử lý upload/delete files lên Supabase Storage
 """
 
+import asyncio
 import uuid
 import time
 import mimetypes
@@ -10,8 +11,56 @@ from typing import List
 from fastapi import UploadFile, HTTPException
 
 from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import track_outbound
 from app.services.supabase_client import get_supabase_client
 
+logger = get_logger(__name__)
+
+
+def build_public_url(file_path: str, bucket: str = None) -> str:
+    """
+    Tạo public URL của file trong bucket mà không cần gọi API.
+
+    Args:
+        file_path: Đường dẫn file trong bucket
+        bucket: Tên bucket (mặc định settings.SUPABASE_BUCKET)
+
+    Returns:
+        Public URL của file
+    """
+    bucket = bucket or settings.SUPABASE_BUCKET
+    base_url = settings.SUPABASE_URL.rstrip("/")
+    return f"{base_url}/storage/v1/object/public/{bucket}/{file_path.lstrip('/')}"
+
+
+async def _read_limited(file: UploadFile, max_bytes: int, chunk_size: int) -> bytes:
+    """
+    Đọc file theo từng chunk, dừng ngay khi vượt quá max_bytes.
+
+    Raises:
+        HTTPException 413 nếu file vượt quá dung lượng cho phép
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File {file.filename} vượt quá {settings.UPLOAD_MAX_FILE_SIZE_MB:g}MB"
+    )
+
+    # Kiểm tra nhanh qua size do client gửi (nếu có)
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise too_large
+        buffer.extend(chunk)
+
+    return bytes(buffer)
+
 
 async def upload_images(
     files: List[UploadFile],
@@ -20,71 +69,93 @@ async def upload_images(
 ) -> List[str]:
     """
     Upload nhiều ảnh lên Supabase Storage.
-    
+
+    Các file được upload song song (giới hạn bởi UPLOAD_MAX_CONCURRENCY).
+    Nếu một file lỗi, các file đã upload thành công sẽ bị xóa lại.
+
     Args:
         files: Danh sách file ảnh
         user_id: ID của user upload
         max_files: Số file tối đa cho phép
-        
+
     Returns:
-        Danh sách URLs của ảnh đã upload
+        Danh sách URLs của ảnh đã upload (cùng thứ tự với files)
     """
     if len(files) > max_files:
         raise HTTPException(
-            status_code=400, 
+            status_code=400,
             detail=f"Tối đa {max_files} ảnh mỗi lần upload"
         )
-    
-    supabase = get_supabase_client()
-    image_urls = []
-    
+
+    # Kiểm tra loại file trước khi upload bất kỳ file nào
     for file in files:
-        # Kiểm tra loại file
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(
-                status_code=400, 
+                status_code=400,
                 detail=f"File {file.filename} không phải ảnh"
             )
-        
+
+    bucket = get_supabase_client().storage.from_(settings.SUPABASE_BUCKET)
+    semaphore = asyncio.Semaphore(max(1, settings.UPLOAD_MAX_CONCURRENCY))
+    max_bytes = int(settings.UPLOAD_MAX_FILE_SIZE_MB * 1024 * 1024)
+    chunk_size = max(1, settings.UPLOAD_CHUNK_SIZE_KB) * 1024
+    uploaded_paths: List[str] = []
+
+    async def _upload_one(file: UploadFile) -> str:
         # Tạo tên file unique
         file_ext = mimetypes.guess_extension(file.content_type) or ".jpg"
         file_name = f"reviews/{user_id}/{int(time.time())}_{uuid.uuid4()}{file_ext}"
-        
-        try:
-            # Đọc file content
-            content = await file.read()
-            
-            # Upload lên Supabase Storage
-            supabase.storage.from_(settings.SUPABASE_BUCKET).upload(
-                path=file_name,
-                file=content,
-                file_options={"content-type": file.content_type}
-            )
-            
-            # Lấy Public URL
-            public_url = supabase.storage.from_(settings.SUPABASE_BUCKET).get_public_url(file_name)
-            
-            if isinstance(public_url, str):
-                image_urls.append(public_url)
-            else:
-                image_urls.append(str(public_url))
-                
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Lỗi upload ảnh {file.filename}: {str(e)}"
-            )
-    
-    return image_urls
+
+        async with semaphore:
+            content = await _read_limited(file, max_bytes, chunk_size)
+
+            try:
+                # Supabase client là sync -> chạy trong thread để không block event loop
+                with track_outbound("supabase_storage", "upload"):
+                    await asyncio.to_thread(
+                        bucket.upload,
+                        path=file_name,
+                        file=content,
+                        file_options={"content-type": file.content_type}
+                    )
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Lỗi upload ảnh {file.filename}: {str(e)}"
+                )
+
+        uploaded_paths.append(file_name)
+        return build_public_url(file_name)
+
+    results = await asyncio.gather(
+        *(_upload_one(file) for file in files),
+        return_exceptions=True
+    )
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        # Rollback: xóa các file đã upload thành công
+        if uploaded_paths:
+            try:
+                await asyncio.to_thread(bucket.remove, uploaded_paths)
+            except Exception as e:
+                logger.warning("Không thể rollback %d ảnh đã upload: %s", len(uploaded_paths), e)
+
+        error = errors[0]
+        if isinstance(error, HTTPException):
+            raise error
+        raise HTTPException(status_code=500, detail=f"Lỗi upload ảnh: {str(error)}")
+
+    return list(results)
 
 
 async def delete_image(file_path: str) -> bool:
     """
     Xóa ảnh khỏi Supabase Storage.
-    
+
     Args:
         file_path: Đường dẫn file trong bucket
-        
+
     Returns:
         True nếu xóa thành công
     """
@@ -2,8 +2,11 @@ import os
 import tempfile
 from google.cloud import speech
 from app.core.config import settings
+from app.core.logger import get_logger
 from typing import Optional, Dict, Set
 
+logger = get_logger(__name__)
+
 
 class STTService:
     """Service for Google Cloud Speech-to-Text operations"""
@@ -50,14 +53,14 @@ class STTService:
 
                 # Set environment variable for Google libraries
                 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
-                print("✅ STT: Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
+                logger.info("STT: Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
             except Exception as e:
-                print(f"⚠️ STT: Error setting up credentials: {e}")
+                logger.warning("STT: Error setting up credentials: %s", e)
         else:
             if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
-                print("✅ STT: Using existing GOOGLE_APPLICATION_CREDENTIALS")
+                logger.info("STT: Using existing GOOGLE_APPLICATION_CREDENTIALS")
             else:
-                print("⚠️ STT: No Google credentials found")
+                logger.warning("STT: No Google credentials found")
 
     def _get_client(self) -> speech.SpeechClient:
         """Get or create Speech client (lazy initialization)"""
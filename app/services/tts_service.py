@@ -2,8 +2,11 @@ import os
 import tempfile
 from google.cloud import texttospeech
 from app.core.config import settings
+from app.core.logger import get_logger
 from typing import Optional
 
+logger = get_logger(__name__)
+
 
 class TTSService:
     """Service for Google Cloud Text-to-Speech operations"""
@@ -38,14 +41,14 @@ class TTSService:
 
                 # Set environment variable for Google libraries
                 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = path
-                print("✅ TTS: Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
+                logger.info("TTS: Loaded Google credentials from GOOGLE_CREDENTIALS_JSON")
             except Exception as e:
-                print(f"⚠️ TTS: Error setting up credentials: {e}")
+                logger.warning("TTS: Error setting up credentials: %s", e)
         else:
             if os.environ.get("GOOGLE_APPLICATION_CREDENTIALS"):
-                print("✅ TTS: Using existing GOOGLE_APPLICATION_CREDENTIALS")
+                logger.info("TTS: Using existing GOOGLE_APPLICATION_CREDENTIALS")
             else:
-                print("⚠️ TTS: No Google credentials found")
+                logger.warning("TTS: No Google credentials found")
 
     def _get_client(self) -> texttospeech.TextToSpeechClient:
         """Get or create TTS client (lazy initialization)"""
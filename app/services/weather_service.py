@@ -1,7 +1,11 @@
 import requests
 from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import track_outbound
 from typing import Dict, Any, Optional
 
+logger = get_logger(__name__)
+
 
 class WeatherService:
     def __init__(self):
@@ -13,7 +17,7 @@ class WeatherService:
         Get weather data for specific coordinates
         """
         if not self.api_key:
-            print("Warning: OPENWEATHER_API_KEY not set")
+            logger.warning("OPENWEATHER_API_KEY not set")
             return None
             
         try:
@@ -25,7 +29,8 @@ class WeatherService:
                 'lang': 'vi'  # Vietnamese
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            with track_outbound("openweather", "weather_by_coords"):
+                response = requests.get(self.base_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -47,10 +52,10 @@ class WeatherService:
             return weather_info
             
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching weather data: {e}")
+            logger.error("Error fetching weather data: %s", e)
             return None
         except Exception as e:
-            print(f"Error processing weather data: {e}")
+            logger.error("Error processing weather data: %s", e)
             return None
     
     def get_weather_by_city(self, city_name: str) -> Optional[Dict[str, Any]]:
@@ -58,7 +63,7 @@ class WeatherService:
         Get weather data for a specific city
         """
         if not self.api_key:
-            print("Warning: OPENWEATHER_API_KEY not set")
+            logger.warning("OPENWEATHER_API_KEY not set")
             return None
             
         try:
@@ -69,7 +74,8 @@ class WeatherService:
                 'lang': 'vi'
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            with track_outbound("openweather", "weather_by_city"):
+                response = requests.get(self.base_url, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -95,10 +101,10 @@ class WeatherService:
             return weather_info
             
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching weather data: {e}")
+            logger.error("Error fetching weather data: %s", e)
             return None
         except Exception as e:
-            print(f"Error processing weather data: {e}")
+            logger.error("Error processing weather data: %s", e)
             return None
     
     def get_weather_advice(self, weather_info: Dict[str, Any]) -> str:
@@ -0,0 +1,116 @@
+"""
+Benchmark: IVF ANN index - recall / latency theo nprobe
+
+Build IVFIndex trên catalog tổng hợp (embedding bằng FakeEncoder hoặc model thật),
+rồi với bộ truy vấn benchmarks/fixtures/embedding_queries.json đo:
+- thời gian build (k-means + gán cụm)
+- latency search p50 / p95 và recall@k so với chấm toàn bộ catalog (exact)
+  cho từng giá trị nprobe
+- filtered search: chỉ places của một thành phố (mask theo dòng của store)
+
+Chạy:
+    python -m benchmarks.bench_ann_index
+    python -m benchmarks.bench_ann_index --docs 100000 --nprobe 4 8 16 32 64
+    python -m benchmarks.bench_ann_index --docs 5000 --model
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.bench_embedding_backends import DEFAULT_QUERIES
+from benchmarks.fakes import FakeEncoder, build_catalog
+from app.core.config import settings
+from app.services.ann_index import IVFIndex
+from app.services.embedding_store import EMBEDDING_STORE_DTYPES, EmbeddingStore
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def exact_scores(store: EmbeddingStore, query: np.ndarray, allowed: np.ndarray = None) -> np.ndarray:
+    scores = store.score_rows(query)
+    return scores if allowed is None else np.where(allowed, scores, -np.inf)
+
+
+def recall_at_k(exact: np.ndarray, rows: np.ndarray, k: int) -> float:
+    """
+    Tỉ lệ kết quả nằm trong top-k exact. Catalog tổng hợp có nhiều place cùng
+    điểm, nên so theo điểm thứ k (không so tập id) để hòa điểm không bị tính là miss.
+    """
+    kth = np.partition(exact, -k)[-k]
+    return float(np.sum(exact[rows] >= kth - 1e-6)) / k
+
+
+def measure(index: IVFIndex, queries: np.ndarray, k: int, nprobe: int, allowed: np.ndarray = None):
+    latencies, recalls = [], []
+    for query in queries:
+        started = time.perf_counter()
+        rows, _ = index.search(query, k=k, nprobe=nprobe, allowed=allowed)
+        latencies.append(time.perf_counter() - started)
+        recalls.append(recall_at_k(exact_scores(index.store, query, allowed), rows, k))
+    return percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000, float(np.mean(recalls))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nlist", type=int, default=settings.ANN_NLIST, help="0 = 4·sqrt(n)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--dtype", default=settings.EMBEDDING_STORE_DTYPE, choices=EMBEDDING_STORE_DTYPES)
+    parser.add_argument("--model", action="store_true", help="Embed bằng model thật thay vì FakeEncoder")
+    parser.add_argument("--dim", type=int, default=768, help="Số chiều của FakeEncoder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    with open(args.queries, encoding="utf-8") as f:
+        query_texts = json.load(f)["queries"]
+    catalog = build_catalog(args.docs)
+    texts = [f"{p['name']} {p['about'][:200]} {p['category']}".strip()[:500] for p in catalog]
+
+    if args.model:
+        from app.services.embedding_backend import load_embedding_model
+        encoder = load_embedding_model()
+    else:
+        encoder = FakeEncoder(dim=args.dim)
+    store = EmbeddingStore(dtype=args.dtype)
+    store.add([p["id"] for p in catalog], np.asarray(encoder.encode(texts, batch_size=32, show_progress_bar=False)))
+    queries = np.asarray(encoder.encode(query_texts, show_progress_bar=False), dtype=np.float32)
+
+    started = time.perf_counter()
+    index = IVFIndex.build(store, nlist=args.nlist)
+    print(f"docs={len(store):,}  dtype={args.dtype}  nlist={index.nlist}  k={args.k}  build={time.perf_counter() - started:.1f}s")
+
+    exact_latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        np.argpartition(-exact_scores(store, query), args.k)[:args.k]
+        exact_latencies.append(time.perf_counter() - started)
+    print(f"exact (full scan): p50 {percentile(exact_latencies, 50) * 1000:.2f} ms")
+
+    city = catalog[0]["address"].rsplit(", ", 1)[-1]
+    allowed = np.array([p["address"].endswith(city) for p in catalog])
+    print(f"\n{'nprobe':>8}{'p50 ms':>10}{'p95 ms':>10}{f'recall@{args.k}':>12}   | filtered city={city} ({allowed.mean():.0%})")
+    for nprobe in args.nprobe:
+        p50, p95, recall = measure(index, queries, args.k, nprobe)
+        fp50, _, frecall = measure(index, queries, args.k, nprobe, allowed)
+        print(f"{nprobe:>8}{p50:>10.2f}{p95:>10.2f}{recall:>12.3f}   | p50 {fp50:.2f} ms  recall {frecall:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
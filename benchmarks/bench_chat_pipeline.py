@@ -0,0 +1,274 @@
+"""
+Benchmark: ChatbotOrchestrator.process_query offline
+
+Chạy pipeline chat thật (classify -> search -> semantic -> rank -> llm_select
+-> images) với Gemini / Supabase / OpenWeather giả lập (benchmarks/fakes.py)
+trên catalog tổng hợp 1k / 10k / 100k places, rồi báo cáo p50/p95/p99 từng
+stage cùng CPU profile (cProfile) và allocation profile (tracemalloc).
+
+Chạy:
+    python -m benchmarks.bench_chat_pipeline
+    python -m benchmarks.bench_chat_pipeline --sizes 1000 10000 --iterations 5
+    python -m benchmarks.bench_chat_pipeline --gemini-latency-ms 800 --supabase-latency-ms 40
+
+So sánh với lần chạy trước (exit 1 nếu p95 của stage nào chậm hơn ngưỡng):
+    python -m benchmarks.bench_chat_pipeline --output baseline.json
+    python -m benchmarks.bench_chat_pipeline --baseline baseline.json --max-regression 0.2
+
+Truy vấn và JSON phân loại của Gemini được ghi sẵn trong
+benchmarks/fixtures/chat_corpus.json; query không có trong fixture được
+phân loại bằng heuristic đơn giản.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import logging
+import math
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.fakes import (
+    FakeEncoder,
+    FakeGenAIClient,
+    FakeGeminiService,
+    FakePlaceSupabaseService,
+    FakeSupabaseClient,
+    FakeWeatherService,
+    Latency,
+    build_catalog,
+    make_semantic_service,
+)
+from app.schemas.chat import ChatRequest
+from app.services import orchestrator as orchestrator_module
+from app.services.ann_index import IVFIndex
+from app.services.itinerary_service import ItineraryService
+from app.services.orchestrator import ChatbotOrchestrator
+from app.services.scoring_service import ScoringService
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "chat_corpus.json")
+STAGE_ORDER = ["classify", "general_answer", "search", "semantic", "weather", "rank", "llm_select", "images", "total"]
+
+
+class StageRecorder:
+    """Thay stage_timer / STAGE_DURATION của orchestrator để giữ lại từng sample."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def observe(self, value: float, stage: str) -> None:
+        self.samples[stage].append(value)
+
+    @contextmanager
+    def stage_timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, stage)
+
+    def reset(self) -> None:
+        self.samples = defaultdict(list)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile theo nearest-rank (q trong [0, 100])."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for stage in sorted(samples, key=lambda s: STAGE_ORDER.index(s) if s in STAGE_ORDER else len(STAGE_ORDER)):
+        values = samples[stage]
+        summary[stage] = {
+            "n": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": sum(values) / len(values) * 1000,
+        }
+    return summary
+
+
+def build_orchestrator(catalog: List[Dict[str, Any]], corpus: List[Dict[str, Any]], encoder, args) -> ChatbotOrchestrator:
+    """ChatbotOrchestrator với các service thật chạy trên transport giả lập."""
+    classifications = {q["message"]: q["classification"] for q in corpus if q.get("classification")}
+    jitter = args.latency_jitter
+
+    gemini = FakeGeminiService(FakeGenAIClient(classifications, Latency(args.gemini_latency_ms, jitter), seed=1))
+    supabase = FakePlaceSupabaseService(FakeSupabaseClient(catalog, Latency(args.supabase_latency_ms, jitter), seed=2))
+    weather = FakeWeatherService(latency=Latency(args.weather_latency_ms, jitter), seed=3)
+    scoring = ScoringService()
+    orchestrator = ChatbotOrchestrator(
+        gemini=gemini,
+        supabase=supabase,
+        semantic=make_semantic_service(encoder),
+        weather=weather,
+        scoring=scoring,
+        itinerary_service=ItineraryService(supabase=supabase, gemini=gemini, scoring=scoring, weather=weather),
+    )
+    if args.ann:
+        # Như khi load ANN_INDEX_PATH: toàn bộ catalog trong store + IVF index
+        orchestrator.semantic.embed_places(catalog)
+        orchestrator.semantic.index = IVFIndex.build(orchestrator.semantic.places_embeddings, nprobe=args.nprobe)
+    return orchestrator
+
+
+def run_corpus(orchestrator: ChatbotOrchestrator, corpus: List[Dict[str, Any]], recorder: StageRecorder) -> None:
+    """Chạy toàn bộ corpus một lần."""
+    for query in corpus:
+        request = ChatRequest(
+            message=query["message"],
+            user_lat=query.get("user_lat"),
+            user_lon=query.get("user_lon"),
+        )
+        start = time.perf_counter()
+        asyncio.run(orchestrator.process_query(request))
+        recorder.observe(time.perf_counter() - start, "total")
+
+
+def cpu_profile(orchestrator, corpus, recorder, top: int, dump_path: str = None) -> str:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    run_corpus(orchestrator, corpus, recorder)
+    profiler.disable()
+    if dump_path:
+        profiler.dump_stats(dump_path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def alloc_profile(orchestrator, corpus, recorder, top: int) -> str:
+    tracemalloc.start(25)
+    run_corpus(orchestrator, corpus, recorder)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    lines = [f"peak traced memory: {peak / 1024 / 1024:.1f} MiB", "top allocation sites:"]
+    for stat in snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"  {stat.size / 1024:>10.1f} KiB  {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines)
+
+
+def print_summary(size: int, summary: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n=== catalog={size:,} places ===")
+    print(f"{'stage':<16}{'n':>6}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'mean ms':>12}")
+    for stage, row in summary.items():
+        print(f"{stage:<16}{row['n']:>6}{row['p50_ms']:>12.2f}{row['p95_ms']:>12.2f}{row['p99_ms']:>12.2f}{row['mean_ms']:>12.2f}")
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    """Trả về danh sách stage có p95 chậm hơn baseline quá max_regression."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, row in stages.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if not old or old["p95_ms"] <= 0:
+                continue
+            change = row["p95_ms"] / old["p95_ms"] - 1
+            if change > max_regression:
+                regressions.append(
+                    f"catalog={size} stage={stage}: p95 {old['p95_ms']:.2f}ms -> {row['p95_ms']:.2f}ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Kích thước catalog")
+    parser.add_argument("--iterations", type=int, default=3, help="Số lần chạy corpus cho mỗi catalog (sau warmup)")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="File JSON corpus truy vấn")
+    parser.add_argument("--dim", type=int, default=768, help="Số chiều embedding")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0.0)
+    parser.add_argument("--weather-latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.2, help="Jitter tương đối của latency giả lập")
+    parser.add_argument("--ann", action="store_true", help="Build IVF index trên toàn bộ catalog (như ANN_INDEX_PATH)")
+    parser.add_argument("--nprobe", type=int, default=16, help="nprobe của IVF index khi dùng --ann")
+    parser.add_argument("--no-profile", action="store_true", help="Bỏ qua CPU / allocation profile")
+    parser.add_argument("--profile-top", type=int, default=20, help="Số dòng hiển thị của mỗi profile")
+    parser.add_argument("--profile-dir", help="Thư mục lưu file .prof (xem bằng snakeviz / pstats)")
+    parser.add_argument("--output", help="Lưu kết quả ra file JSON")
+    parser.add_argument("--baseline", help="File JSON kết quả cũ để so sánh p95")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Ngưỡng chậm hơn cho phép (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.disable(logging.INFO)  # log của pipeline không thuộc phạm vi đo
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = json.load(f)["queries"]
+
+    recorder = StageRecorder()
+    orchestrator_module.stage_timer = recorder.stage_timer
+    orchestrator_module.STAGE_DURATION = recorder
+
+    encoder = FakeEncoder(dim=args.dim)
+    results: Dict[str, Any] = {"corpus": len(corpus), "iterations": args.iterations, "sizes": {}}
+
+    for size in args.sizes:
+        started = time.perf_counter()
+        catalog = build_catalog(size, encoder)
+        print(f"\nBuilt catalog of {size:,} places in {time.perf_counter() - started:.1f}s")
+
+        orchestrator = build_orchestrator(catalog, corpus, encoder, args)
+
+        # Warmup: fill token-vector / wire caches, không tính vào kết quả
+        run_corpus(orchestrator, corpus, recorder)
+        recorder.reset()
+
+        for _ in range(args.iterations):
+            run_corpus(orchestrator, corpus, recorder)
+        summary = summarize(recorder.samples)
+        results["sizes"][str(size)] = summary
+        print_summary(size, summary)
+
+        if not args.no_profile:
+            dump_path = None
+            if args.profile_dir:
+                os.makedirs(args.profile_dir, exist_ok=True)
+                dump_path = os.path.join(args.profile_dir, f"chat_{size}.prof")
+            print(f"\n--- CPU profile (catalog={size:,}, cumulative) ---")
+            print(cpu_profile(orchestrator, corpus, StageRecorder(), args.profile_top, dump_path))
+            print(f"--- Allocation profile (catalog={size:,}) ---")
+            print(alloc_profile(orchestrator, corpus, StageRecorder(), args.profile_top))
+        recorder.reset()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\n❌ p95 regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✅ Không có stage nào chậm hơn baseline quá {args.max_regression:.0%}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
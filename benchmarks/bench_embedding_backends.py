@@ -0,0 +1,169 @@
+"""
+Benchmark: so sánh embedding backend (torch / int8 / onnx) với model float
+
+Với bộ truy vấn tiếng Việt cố định (benchmarks/fixtures/embedding_queries.json)
+và một catalog tổng hợp, đo cho từng backend:
+- latency encode một query (p50 / p95, như SemanticSearchService.embed_query)
+- cosine giữa query embedding của backend và của model float (mean / min)
+- recall@k: tỉ lệ top-k places trùng với top-k của model float
+
+Exit 1 nếu backend nào có cosine trung bình < --min-cosine hoặc
+recall@k < --min-recall.
+
+Chạy:
+    python -m benchmarks.bench_embedding_backends
+    python -m benchmarks.bench_embedding_backends --backends int8 onnx --onnx-file onnx/model_qint8_avx512_vnni.onnx
+
+Export bản ONNX int8 (lưu vào thư mục model, dùng lại qua EMBEDDING_ONNX_FILE):
+    python -m benchmarks.bench_embedding_backends --export-quantized-onnx avx512_vnni --export-dir ./models/vietnamese-embedding
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.fakes import build_catalog
+from app.core.config import settings
+from app.services.embedding_backend import EMBEDDING_BACKENDS, backend_available, load_embedding_model
+
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "fixtures", "embedding_queries.json")
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def place_texts(size: int) -> List[str]:
+    """Text của place giống cách SemanticSearchService.embed_places ghép."""
+    return [
+        f"{p['name']} {p['about'][:200]} {p['category']}".strip()[:500]
+        for p in build_catalog(size)
+    ]
+
+
+def evaluate(model, queries: List[str], docs: List[str], repeat: int) -> Dict[str, object]:
+    """Encode docs một lần, đo latency encode từng query."""
+    doc_embeddings = normalize(np.asarray(model.encode(docs, batch_size=32, show_progress_bar=False)))
+
+    # Warmup
+    model.encode(queries[0], convert_to_tensor=False)
+
+    latencies = []
+    query_embeddings = []
+    for query in queries:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            embedding = model.encode(query, convert_to_tensor=False)
+            latencies.append(time.perf_counter() - started)
+        query_embeddings.append(embedding)
+
+    return {
+        "queries": normalize(np.asarray(query_embeddings)),
+        "docs": doc_embeddings,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def top_k(query_embeddings: np.ndarray, doc_embeddings: np.ndarray, k: int) -> np.ndarray:
+    scores = query_embeddings @ doc_embeddings.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def compare(reference: Dict[str, object], candidate: Dict[str, object], k: int) -> Dict[str, float]:
+    cosines = np.sum(reference["queries"] * candidate["queries"], axis=1)
+    ref_top = top_k(reference["queries"], reference["docs"], k)
+    cand_top = top_k(candidate["queries"], candidate["docs"], k)
+    recalls = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]
+    return {
+        "cosine_mean": float(np.mean(cosines)),
+        "cosine_min": float(np.min(cosines)),
+        f"recall@{k}": float(np.mean(recalls)),
+    }
+
+
+def export_quantized_onnx(config: str, export_dir: str) -> None:
+    """Export model sang ONNX rồi quantize động int8 (cần sentence-transformers[onnx])."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model = SentenceTransformer(settings.EMBEDDING_MODEL, device="cpu", backend="onnx")
+    model.save_pretrained(export_dir)
+    export_dynamic_quantized_onnx_model(model, config, export_dir)
+    print(f"Exported to {export_dir} (onnx/model_qint8_{config}.onnx)")
+    print(f"Dùng: EMBEDDING_MODEL={export_dir} EMBEDDING_BACKEND=onnx EMBEDDING_ONNX_FILE=onnx/model_qint8_{config}.onnx")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"], choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--onnx-file", default=settings.EMBEDDING_ONNX_FILE, help="File ONNX trong repo model")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--docs", type=int, default=500, help="Số places trong catalog đánh giá recall")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần encode mỗi query khi đo latency")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--export-quantized-onnx", choices=["arm64", "avx2", "avx512", "avx512_vnni"])
+    parser.add_argument("--export-dir", default="./models/vietnamese-embedding")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.export_quantized_onnx:
+        export_quantized_onnx(args.export_quantized_onnx, args.export_dir)
+        return 0
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    docs = place_texts(args.docs)
+
+    print(f"model={settings.EMBEDDING_MODEL}  queries={len(queries)}  docs={len(docs)}  k={args.k}")
+    reference = evaluate(load_embedding_model(backend="torch"), queries, docs, args.repeat)
+
+    header = f"{'backend':<10}{'p50 ms':>10}{'p95 ms':>10}{'cos mean':>10}{'cos min':>10}{f'recall@{args.k}':>12}"
+    print(header)
+    print(f"{'torch':<10}{reference['p50_ms']:>10.2f}{reference['p95_ms']:>10.2f}{1.0:>10.4f}{1.0:>10.4f}{1.0:>12.3f}")
+
+    failed = []
+    for backend in args.backends:
+        if backend == "torch":
+            continue
+        if not backend_available(backend):
+            print(f"{backend:<10}  skipped (thiếu dependency, cài sentence-transformers[{backend}])")
+            continue
+        model = load_embedding_model(backend=backend, onnx_file=args.onnx_file)
+        result = evaluate(model, queries, docs, args.repeat)
+        diff = compare(reference, result, args.k)
+        recall = diff[f"recall@{args.k}"]
+        print(
+            f"{backend:<10}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{diff['cosine_mean']:>10.4f}{diff['cosine_min']:>10.4f}{recall:>12.3f}"
+        )
+        if diff["cosine_mean"] < args.min_cosine or recall < args.min_recall:
+            failed.append(backend)
+
+    if failed:
+        print(f"❌ Độ lệch vượt ngưỡng (cosine < {args.min_cosine} hoặc recall < {args.min_recall}): {', '.join(failed)}")
+        return 1
+    print("✅ Các backend đạt ngưỡng chính xác so với model float")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Benchmark: micro-batching query embedding dưới tải đồng thời
+
+N thread cùng gọi encode query (bộ truy vấn benchmarks/fixtures/embedding_queries.json),
+so sánh:
+- direct:  mỗi caller gọi model.encode riêng (batch-of-one)
+- batched: qua EmbeddingDispatcher (EMBEDDING_BATCH_MAX_SIZE / EMBEDDING_BATCH_MAX_WAIT_MS)
+
+Báo cáo throughput (query/s), latency p50 / p95 và batch size trung bình.
+Query được thêm hậu tố số để không trùng nhau (không đo hiệu ứng dedupe/cache).
+
+--fake-encoder (hoặc khi không tải được model, ví dụ offline) dùng FakeEncoder
+với chi phí giả lập mỗi lần gọi encode: --batch-cost-ms cố định + --item-cost-ms
+mỗi query, các lần gọi chạy tuần tự như một model chiếm hết CPU / GPU.
+
+Chạy:
+    python -m benchmarks.bench_embedding_batching
+    python -m benchmarks.bench_embedding_batching --concurrency 1 8 32 --requests 256 --max-wait-ms 5
+    python -m benchmarks.bench_embedding_batching --fake-encoder --batch-cost-ms 8
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.bench_embedding_backends import DEFAULT_QUERIES
+from benchmarks.fakes import FakeEncoder
+from app.core.config import settings
+from app.services.embedding_backend import load_embedding_model
+from app.services.embedding_dispatcher import EMBEDDING_BATCH_SIZE, EmbeddingDispatcher
+
+
+class CostedEncoder(FakeEncoder):
+    """FakeEncoder với latency mỗi lần encode = batch_cost + item_cost x số câu, chạy tuần tự."""
+
+    def __init__(self, batch_cost_ms: float, item_cost_ms: float, dim: int = 768):
+        super().__init__(dim)
+        self.batch_cost = batch_cost_ms / 1000
+        self.item_cost = item_cost_ms / 1000
+        self._lock = threading.Lock()
+
+    def encode(self, sentences, convert_to_tensor: bool = False, **kwargs):
+        count = 1 if isinstance(sentences, str) else len(sentences)
+        with self._lock:
+            time.sleep(self.batch_cost + self.item_cost * count)
+            return super().encode(sentences, convert_to_tensor=convert_to_tensor, **kwargs)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run(encode: Callable[[str], object], queries: List[str], concurrency: int) -> Dict[str, float]:
+    """Chạy toàn bộ queries với `concurrency` thread, trả về throughput + latency."""
+    latencies: List[float] = []
+
+    def call(query: str) -> None:
+        started = time.perf_counter()
+        encode(query)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, queries))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "qps": len(queries) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def batch_stats() -> tuple:
+    """(số batch, tổng số query) đã ghi nhận trên histogram batch size."""
+    series = EMBEDDING_BATCH_SIZE._series.get(())
+    return (int(sum(series[:-1])), series[-1]) if series else (0, 0.0)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=256, help="Số query mỗi lần chạy")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--max-batch-size", type=int, default=settings.EMBEDDING_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_BATCH_MAX_WAIT_MS)
+    parser.add_argument("--fake-encoder", action="store_true", help="Dùng FakeEncoder có chi phí giả lập thay vì tải model")
+    parser.add_argument("--batch-cost-ms", type=float, default=5.0, help="Chi phí cố định mỗi lần encode của FakeEncoder")
+    parser.add_argument("--item-cost-ms", type=float, default=0.2, help="Chi phí mỗi query của FakeEncoder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    with open(args.queries, encoding="utf-8") as f:
+        base = json.load(f)["queries"]
+    queries = [f"{base[i % len(base)]} {i}" for i in range(args.requests)]
+
+    model_name = "fake"
+    if not args.fake_encoder:
+        try:
+            model = load_embedding_model()
+            model_name = f"{settings.EMBEDDING_MODEL} backend={settings.EMBEDDING_BACKEND}"
+        except (ImportError, OSError) as e:
+            # Không tải được model (offline): đo với encoder giả lập
+            print(f"Không tải được model ({e.__class__.__name__}), dùng FakeEncoder", file=sys.stderr)
+            args.fake_encoder = True
+    if args.fake_encoder:
+        model = CostedEncoder(args.batch_cost_ms, args.item_cost_ms)
+        model_name = f"fake batch_cost={args.batch_cost_ms}ms item_cost={args.item_cost_ms}ms"
+    model.encode(base[0], convert_to_tensor=False)  # warmup
+
+    def encode_batch(texts: List[str]):
+        return model.encode(texts, convert_to_tensor=False, show_progress_bar=False, batch_size=len(texts))
+
+    dispatcher = EmbeddingDispatcher(encode_batch, args.max_batch_size, args.max_wait_ms)
+    direct = lambda query: model.encode(query, convert_to_tensor=False)  # noqa: E731
+
+    print(
+        f"model={model_name} requests={args.requests} "
+        f"max_batch_size={args.max_batch_size} max_wait_ms={args.max_wait_ms}"
+    )
+    print(f"{'conc':>6}{'mode':>10}{'qps':>10}{'p50 ms':>10}{'p95 ms':>10}{'avg batch':>11}{'speedup':>9}")
+    for concurrency in args.concurrency:
+        baseline = run(direct, queries, concurrency)
+        print(f"{concurrency:>6}{'direct':>10}{baseline['qps']:>10.1f}{baseline['p50_ms']:>10.2f}{baseline['p95_ms']:>10.2f}{1.0:>11.1f}{1.0:>9.2f}")
+
+        batches_before, items_before = batch_stats()
+        result = run(dispatcher.encode, queries, concurrency)
+        batches_after, items_after = batch_stats()
+        avg_batch = (items_after - items_before) / max(1, batches_after - batches_before)
+        print(
+            f"{concurrency:>6}{'batched':>10}{result['qps']:>10.1f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{avg_batch:>11.1f}{result['qps'] / baseline['qps']:>9.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Benchmark: recall, bộ nhớ và latency của EmbeddingStore (float32 / float16 / int8)
+
+Encode catalog tổng hợp và bộ truy vấn tiếng Việt (benchmarks/fixtures/embedding_queries.json)
+một lần bằng model float32, rồi với từng dtype của EmbeddingStore đo:
+- bộ nhớ (tổng và bytes / place), so với dict {id: float32 array} cũ
+- latency chấm điểm toàn bộ catalog cho một query (p50, và bội số so với float32)
+- cosine sai lệch tối đa và recall@k so với float32
+
+Exit 1 nếu recall@k của dtype nào < --min-recall.
+
+Chạy:
+    python -m benchmarks.bench_embedding_store
+    python -m benchmarks.bench_embedding_store --docs 100000 --fake-encoder
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+from typing import List
+
+import numpy as np
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.bench_embedding_backends import DEFAULT_QUERIES
+from benchmarks.fakes import FakeEncoder, build_catalog
+from app.core.config import settings
+from app.services.embedding_store import EMBEDDING_STORE_DTYPES, EmbeddingStore
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def dict_store_bytes(ids: List[int], embeddings: np.ndarray) -> int:
+    """Bộ nhớ của dict {id: float32 array} (cách lưu trước đây), đo bằng tracemalloc."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    store = {place_id: np.array(embeddings[i], dtype=np.float32) for i, place_id in enumerate(ids)}
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return after - before
+
+
+def top_k(scores: np.ndarray, k: int) -> set:
+    return set(np.argpartition(-scores, k)[:k].tolist()) if len(scores) > k else set(range(len(scores)))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000, help="Số places trong catalog")
+    parser.add_argument("--queries", default=DEFAULT_QUERIES)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--fake-encoder", action="store_true", help="Dùng FakeEncoder thay vì tải model (nhanh, cho catalog lớn)")
+    parser.add_argument("--dim", type=int, default=768, help="Số chiều của FakeEncoder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    catalog = build_catalog(args.docs)
+    texts = [f"{p['name']} {p['about'][:200]} {p['category']}".strip()[:500] for p in catalog]
+    ids = [p["id"] for p in catalog]
+
+    if args.fake_encoder:
+        model = FakeEncoder(dim=args.dim)
+    else:
+        from app.services.embedding_backend import load_embedding_model
+        model = load_embedding_model()
+
+    started = time.perf_counter()
+    doc_embeddings = np.asarray(model.encode(texts, batch_size=32, show_progress_bar=False), dtype=np.float32)
+    query_embeddings = np.asarray(model.encode(queries, show_progress_bar=False), dtype=np.float32)
+    print(
+        f"model={'fake' if args.fake_encoder else settings.EMBEDDING_MODEL}  docs={len(ids):,}  "
+        f"queries={len(queries)}  dim={doc_embeddings.shape[1]}  k={args.k}  (encoded in {time.perf_counter() - started:.1f}s)"
+    )
+
+    dict_bytes = dict_store_bytes(ids, doc_embeddings)
+    print(f"{'dict[float32]':<14}{dict_bytes / 2**20:>10.1f} MiB{dict_bytes / len(ids):>10.0f} B/place")
+
+    reference_scores = None
+    reference_latency = None
+    failed = []
+    print(
+        f"{'dtype':<14}{'memory':>14}{'per place':>12}{'score p50':>12}{'vs f32':>8}"
+        f"{'max |Δcos|':>12}{f'recall@{args.k}':>12}"
+    )
+    for dtype in EMBEDDING_STORE_DTYPES:
+        store = EmbeddingStore(dtype=dtype)
+        store.add(ids, doc_embeddings)
+
+        latencies, all_scores = [], []
+        for query in query_embeddings:
+            t0 = time.perf_counter()
+            _, scores = store.score(query)
+            latencies.append(time.perf_counter() - t0)
+            all_scores.append(scores)
+        all_scores = np.stack(all_scores)
+        latency = percentile(latencies, 50)
+        if reference_scores is None:
+            reference_scores = all_scores
+            reference_latency = latency
+
+        max_delta = float(np.abs(all_scores - reference_scores).max())
+        recall = float(np.mean([
+            len(top_k(ref, args.k) & top_k(got, args.k)) / args.k
+            for ref, got in zip(reference_scores, all_scores)
+        ]))
+        print(
+            f"{dtype:<14}{store.nbytes / 2**20:>10.1f} MiB{store.nbytes / len(ids):>10.0f} B"
+            f"{latency * 1000:>10.2f}ms{latency / reference_latency:>7.1f}x{max_delta:>12.5f}{recall:>12.3f}"
+        )
+        if recall < args.min_recall:
+            failed.append(dtype)
+
+    if failed:
+        print(f"❌ recall@{args.k} < {args.min_recall}: {', '.join(failed)}")
+        return 1
+    print(f"✅ Mọi dtype đạt recall@{args.k} >= {args.min_recall} so với float32")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
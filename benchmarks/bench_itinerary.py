@@ -0,0 +1,149 @@
+"""
+Benchmark: lịch trình nhiều ngày - một prompt cho cả chuyến vs sinh song song theo ngày
+
+Gemini giả lập có latency tỉ lệ với output: base + (ms / hoạt động) x số hoạt
+động sinh ra, như thời gian decode thật. Places lấy từ catalog tổng hợp của
+một thành phố (benchmarks/fakes.build_catalog). Đo wall time của
+ItineraryService._gemini_create_itinerary (cả chuyến) và
+_gemini_create_itinerary_by_day theo num_days, cùng độ gọn của từng ngày
+(khoảng cách di chuyển trung bình).
+
+Chạy:
+    python -m benchmarks.bench_itinerary
+    python -m benchmarks.bench_itinerary --base-ms 800 --activity-ms 400
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.fakes import (
+    FakeGeminiService,
+    FakePlaceSupabaseService,
+    FakeSupabaseClient,
+    FakeWeatherService,
+    build_catalog,
+)
+from app.core.config import settings
+from app.schemas.itinerary import DayItinerary, ItineraryRequest, ItineraryResponse
+from app.services.itinerary_service import ItineraryService
+
+_PLACE_LINE_RE = re.compile(r"^\d+\. (.+?) \| .*\(([-\d.]+),([-\d.]+)\)$", re.MULTILINE)
+_TRIP_DAYS_RE = re.compile(r"Tạo lịch trình (\d+) ngày")
+_DAY_RE = re.compile(r'"day": (\d+)')
+_ACTIVITIES_PER_DAY = 5
+
+
+class _Response:
+    def __init__(self, text: str, schema: Any):
+        self.text = text
+        self.parsed = schema.model_validate_json(text)
+
+
+class _ItineraryModels:
+    """generate_content giả: chọn 5 places đầu trong danh sách cho mỗi ngày."""
+
+    def __init__(self, base_ms: float, activity_ms: float):
+        self.base_ms = base_ms
+        self.activity_ms = activity_ms
+
+    @staticmethod
+    def _day(day: int, places: List[tuple]) -> Dict[str, Any]:
+        activities = [
+            {
+                "time": f"{8 + 2 * i:02d}:00", "duration_minutes": 90, "activity_type": "visit",
+                "place_name": name, "latitude": float(lat), "longitude": float(lon),
+                "description": f"Tham quan {name}",
+            }
+            for i, (name, lat, lon) in enumerate(places)
+        ]
+        return {"day": day, "theme": f"Ngày {day}", "activities": activities, "total_activities": len(activities)}
+
+    def generate_content(self, model: str, contents: str, config: Any = None) -> _Response:
+        places = _PLACE_LINE_RE.findall(contents)
+        schema = config.response_schema
+        if schema is DayItinerary:
+            data = self._day(int(_DAY_RE.search(contents).group(1)), places[:_ACTIVITIES_PER_DAY])
+            activities = len(data["activities"])
+        else:
+            num_days = int(_TRIP_DAYS_RE.search(contents).group(1))
+            days = [
+                self._day(d + 1, places[d * _ACTIVITIES_PER_DAY:(d + 1) * _ACTIVITIES_PER_DAY])
+                for d in range(num_days)
+            ]
+            data = {
+                "destination": "bench", "num_days": num_days, "itinerary": days,
+                "summary": "bench", "total_places": sum(len(d["activities"]) for d in days),
+            }
+            activities = data["total_places"]
+        time.sleep((self.base_ms + self.activity_ms * activities) / 1000)
+        return _Response(json.dumps(data, ensure_ascii=False), schema)
+
+
+class _Client:
+    def __init__(self, base_ms: float, activity_ms: float):
+        self.models = _ItineraryModels(base_ms, activity_ms)
+
+
+def city_places(size: int, city: str) -> List[Dict[str, Any]]:
+    places = [p for p in build_catalog(size) if p["address"].endswith(city)]
+    for place in places:
+        coords = json.loads(place["coordinates"])
+        place["latitude"], place["longitude"] = coords["lat"], coords["lon"]
+    return places
+
+
+def mean_day_distance(itinerary: ItineraryResponse, service: ItineraryService) -> float:
+    days = [day for day in itinerary.itinerary if day.activities]
+    if not days:
+        return 0.0
+    return sum(service._calculate_day_distance(day.activities) for day in days) / len(days)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 3, 5, 7])
+    parser.add_argument("--base-ms", type=float, default=400, help="Latency cố định mỗi call (prefill + mạng)")
+    parser.add_argument("--activity-ms", type=float, default=150, help="Latency decode mỗi hoạt động")
+    parser.add_argument("--city", default="Đà Nẵng")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    places = city_places(2000, args.city)
+    service = ItineraryService(
+        supabase=FakePlaceSupabaseService(FakeSupabaseClient(places)),
+        gemini=FakeGeminiService(_Client(args.base_ms, args.activity_ms)),
+        weather=FakeWeatherService(),
+    )
+
+    print(
+        f"city={args.city}  places={len(places)}  base={args.base_ms:.0f} ms  activity={args.activity_ms:.0f} ms  "
+        f"concurrency={settings.ITINERARY_DAY_CONCURRENCY}"
+    )
+    print(f"{'days':>5}{'whole-trip s':>14}{'per-day s':>12}{'whole km/day':>14}{'per-day km/day':>16}")
+    for num_days in args.days:
+        request = ItineraryRequest(destination=args.city, num_days=num_days)
+
+        started = time.perf_counter()
+        whole = service._gemini_create_itinerary(request, places, None, "")
+        whole_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        by_day = service._gemini_create_itinerary_by_day(request, places, None, "")
+        by_day_seconds = time.perf_counter() - started
+
+        print(
+            f"{num_days:>5}{whole_seconds:>14.2f}{by_day_seconds:>12.2f}"
+            f"{mean_day_distance(whole, service):>14.1f}{mean_day_distance(by_day, service):>16.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
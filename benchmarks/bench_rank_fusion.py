@@ -0,0 +1,201 @@
+"""
+Benchmark: hybrid rank fusion (BM25 + semantic)
+
+Trên catalog tổng hợp (benchmarks/fakes.build_catalog). Nhãn liên quan lấy
+từ metadata lúc sinh catalog (category, đặc điểm, tên đường trong tên place),
+không phụ thuộc encoder, nên các phương pháp cho kết quả khác nhau. Hai nhóm
+truy vấn:
+- "street": "<loại hình> <đặc điểm> <tên đường>" (ví dụ "quán cà phê sân vườn
+  Lê Lợi"). Liên quan: đúng category và có đặc điểm (1 điểm), thêm 1 điểm nếu
+  tên place có tên đường - thông tin chỉ khớp chính xác theo từ khóa.
+- "paraphrase": đặc điểm diễn đạt bằng từ khác (ví dụ "tĩnh lặng" thay cho
+  "yên tĩnh"), không có trong text của place. Liên quan: đúng category (1
+  điểm) và có đặc điểm gốc (2 điểm) - chỉ model thật (--model) hiểu được.
+Đo:
+- nDCG@k của semantic-only, RRF và linear blend trên cùng pool, theo nhóm
+- nDCG@k sau ScoringService (relevance + rating + popularity) trên top
+  --rank-pool ứng viên, như pipeline chat, cùng độ trải trung bình của
+  relevance trong top đó: relevance co vào dải hẹp thì rating lấn át
+- latency BM25 + fusion theo kích thước pool (lần đầu token hóa / đã cache)
+
+Semantic mặc định dùng FakeEncoder (bag of words); --model để dùng model thật.
+
+Chạy:
+    python -m benchmarks.bench_rank_fusion
+    python -m benchmarks.bench_rank_fusion --docs 5000 --model
+"""
+
+import argparse
+import sys
+import time
+from functools import partial
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from benchmarks.fakes import CATEGORIES, STREETS, FakeEncoder, build_catalog
+from app.core.config import settings
+from app.services.rank_fusion import _document_terms, bm25_scores, fuse
+from app.services.scoring_service import ScoringService
+
+CATEGORY_QUERIES = {
+    "Quán Cà Phê": "quán cà phê",
+    "Nhà Hàng": "nhà hàng",
+    "Biển & Bãi Biển": "bãi biển",
+    "Bảo Tàng & Triển Lãm": "bảo tàng",
+    "Công Viên": "công viên",
+    "Di Tích Lịch Sử": "di tích",
+}
+
+
+# Cách nói khác của đặc điểm (không xuất hiện trong about của place)
+TRAIT_PARAPHRASES = {
+    "yên tĩnh": "tĩnh lặng",
+    "view đẹp": "cảnh quan thơ mộng",
+    "sân vườn": "nhiều cây cối ngoài trời",
+    "làm việc": "ngồi laptop",
+    "hải sản": "tôm cua cá mực",
+    "gia đình": "đi cùng con nhỏ",
+    "sang trọng": "cao cấp",
+    "hoang sơ": "còn nguyên vẹn ít người",
+    "hoàng hôn": "ngắm mặt trời lặn",
+    "nghệ thuật": "tranh vẽ điêu khắc",
+    "chiến tranh": "kháng chiến",
+    "cây xanh": "rợp bóng mát",
+    "linh thiêng": "cầu may",
+}
+
+
+def place_traits(place: Dict) -> List[str]:
+    """Đặc điểm build_catalog đã chọn cho place (metadata, không qua encoder)."""
+    _, traits = CATEGORIES[place["category"]]
+    return [trait for trait in traits if trait in place["about"]]
+
+
+def street_relevance(place: Dict, category: str, trait: str, street: str) -> int:
+    if place["category"] != category or trait not in place_traits(place):
+        return 0
+    return 2 if street in place["name"] else 1
+
+
+def paraphrase_relevance(place: Dict, category: str, trait: str) -> int:
+    if place["category"] != category:
+        return 0
+    return 2 if trait in place_traits(place) else 1
+
+
+def build_queries() -> List[Tuple[str, str, Callable[[Dict], int]]]:
+    """(nhóm, truy vấn, hàm nhãn liên quan) cho mọi tổ hợp loại hình x đặc điểm."""
+    queries = []
+    for index, (category, (_, traits)) in enumerate(CATEGORIES.items()):
+        for offset, trait in enumerate(traits):
+            street = STREETS[(index + offset) % len(STREETS)]
+            queries.append((
+                "street", f"{CATEGORY_QUERIES[category]} {trait} {street}",
+                partial(street_relevance, category=category, trait=trait, street=street),
+            ))
+            if trait in TRAIT_PARAPHRASES:
+                queries.append((
+                    "paraphrase", f"{CATEGORY_QUERIES[category]} {TRAIT_PARAPHRASES[trait]}",
+                    partial(paraphrase_relevance, category=category, trait=trait),
+                ))
+    return queries
+
+
+def ndcg_at_k(gains: np.ndarray, order: np.ndarray, k: int) -> float:
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    dcg = float((gains[order[:k]] * discounts[:len(order[:k])]).sum())
+    ideal = np.sort(gains)[::-1][:k]
+    idcg = float((ideal * discounts[:len(ideal)]).sum())
+    return dcg / idcg if idcg else 0.0
+
+
+def scored_order(relevance: np.ndarray, catalog: List[Dict], rank_pool: int, scoring: ScoringService) -> np.ndarray:
+    """Thứ tự sau ScoringService.rank_places của top `rank_pool` theo relevance."""
+    candidates = np.argsort(-relevance, kind="stable")[:rank_pool]
+    places = [
+        {**catalog[row], "_row": int(row), "relevance_score": float(relevance[row])}
+        for row in candidates
+    ]
+    ranked = scoring.rank_places(places, top_k=rank_pool)
+    return np.array([place["_row"] for place in ranked], dtype=np.int64)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=2000, help="Kích thước pool ứng viên")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lexical-weight", type=float, default=settings.HYBRID_LEXICAL_WEIGHT)
+    parser.add_argument("--rrf-k", type=int, default=settings.HYBRID_RRF_K)
+    parser.add_argument("--rank-pool", type=int, default=20, help="Số ứng viên đưa vào ScoringService")
+    parser.add_argument("--model", action="store_true", help="Embed bằng model thật thay vì FakeEncoder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    catalog = build_catalog(args.docs)
+    texts = [f"{p['name']} {p['about'][:200]} {p['category']}".strip()[:500] for p in catalog]
+    queries = build_queries()
+
+    if args.model:
+        from app.services.embedding_backend import load_embedding_model
+        encoder = load_embedding_model()
+    else:
+        encoder = FakeEncoder()
+    docs = np.asarray(encoder.encode(texts, batch_size=32, show_progress_bar=False), dtype=np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    query_vectors = np.asarray(encoder.encode([q for _, q, _ in queries], show_progress_bar=False), dtype=np.float32)
+
+    methods = ("semantic", "rrf", "linear")
+    scoring = ScoringService()
+    results: Dict[Tuple[str, str], List[float]] = {}
+    scored: Dict[Tuple[str, str], List[float]] = {}
+    spread: Dict[str, List[float]] = {}
+    _document_terms.cache_clear()
+    cold = warm = 0.0
+    for (group, query, label), vector in zip(queries, query_vectors):
+        gains = np.array([label(p) for p in catalog], dtype=np.float32)
+        semantic = docs @ (vector / np.linalg.norm(vector))
+
+        started = time.perf_counter()
+        lexical = bm25_scores(query, catalog)
+        elapsed = time.perf_counter() - started
+        if cold == 0.0:
+            cold = elapsed
+        else:
+            warm += elapsed / (len(queries) - 1)
+
+        for method in methods:
+            if method == "semantic":
+                relevance = semantic
+            else:
+                relevance = fuse(lexical, semantic, method=method, lexical_weight=args.lexical_weight, rrf_k=args.rrf_k)
+            order = np.argsort(-relevance, kind="stable")
+            results.setdefault((method, group), []).append(ndcg_at_k(gains, order, args.k))
+            top = relevance[order[:args.rank_pool]]
+            spread.setdefault(method, []).append(float(top.max() - top.min()))
+            final = scored_order(relevance, catalog, args.rank_pool, scoring)
+            scored.setdefault((method, group), []).append(ndcg_at_k(gains, final, args.k))
+
+    print(
+        f"model={settings.EMBEDDING_MODEL if args.model else 'fake'}  pool={len(catalog):,}  queries={len(queries)}  "
+        f"lexical_weight={args.lexical_weight}  rrf_k={args.rrf_k}"
+    )
+    print(f"BM25 latency: {cold * 1000:.1f} ms (lần đầu, token hóa)  {warm * 1000:.2f} ms (đã cache)")
+    groups = list(dict.fromkeys(group for group, _, _ in queries))
+    print(f"{'method':<10}" + "".join(f"{f'{group} nDCG@{args.k}':>22}" for group in groups)
+          + "".join(f"{f'{group} scored':>20}" for group in groups) + f"{'top spread':>12}")
+    for method in methods:
+        print(
+            f"{method:<10}"
+            + "".join(f"{float(np.mean(results[(method, group)])):>22.3f}" for group in groups)
+            + "".join(f"{float(np.mean(scored[(method, group)])):>20.3f}" for group in groups)
+            + f"{float(np.mean(spread[method])):>12.3f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
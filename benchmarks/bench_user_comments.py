@@ -0,0 +1,119 @@
+"""
+Benchmark: số round trips của GET /users/{user_id}/comments
+
+Dùng Supabase client giả lập (không cần network) để đếm số lần gọi execute()
+khi page size tăng dần. Số round trips phải giữ nguyên, không tăng theo số comments.
+
+Chạy:
+    python -m benchmarks.bench_user_comments
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+from typing import Any, Dict, List
+
+from benchmarks import stub_env  # noqa: F401  (đặt env giả trước khi import app)
+from app.api.endpoints.users import get_user_comments
+
+
+class _StubResponse:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+
+
+class _StubQuery:
+    """Query builder giả lập, ghi nhận mỗi lần execute() là một round trip."""
+
+    def __init__(self, client: "StubClient", table: str):
+        self.client = client
+        self.table = table
+        self.columns = "*"
+        self.start = 0
+        self.end = None
+        self.filters: Dict[str, Any] = {}
+
+    def select(self, columns: str = "*", *args, **kwargs):
+        self.columns = columns
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.filters[column] = value
+        return self
+
+    def in_(self, *args, **kwargs):
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def range(self, start: int, end: int):
+        self.start, self.end = start, end
+        return self
+
+    def execute(self) -> _StubResponse:
+        self.client.round_trips += 1
+        if self.table == "comments":
+            rows = self.client.comments[self.start:None if self.end is None else self.end + 1]
+            if "images(" not in self.columns:
+                rows = [{k: v for k, v in row.items() if k != "images"} for row in rows]
+            return _StubResponse(rows)
+        if self.table == "images":
+            comment_id = self.filters.get("comment_id")
+            return _StubResponse([
+                img for c in self.client.comments for img in c["images"]
+                if comment_id is None or img["comment_id"] == comment_id
+            ])
+        return _StubResponse([])
+
+
+class StubClient:
+    """Supabase client giả lập với một user có n_comments comments."""
+
+    def __init__(self, n_comments: int, images_per_comment: int = 3):
+        self.round_trips = 0
+        place_id = str(uuid.uuid4())
+        self.comments = []
+        for _ in range(n_comments):
+            comment_id = str(uuid.uuid4())
+            self.comments.append({
+                "id": comment_id,
+                "place_id": place_id,
+                "user_id": "bench-user",
+                "author": "Bench",
+                "rating": 5,
+                "text": "Rất đẹp",
+                "date": None,
+                "places": {"id": place_id, "name": "Bench Place", "address": "Quận 1", "category": "Cafe"},
+                "images": [
+                    {"id": str(uuid.uuid4()), "url": f"https://example.com/{i}.jpg", "comment_id": comment_id}
+                    for i in range(images_per_comment)
+                ],
+            })
+
+    def table(self, name: str) -> _StubQuery:
+        return _StubQuery(self, name)
+
+
+def run(page_sizes=(1, 5, 20, 50, 100)) -> Dict[int, int]:
+    """Trả về {page_size: round_trips}."""
+    results = {}
+    for page_size in page_sizes:
+        client = StubClient(n_comments=page_size)
+        started = time.perf_counter()
+        comments = asyncio.run(get_user_comments("bench-user", limit=page_size, offset=0, db=client))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        assert len(comments) == page_size
+        assert all(len(c["images"]) == 3 for c in comments)
+        results[page_size] = client.round_trips
+        print(f"page_size={page_size:>4}  round_trips={client.round_trips}  time={elapsed_ms:.2f}ms")
+    return results
+
+
+if __name__ == "__main__":
+    round_trips = run()
+    if len(set(round_trips.values())) != 1:
+        print("❌ Số round trips tăng theo page size (N+1 queries)")
+        sys.exit(1)
+    print(f"✅ Round trips không đổi: {next(iter(round_trips.values()))}")
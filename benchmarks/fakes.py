@@ -0,0 +1,421 @@
+"""
+Fake dependencies cho benchmark chat pipeline (không cần network).
+
+Các fake thay ở tầng transport, nên code thật của service vẫn chạy:
+- FakeGenAIClient: thay `genai.Client` của GeminiService - trả về response
+  đã ghi sẵn (fixture) hoặc sinh tự động, prompt building / JSON parsing thật.
+- FakeSupabaseClient: thay Supabase client của PlaceSupabaseService - lọc
+  catalog trong bộ nhớ theo filter PostgREST (ilike / or / gte / lte / limit)
+  và RPC nearby_places; parse coordinates / embed / match score thật.
+- FakeWeatherService: trả về thời tiết ghi sẵn.
+- FakeEncoder: thay SentenceTransformer bằng hashing encoder (bag of words),
+  để semantic ranking thật chạy mà không cần tải model.
+
+Mỗi fake nhận một `Latency` để giả lập độ trễ mạng.
+"""
+
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.gemini_service import GeminiService
+from app.services.place_supabase_service import PlaceSupabaseService
+from app.services.semantic_service import SemanticSearchService
+from app.services.llm_scheduler import llm_scheduler
+from app.services.singleflight import SingleFlight
+from app.services.weather_service import WeatherService
+
+
+@dataclass
+class Latency:
+    """Độ trễ giả lập: mean_ms ± jitter (tỉ lệ), tính bằng time.sleep."""
+
+    mean_ms: float = 0.0
+    jitter: float = 0.0
+
+    def wait(self, rng: random.Random) -> None:
+        if self.mean_ms <= 0:
+            return
+        spread = self.mean_ms * self.jitter
+        time.sleep(max(0.0, rng.uniform(self.mean_ms - spread, self.mean_ms + spread)) / 1000)
+
+
+# ==============================================================================
+# Synthetic catalog
+# ==============================================================================
+
+CITIES = {
+    "Hồ Chí Minh": (10.7769, 106.7009, ["Quận 1", "Quận 3", "Bình Thạnh", "Thủ Đức", "Gò Vấp", "Tân Bình"]),
+    "Hà Nội": (21.0285, 105.8542, ["Hoàn Kiếm", "Ba Đình", "Đống Đa", "Tây Hồ", "Cầu Giấy"]),
+    "Đà Nẵng": (16.0544, 108.2022, ["Hải Châu", "Sơn Trà", "Ngũ Hành Sơn", "Thanh Khê"]),
+    "Vũng Tàu": (10.3460, 107.0843, ["Phường 1", "Phường 2", "Thắng Tam"]),
+    "Đà Lạt": (11.9404, 108.4583, ["Phường 1", "Phường 3", "Phường 10"]),
+    "Hội An": (15.8801, 108.3380, ["Minh An", "Cẩm Phô", "Cửa Đại"]),
+}
+
+CATEGORIES = {
+    "Quán Cà Phê": (["Cà Phê", "Coffee", "Cafe"], ["yên tĩnh", "view đẹp", "sân vườn", "acoustic", "làm việc", "check-in"]),
+    "Nhà Hàng": (["Nhà Hàng", "Quán Ăn", "Bếp"], ["hải sản", "món Việt", "gia đình", "lẩu", "nướng", "sang trọng"]),
+    "Biển & Bãi Biển": (["Bãi Biển", "Bãi Tắm", "Biển"], ["hoang sơ", "sóng êm", "cát trắng", "hoàng hôn", "đông vui"]),
+    "Bảo Tàng & Triển Lãm": (["Bảo Tàng", "Triển Lãm", "Nhà Trưng Bày"], ["lịch sử", "nghệ thuật", "văn hóa", "chiến tranh"]),
+    "Công Viên": (["Công Viên", "Vườn Hoa", "Khu Vui Chơi"], ["thoáng mát", "gia đình", "chạy bộ", "cây xanh"]),
+    "Di Tích Lịch Sử": (["Chùa", "Đền", "Di Tích"], ["cổ kính", "linh thiêng", "kiến trúc", "lịch sử"]),
+}
+
+STREETS = ["Nguyễn Huệ", "Lê Lợi", "Trần Hưng Đạo", "Hai Bà Trưng", "Lý Thường Kiệt", "Điện Biên Phủ", "Võ Văn Tần"]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class FakeEncoder:
+    """
+    Hashing bag-of-words encoder với interface `encode` của SentenceTransformer.
+
+    Mỗi token có một vector ngẫu nhiên cố định (seed từ hash của token);
+    embedding của câu là tổng các vector token, đã chuẩn hóa.
+    """
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            vector += self._token_vector(token)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences, convert_to_tensor: bool = False, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(s) for s in sentences]) if sentences else np.zeros((0, self.dim))
+
+
+def build_catalog(size: int, encoder: Optional[FakeEncoder] = None, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Sinh `size` places giống schema bảng `places` (embed là ndarray,
+    được serialize thành chuỗi pgvector khi FakeSupabaseClient trả về;
+    None nếu không truyền encoder).
+    """
+    rng = random.Random(seed)
+    city_names = list(CITIES)
+    category_names = list(CATEGORIES)
+    places = []
+
+    for i in range(size):
+        city = city_names[i % len(city_names)]
+        lat0, lon0, districts = CITIES[city]
+        district = rng.choice(districts)
+        category = rng.choice(category_names)
+        prefixes, traits = CATEGORIES[category]
+        chosen_traits = rng.sample(traits, k=2)
+        name = f"{rng.choice(prefixes)} {rng.choice(STREETS)} {i}"
+        about = f"{category} {' '.join(chosen_traits)} tại {district}, {city}. Không gian {chosen_traits[0]}, phục vụ khách du lịch."
+
+        places.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": name,
+            "address": f"{rng.randint(1, 300)} {rng.choice(STREETS)}, {district}, {city}",
+            "category": category,
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "rating_count": rng.randint(0, 2000),
+            "price_level": rng.choice(["low", "medium", "high", None]),
+            "phone": f"09{rng.randint(10000000, 99999999)}",
+            "website": None,
+            "opening_hours": "07:00 - 22:00",
+            "about": about,
+            "coordinates": json.dumps({
+                "lat": lat0 + rng.uniform(-0.08, 0.08),
+                "lon": lon0 + rng.uniform(-0.08, 0.08),
+            }),
+            "embed": encoder.encode(f"{name} {about[:200]} {category}") if encoder else None,
+        })
+
+    return places
+
+
+def _serialize_vector(vector: np.ndarray) -> str:
+    """Format giống pgvector text output ("[0.1,0.2,...]")."""
+    return "[" + ",".join(f"{x:.6g}" for x in vector.tolist()) + "]"
+
+
+# ==============================================================================
+# Supabase
+# ==============================================================================
+
+class _FakeResponse:
+    def __init__(self, data: List[Dict[str, Any]]):
+        self.data = data
+        self.count = None
+
+
+class _FakeQuery:
+    """Query builder PostgREST tối giản, lọc catalog trong bộ nhớ."""
+
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self.client = client
+        self.table = table
+        self.predicates = []
+        self.row_limit: Optional[int] = None
+        self.columns = "*"
+
+    def select(self, columns: str = "*", *args, **kwargs):
+        self.columns = columns
+        return self
+
+    def _ilike(self, column: str, pattern: str):
+        needle = pattern.strip("%").lower()
+        return lambda row: needle in str(row.get(column) or "").lower()
+
+    def or_(self, filters: str):
+        conditions = []
+        for item in filters.split(","):
+            column, op, value = item.split(".", 2)
+            if op == "ilike":
+                conditions.append(self._ilike(column, value))
+        self.predicates.append(lambda row: any(cond(row) for cond in conditions))
+        return self
+
+    def ilike(self, column: str, pattern: str):
+        self.predicates.append(self._ilike(column, pattern))
+        return self
+
+    def eq(self, column: str, value: Any):
+        self.predicates.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def in_(self, column: str, values: List[Any]):
+        wanted = {str(v) for v in values}
+        self.predicates.append(lambda row: str(row.get(column)) in wanted)
+        return self
+
+    def gte(self, column: str, value: Any):
+        self.predicates.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lte(self, column: str, value: Any):
+        self.predicates.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def limit(self, n: int):
+        self.row_limit = n
+        return self
+
+    def execute(self) -> _FakeResponse:
+        self.client.latency.wait(self.client.rng)
+        self.client.round_trips += 1
+
+        if self.table == "images":
+            n = self.row_limit or 5
+            return _FakeResponse([{"url": f"https://images.example.com/{self.client.round_trips}/{i}.jpg"} for i in range(n)])
+
+        rows = []
+        for row in self.client.catalog:
+            if all(predicate(row) for predicate in self.predicates):
+                rows.append(self.client.to_wire(row))
+                if self.row_limit is not None and len(rows) >= self.row_limit:
+                    break
+        return _FakeResponse(rows)
+
+
+class _FakeRPC:
+    def __init__(self, client: "FakeSupabaseClient", name: str, params: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> _FakeResponse:
+        self.client.latency.wait(self.client.rng)
+        self.client.round_trips += 1
+        if self.name != "nearby_places":
+            raise NotImplementedError(f"RPC {self.name} không có trong fake")
+
+        lat, lon = self.params["user_lat"], self.params["user_lon"]
+        radius = self.params.get("radius_km") or 10
+        matches = []
+        for row in self.client.catalog:
+            coords = json.loads(row["coordinates"])
+            distance = PlaceSupabaseService.calculate_distance(lat, lon, coords["lat"], coords["lon"])
+            if distance <= radius:
+                matches.append((distance, row))
+        matches.sort(key=lambda item: item[0])
+        limit = self.params.get("result_limit") or 100
+        return _FakeResponse([self.client.to_wire(row) for _, row in matches[:limit]])
+
+
+class FakeSupabaseClient:
+    """Supabase client giả lập trên một catalog trong bộ nhớ."""
+
+    def __init__(self, catalog: List[Dict[str, Any]], latency: Latency = None, seed: int = 0):
+        self.catalog = catalog
+        self.latency = latency or Latency()
+        self.rng = random.Random(seed)
+        self.round_trips = 0
+        self._wire_embeds: Dict[str, str] = {}
+
+    def to_wire(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Bản copy của row như PostgREST trả về (embed dạng chuỗi)."""
+        wire = dict(row)
+        embed = row.get("embed")
+        if isinstance(embed, np.ndarray):
+            text = self._wire_embeds.get(row["id"])
+            if text is None:
+                text = self._wire_embeds[row["id"]] = _serialize_vector(embed)
+            wire["embed"] = text
+        return wire
+
+    def table(self, name: str) -> _FakeQuery:
+        return _FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> _FakeRPC:
+        return _FakeRPC(self, name, params)
+
+
+class FakePlaceSupabaseService(PlaceSupabaseService):
+    def __init__(self, client: FakeSupabaseClient):
+        self.client = client
+        self.places_table = "places"
+        self.images_table = "images"
+
+
+# ==============================================================================
+# Gemini
+# ==============================================================================
+
+_CLASSIFY_MARKER = "Phân tích câu hỏi của người dùng"
+_SELECT_MARKER = '"selected_indices"'
+_USER_QUERY_RE = re.compile(r'Câu hỏi của người dùng: "(.*?)"\s*\n', re.DOTALL)
+_CANDIDATES_RE = re.compile(r"Danh sách địa điểm ứng viên \((\d+) địa điểm\)")
+_MAX_PLACES_RE = re.compile(r"Chọn ĐÚNG (\d+) địa điểm")
+
+
+def synthetic_classification(query: str) -> Dict[str, Any]:
+    """Phân loại đơn giản theo từ khóa khi fixture không có query."""
+    lowered = query.lower()
+    location = next((city for city in CITIES if city.lower() in lowered), None)
+    if any(word in lowered for word in ("gần", "nearby", "around me")):
+        query_type = "nearby_search"
+    elif location:
+        query_type = "specific_search"
+    else:
+        query_type = "general_query"
+    return {
+        "query_type": query_type,
+        "keywords": [location] if location else [],
+        "keyword_variants": [location] if location else [],
+        "location_mentioned": location,
+        "needs_semantic_search": query_type != "general_query",
+        "vietnamese_query": query,
+        "corrected_query": query,
+        "original_language": "vi",
+    }
+
+
+class _FakeGenAIResponse:
+    def __init__(self, text: str, config: Any = None):
+        self.text = text
+        # Như SDK: có response_schema (class Pydantic) thì parse sẵn vào .parsed
+        self.parsed = None
+        schema = getattr(config, "response_schema", None)
+        if isinstance(schema, type):
+            try:
+                self.parsed = schema.model_validate_json(text)
+            except ValueError:
+                pass
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGenAIClient"):
+        self.client = client
+
+    def generate_content(self, model: str, contents: str, config: Any = None) -> _FakeGenAIResponse:
+        self.client.latency.wait(self.client.rng)
+        self.client.calls += 1
+
+        if _CLASSIFY_MARKER in contents:
+            match = _USER_QUERY_RE.search(contents)
+            query = match.group(1) if match else ""
+            classification = self.client.classifications.get(query) or synthetic_classification(query)
+            text = json.dumps(classification, ensure_ascii=False)
+            if getattr(config, "response_schema", None) is None:
+                # Không có schema: Gemini thường bọc trong ```json ... ```
+                text = "```json\n" + text + "\n```"
+            return _FakeGenAIResponse(text, config)
+
+        if _SELECT_MARKER in contents:
+            candidates = int(_CANDIDATES_RE.search(contents).group(1))
+            max_places = int(_MAX_PLACES_RE.search(contents).group(1))
+            indices = list(range(min(candidates, max_places)))
+            answer = "\n".join(f"{i + 1}. **Địa điểm {i}** - gợi ý phù hợp với yêu cầu của bạn." for i in indices)
+            return _FakeGenAIResponse(json.dumps({"selected_indices": indices, "answer": answer}, ensure_ascii=False), config)
+
+        return _FakeGenAIResponse("Xin chào! Đây là câu trả lời giả lập cho câu hỏi chung.")
+
+
+class FakeGenAIClient:
+    """Thay `genai.Client`; classifications là {query: JSON phân loại đã ghi}."""
+
+    def __init__(self, classifications: Dict[str, Dict[str, Any]], latency: Latency = None, seed: int = 0):
+        self.classifications = classifications
+        self.latency = latency or Latency()
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.models = _FakeModels(self)
+
+
+class FakeGeminiService(GeminiService):
+    def __init__(self, client: FakeGenAIClient):
+        self.client = client
+        self.model_id = "fake-gemini"
+        self.grounding_tools = []
+        self._inflight = SingleFlight()
+        self.scheduler = llm_scheduler
+
+
+# ==============================================================================
+# Weather / Semantic
+# ==============================================================================
+
+DEFAULT_WEATHER = {
+    "temp": 31.0, "feels_like": 35.2, "temp_min": 29.0, "temp_max": 33.0,
+    "humidity": 70, "pressure": 1008, "description": "mây rải rác", "main": "Clouds",
+    "icon": "03d", "wind_speed": 3.1, "clouds": 40,
+}
+
+
+class FakeWeatherService(WeatherService):
+    def __init__(self, weather: Dict[str, Any] = None, latency: Latency = None, seed: int = 0):
+        self.weather = weather or DEFAULT_WEATHER
+        self.latency = latency or Latency()
+        self.rng = random.Random(seed)
+
+    def get_weather_by_coords(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        self.latency.wait(self.rng)
+        return dict(self.weather)
+
+    def get_weather_by_city(self, city: str) -> Optional[Dict[str, Any]]:
+        self.latency.wait(self.rng)
+        return dict(self.weather)
+
+
+def make_semantic_service(encoder) -> SemanticSearchService:
+    """SemanticSearchService thật với encoder được truyền vào (không tải model)."""
+    service = SemanticSearchService()
+    service.model = encoder
+    return service
@@ -0,0 +1,9 @@
+"""
+Đặt các biến môi trường bắt buộc bằng giá trị giả để benchmark
+có thể import app mà không cần file .env thật.
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_KEY", "bench-key")
@@ -1,10 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 
 from app.core.config import settings
+from app.core.logger import request_id_var, setup_logging, shutdown_logging
+
+# Cấu hình logging trước khi import service (một số service log khi khởi tạo)
+setup_logging()
+
 from app.api.router import api_router
+from app.api.deps import jwks_store
+from app.api.endpoints.chat import orchestrator
 from app.core.datetime_utils import format_iso8601_vietnam
+from app.core.metrics import HTTP_REQUEST_DURATION, PROMETHEUS_CONTENT_TYPE, render_latest
+from app.core.readiness import readiness
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks."""
+    # Prefetch JWKS public keys so the first authenticated request doesn't wait
+    jwks_store.refresh_async()
+
+    # Load embedding model + catalog trong background; /ready báo khi xong
+    readiness.register("embedding_model")
+    readiness.register("catalog")
+    warmup_task = asyncio.create_task(asyncio.to_thread(orchestrator.warm_up))
+    # Places API đưa place mới / vừa sửa vào hàng đợi embedding qua dependency get_embedding_writer
+    app.state.embedding_writer = orchestrator.embedding_writer
+
+    yield
+
+    warmup_task.cancel()
+    orchestrator.shut_down()
+    shutdown_logging()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -12,6 +47,7 @@ app = FastAPI(
     description="API Backend cho ứng dụng VietSpot - Khám phá địa điểm du lịch Việt Nam",
     version=settings.APP_VERSION,
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -21,8 +57,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Request-ID"],
 )
 
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Record per-endpoint latency, labelled by route template (not raw path)."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code)
+        )
+
+
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    """Gắn request id (từ header X-Request-ID hoặc sinh mới) vào mọi log của request."""
+    request_id = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        request_id_var.reset(token)
+
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -47,6 +117,27 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 khi embedding model và catalog đã load xong, 503 nếu chưa."""
+    ready = readiness.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "loading",
+            "components": readiness.snapshot(),
+            "timestamp": format_iso8601_vietnam(datetime.now())
+        }
+    )
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics endpoint."""
+        return Response(content=render_latest(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(